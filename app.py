@@ -1,69 +1,157 @@
+import argparse
 import multiprocessing
+import threading
 import time
 from datetime import datetime
 import logging
 import traceback
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional, Set, Tuple, Union
 import json
+import math
 import os
-import statistics
+import sys
+from contextlib import nullcontext
 
+import config
+from app.engine.startup import profiler
 from app.engine import db
-from app.sensors.light_sensor import LightSensor
-from app.sensors.tank_temperature import TemperatureMonitor
-from app.sensors.ultrasonic import UltrasonicSensor
-from app.sensors.ph_sensor import SensorReader
-from app.sensors.relay import RelayController
-from app.sensors.dht22 import DHT22Sensor
-from app.sensors.camera import CameraCapture
-from app.sensors.pump import PumpActivator
-from app.actuators.feeder import Feeder
+from app.engine.breaker import CircuitBreaker
+from app.engine.logs import start_logging, stop_logging
+from app.engine.metrics import registry as metrics, serve_metrics
+from app.engine.rollup import HistoryStore
+from app.engine.reporting import ReportPolicy
+from app.engine.scheduler import FixedRateSchedule
+from app.engine.adaptive import AdaptiveInterval
+from app.engine.conditioning import ConditioningChain
+from app.engine.checkpoint import CycleCheckpoint
+from app.engine.shm import LatestValueTable, STATUS_MISSING, STATUS_ERROR, STATUS_TIMEOUT
+from app.engine.api import serve_api
+from app.engine.framehub import FrameHub, serve_stream
+from app.engine.segments import SegmentStore
+from app.engine.migrate import connect as connect_mysql
+from app.engine.retention import RetentionJob
+from app.engine.nodes import NodeOwnership
+from app.engine.snapshot import ConfigSnapshot, load_snapshot, load_cache, save_cache
+from app.engine.bus import ReadingBus, Reading, Subscriber, OVERFLOW_SPILL
+from app.engine import replay
+from app.engine.tracer import tracer, TICK_OK, TICK_ERROR, TICK_NO_VALUE, TICK_SKIPPED, TICK_TIMEOUT
+from app.engine.watchdog import DriverGuard, ReadTimeout
+from app.engine.arbiter import HardwareArbiter, HardwareUse, ResourceBusy, conflict_losers, find_conflicts
+
+################################################################################
+# Sensor Drivers
+################################################################################
+
+# Sensor type -> (driver module, class, constructor arguments).
+# Driver modules pull in hardware libraries (cv2, adafruit_dht, smbus, spidev, RPi.GPIO),
+# so each one is imported only when a configured sensor needs it.
+SENSOR_DRIVERS = {
+    'ultrasonic': ('app.sensors.ultrasonic', 'UltrasonicSensor', {'trig_pin': 18, 'echo_pin': 15}),
+    'ph': ('app.sensors.ph_sensor', 'SensorReader', {}),
+    'tank1': ('app.sensors.tank_temperature', 'TemperatureMonitor', {}),
+    'tank2': ('app.sensors.tank_temperature', 'TemperatureMonitor', {}),
+    'light': ('app.sensors.light_sensor', 'LightSensor', {}),
+    'env_temp': ('app.sensors.dht22', 'DHT22Sensor', {}),
+    'humidity': ('app.sensors.dht22', 'DHT22Sensor', {}),
+    'camera': ('app.sensors.camera', 'CameraCapture', {}),
+    'pump_tank': ('app.sensors.pump', 'PumpActivator', {'gpio_pin': 16}),
+    'pump_2': ('app.sensors.pump', 'PumpActivator', {'gpio_pin': 20}),
+}
+
+PUMP_TYPES = ('pump_tank', 'pump_2')
+
+# Sensor type -> (GPIO pins its driver alone may drive, resource its ticks take turns on).
+# BCM pin numbers. The env_temp and humidity sensors read the same DHT22 on GPIO17, so they
+# share its pin rather than claim it, as the two tank probes share the 1-Wire bus.
+SENSOR_HARDWARE = {
+    'ultrasonic': (('gpio:18', 'gpio:15'), 'gpio:18'),
+    'ph': ((), 'spi:0.0'),
+    'tank1': ((), 'w1'),
+    'tank2': ((), 'w1'),
+    'light': ((), 'i2c:1'),
+    'env_temp': ((), 'gpio:17'),
+    'humidity': ((), 'gpio:17'),
+    'pump_tank': (('gpio:16',), 'gpio:16'),
+    'pump_2': (('gpio:20',), 'gpio:20'),
+}
+# Exit code of a sensor process whose pins are held by someone else, it is not restarted
+EXIT_HARDWARE_BUSY = 3
+
+# With the preview stream on, main owns the camera and camera ticks take the stream's frame
+if config.STREAM_ENABLED:
+    STREAM_SNAPSHOT_HOST = config.STREAM_HOST if config.STREAM_HOST not in ('', '0.0.0.0') else '127.0.0.1'
+    SENSOR_DRIVERS['camera'] = ('app.sensors.camera', 'StreamSnapshot', {
+        'url': f"http://{STREAM_SNAPSHOT_HOST}:{config.STREAM_PORT}/snapshot.jpg",
+    })
+
+
+def open_stream_camera():
+    """Opens the camera for the preview stream, called by the frame hub when the first viewer connects."""
+    camera = profiler.import_module('app.sensors.camera')
+    return camera.CameraCapture(camera_index=config.STREAM_CAMERA_INDEX, jpeg_quality=config.STREAM_JPEG_QUALITY)
 
 ################################################################################
 # Logger Configuration
 ################################################################################
 
-class TableFormatter(logging.Formatter):
+def configure_logging() -> logging.Logger:
     """
-    Custom logging formatter to display logs in a structured table format.
+    Configures queue-based logging; the listener thread in this process writes to the
+    console and to a size-rotated log file, forked workers only enqueue records.
     """
-    def __init__(self):
-        self.timestamp_width = 20
-        self.level_width = 10
-        self.process_width = 25
-        self.message_width = 150
-        super().__init__()
+    start_logging(
+        config.LOG_FILE,
+        max_bytes=config.LOG_MAX_BYTES,
+        backup_count=config.LOG_BACKUP_COUNT,
+        levels=config.LOG_LEVELS,
+        queue_size=config.LOG_QUEUE_SIZE,
+        burst=config.LOG_RATE_LIMIT_BURST,
+        period=config.LOG_RATE_LIMIT_PERIOD,
+    )
+    return logging.getLogger("SensorLogger")
 
-    def format(self, record):
-        timestamp = datetime.fromtimestamp(record.created).strftime('%Y-%m-%d %H:%M:%S')
-        level = record.levelname
-        process = record.processName
-        message = record.getMessage()
+logger = configure_logging()
 
-        if len(message) > self.message_width - 3:
-            message = message[:self.message_width - 6] + '...'
+# Recent samples and rollups per sensor, queryable locally without SQL
+history = HistoryStore()
 
-        formatted = f"{timestamp:<{self.timestamp_width}} | {level:<{self.level_width}} | {process:<{self.process_width}} | {message:<{self.message_width}}"
-        return formatted
+# Latest value per sensor in shared memory, created by main() before the sensor processes fork
+latest_values: Optional[LatestValueTable] = None
 
-def configure_logging() -> logging.Logger:
-    """
-    Configures the logger with both stream and file handlers.
-    """
-    logger = logging.getLogger("SensorLogger")
-    logger.setLevel(logging.DEBUG)
+# Every reading on disk in per-sensor column segments, range-queryable with `python -m app.engine.segments`
+segment_store: Optional[SegmentStore] = SegmentStore(config.SEGMENTS_DIR, config.SEGMENTS_SPAN) if config.SEGMENTS_ENABLED else None
 
-    stream_handler = logging.StreamHandler()
-    stream_handler.setFormatter(TableFormatter())
-    logger.addHandler(stream_handler)
+# Pins and buses are claimed and taken in turns through lock files shared by every process,
+# see who holds what with `python -m app.engine.arbiter status`
+arbiter: Optional[HardwareArbiter] = HardwareArbiter(config.HARDWARE_LOCK_DIR) if config.HARDWARE_ARBITER_ENABLED else None
 
-    file_handler = logging.FileHandler('sensor_logs.log')
-    file_handler.setFormatter(TableFormatter())
-    logger.addHandler(file_handler)
+# Fail fast while MySQL is unreachable, readings go to the offline queue instead
+db.breaker = CircuitBreaker('mysql', config.DB_BREAKER_FAILURES, config.DB_BREAKER_BASE_DELAY, config.DB_BREAKER_MAX_DELAY)
 
-    return logger
+################################################################################
+# Metrics
+################################################################################
 
-logger = configure_logging()
+metrics.configure(config.METRICS_DIR if config.METRICS_ENABLED else None, config.METRICS_FLUSH_INTERVAL)
+
+READ_SECONDS = metrics.histogram('sensor_read_seconds', 'Time spent in the driver call of a cycle tick', ['sensor_id', 'map'])
+READ_ERRORS = metrics.counter('sensor_read_errors_total', 'Cycle ticks that raised an error', ['sensor_id', 'map'])
+READ_TIMEOUTS = metrics.counter('sensor_read_timeouts_total', 'Cycle ticks whose driver call missed its deadline', ['sensor_id', 'map'])
+PROCESS_RESTARTS = metrics.counter('process_restarts_total', 'Sensor and cycle processes restarted after dying', ['sensor_id'])
+READINGS = metrics.counter('sensor_readings_total', 'Readings by report policy outcome', ['sensor_id', 'result'])
+SAMPLE_INTERVAL = metrics.gauge('sensor_sample_interval_seconds', 'Current tick interval, changes under adaptive sampling', ['sensor_id'])
+TICKS_MISSED = metrics.counter('cycle_ticks_missed_total', 'Ticks dropped or merged by the missed-tick policy', ['sensor_id'])
+SENSOR_VALUE = metrics.gauge('sensor_value', 'Latest reading per sensor', ['sensor_id'])
+SENSOR_TIMESTAMP = metrics.gauge('sensor_reading_timestamp_seconds', 'Time of the latest reading per sensor', ['sensor_id'])
+QUEUE_DEPTH = metrics.gauge('offline_queue_depth', 'Readings waiting in the offline JSON queue')
+QUEUE_WRITES = metrics.counter('offline_queue_writes_total', 'Readings diverted to the offline JSON queue')
+QUEUE_WRITE_SECONDS = metrics.histogram('offline_queue_write_seconds', 'Time spent rewriting the offline JSON queue')
+# The bus spills from the publishing thread while the database sink syncs from its own
+queue_lock = threading.Lock()
+
+# Opt-in tick tracing, dump with `kill -USR1 <pid>` and inspect with `python -m app.engine.tracer`
+if config.TRACE_ENABLED:
+    tracer.enable(config.TRACE_CAPACITY, config.TRACE_DIR)
 
 ################################################################################
 # Database Interaction Functions
@@ -76,7 +164,7 @@ def update_cycle_status(db_conn, sensor_id: int, cycle_id: int) -> None:
     try:
         update_query = """
             UPDATE cycles
-            SET is_active = '0'
+            SET is_active = 0
             WHERE sensor_id = %s AND cycle_id = %s
         """
         db_conn.execute_query(update_query, (sensor_id, cycle_id))
@@ -85,141 +173,283 @@ def update_cycle_status(db_conn, sensor_id: int, cycle_id: int) -> None:
         logger.error(f"Failed to update cycle status for Sensor ID: {sensor_id}, Cycle ID: {cycle_id} | Error: {e}\n{traceback.format_exc()}")
 
 
-def insert_sensor_data(db_conn, sensor_id: int, value: float) -> None:
+INSERT_READING = """
+    INSERT INTO sensor_data (sensor_id, value, reading_time) 
+    VALUES (%s, %s, %s)
+"""
+
+INSERT_READING_RAW = """
+    INSERT INTO sensor_data (sensor_id, value, reading_time, raw_value)
+    VALUES (%s, %s, %s, %s)
+"""
+
+
+def insert_sensor_data(db_conn, readings: List[Reading]) -> None:
     """
-    Inserts a new sensor reading into the sensor_data table or saves it to JSON if no connection.
+    Inserts a batch of readings in one statement, or saves them to the JSON queue if that fails.
     """
+    rows = [(reading.sensor_id, reading.value, datetime.fromtimestamp(reading.timestamp), reading.raw) for reading in readings]
     try:
-        insert_query = """
-            INSERT INTO sensor_data (sensor_id, value, reading_time) 
-            VALUES (%s, %s, %s)
-        """
-        data = (sensor_id, value, datetime.now())
-        db_conn.execute_query(insert_query, data)
-        logger.info(f"Data Inserted | Sensor ID: {sensor_id} | Value: {value:.2f}")
-        sync_offline_data(db_conn)
-
+        if config.RAW_VALUES_ENABLED:
+            db_conn.execute_many(INSERT_READING_RAW, rows)
+        else:
+            db_conn.execute_many(INSERT_READING, [row[:3] for row in rows])
     except Exception as e:
-        logger.error(f"Failed to insert data for Sensor ID: {sensor_id} | Error: {e}\n{traceback.format_exc()}")
+        logger.error(f"Failed to insert {len(rows)} readings | Error: {e}")
         logger.info("Saving data to JSON queue due to connection issue.")
-        save_to_json_queue(sensor_id, value)
+        save_batch_to_json_queue(rows)
+        return
+    for sensor_id, value, *_ in rows:
+        logger.debug(f"Data Inserted | Sensor ID: {sensor_id} | Value: {value:.2f}")
+    sync_offline_data(db_conn)
 
 
-def save_to_json_queue(sensor_id: int, value: float) -> None:
+def save_to_json_queue(sensor_id: int, value: float, reading_time: Optional[datetime] = None, raw: Optional[int] = None) -> None:
     """
     Saves sensor data to a JSON queue file when the database is unavailable.
     """
-    queue_file = "sensor_data_queue.json"
-    entry = {
-        "sensor_id": sensor_id,
-        "value": value,
-        "reading_time": datetime.now().isoformat()
-    }
-    
-    if os.path.exists(queue_file):
-        with open(queue_file, "r") as file:
-            queue_data = json.load(file)
-    else:
-        queue_data = []
+    save_batch_to_json_queue([(sensor_id, value, reading_time, raw)])
+
+
+def save_batch_to_json_queue(rows: List[tuple]) -> None:
+    """
+    Appends (sensor_id, value, reading_time[, raw]) rows to the JSON queue file with a single rewrite.
+    """
+    start = time.perf_counter()
+    queue_file = config.OFFLINE_QUEUE_FILE
+    entries = []
+    for sensor_id, value, reading_time, *raw in rows:
+        entry = {
+            "sensor_id": sensor_id,
+            "value": value,
+            "reading_time": (reading_time or datetime.now()).isoformat()
+        }
+        if raw and raw[0] is not None:
+            entry["raw_value"] = raw[0]
+        entries.append(entry)
+
+    with queue_lock:
+        if os.path.exists(queue_file):
+            with open(queue_file, "r") as file:
+                queue_data = json.load(file)
+        else:
+            queue_data = []
 
-    queue_data.append(entry)
+        queue_data.extend(entries)
 
-    with open(queue_file, "w") as file:
-        json.dump(queue_data, file, indent=4)
-    logger.info(f"Data queued: {entry}")
+        with open(queue_file, "w") as file:
+            json.dump(queue_data, file, indent=4)
+    QUEUE_WRITES.inc(len(entries))
+    QUEUE_DEPTH.set(len(queue_data))
+    QUEUE_WRITE_SECONDS.observe(time.perf_counter() - start)
+    for entry in entries:
+        logger.debug(f"Data queued: {entry}")
 
 
 def sync_offline_data(db_conn) -> None:
     """
     Syncs queued sensor data from JSON file to the database.
     """
-    queue_file = "sensor_data_queue.json"
+    queue_file = config.OFFLINE_QUEUE_FILE
     
-    if not os.path.exists(queue_file):
-        logger.info("No offline data to sync.")
-        return
+    with queue_lock:
+        if not os.path.exists(queue_file):
+            logger.debug("No offline data to sync.")
+            return
 
-    try:
-        with open(queue_file, "r") as file:
-            queue_data = json.load(file)
-
-        for entry in queue_data:
-            insert_query = """
-                INSERT INTO sensor_data (sensor_id, value, reading_time) 
-                VALUES (%s, %s, %s)
-            """
-            data = (entry["sensor_id"], entry["value"], entry["reading_time"])
-            db_conn.execute_query(insert_query, data)
-            logger.info(f"Synced data from JSON | Sensor ID: {entry['sensor_id']} | Value: {entry['value']:.2f}")
-        
-        os.remove(queue_file)
-        logger.info("Offline data synced and queue cleared.")
+        try:
+            with open(queue_file, "r") as file:
+                queue_data = json.load(file)
 
-    except Exception as e:
-        logger.error(f"Failed to sync offline data | Error: {e}\n{traceback.format_exc()}")
+            for entry in queue_data:
+                data = (entry["sensor_id"], entry["value"], entry["reading_time"])
+                if config.RAW_VALUES_ENABLED:
+                    db_conn.execute_query(INSERT_READING_RAW, data + (entry.get("raw_value"),))
+                else:
+                    db_conn.execute_query(INSERT_READING, data)
+                logger.debug(f"Synced data from JSON | Sensor ID: {entry['sensor_id']} | Value: {entry['value']:.2f}")
 
+            os.remove(queue_file)
+            QUEUE_DEPTH.set(0)
+            logger.info("Offline data synced and queue cleared.")
 
-def fetch_cycles(db_conn, sensor_id: int) -> List[Dict[str, Any]]:
-    """
-    Fetches all active cycles for a given sensor, falls back to local JSON data if no internet.
+        except Exception as e:
+            logger.error(f"Failed to sync offline data | Error: {e}\n{traceback.format_exc()}")
+
+
+################################################################################
+# Reading Bus
+################################################################################
+
+def _numeric(reading: Reading) -> bool:
+    return reading.is_numeric
+
+
+def build_reading_bus(db_conn, policy: ReportPolicy, policies: Optional[Dict[int, ReportPolicy]] = None) -> ReadingBus:
     """
-    try:
-        # Attempt to fetch from the database
-        select_query = """
-            SELECT cycle_id, interval_seconds, duration_minutes, pause, is_active
-            FROM cycles
-            WHERE sensor_id = %s AND is_active = '1'
-            ORDER BY cycle_id
-        """
-        cycles = db_conn.fetch_all(select_query, (sensor_id,), dictionary=True)
-        if not cycles:
-            raise ValueError("No cycles fetched from DB")
-
-        cycles_list = [
-            {
-                'cycle_id': cycle['cycle_id'],
-                'cycle_number': 1,
-                'interval_seconds': cycle['interval_seconds'],
-                'duration_minutes': cycle['duration_minutes'],
-                'pause': cycle['pause'],
-                'is_active': cycle['is_active']
-            }
-            for cycle in cycles
-        ]
-        logger.info(f"Fetched {len(cycles_list)} active cycles for Sensor ID {sensor_id}: {cycles_list}")
-        return cycles_list
-    except Exception as e:
-        logger.error(f"Failed to fetch cycles for Sensor ID: {sensor_id} | Error: {e}\n{traceback.format_exc()}")
+    Wires the sinks every reading goes to. The caller starts the bus in the process that
+    publishes and stops it (which drains the queues) when done.
 
-        json_file_path = "sensors.json"
-        if os.path.exists(json_file_path):
-            try:
-                with open(json_file_path, "r") as file:
-                    json_data = json.load(file)
-                    for table in json_data:
-                        if table.get("name") == "sensors":
-                            sensors = table.get("data", [])
-                            fallback_data = [
-                                {
-                                    "sensor_name": sensor["sensor_name"],
-                                    "sensor_id": int(sensor["id"]),
-                                    "config": json.loads(sensor["config"])
-                                }
-                                for sensor in sensors if int(sensor["id"]) == sensor_id
-                            ]
-                            logger.info(f"Fetched {len(fallback_data)} sensors from JSON.")
-                            return fallback_data
-            except Exception as json_error:
-                logger.error(f"Error reading JSON file: {json_error}")
-        else:
-            logger.error("Fallback JSON file not found.")
-        return []
+    :param db_conn: Database wrapper, used only from the database subscriber's thread.
+    :param policy: Report policy deciding which readings are inserted.
+    :param policies: Sensor ID -> report policy for a bus carrying several sensors (replay),
+                     `policy` applies to sensors without one.
+    """
+    policies = policies or {}
+    bus = ReadingBus()
+
+    def record_latest(readings: List[Reading]) -> None:
+        for reading in readings:
+            history.record(reading.sensor_id, reading.value, reading.timestamp)
+            if latest_values:
+                latest_values.write(reading.sensor_id, reading.value, reading.timestamp)
+
+    def append_segments(readings: List[Reading]) -> None:
+        for reading in readings:
+            segment_store.append(reading.sensor_id, reading.timestamp, reading.value)
+
+    def export_metrics(readings: List[Reading]) -> None:
+        for reading in readings:
+            SENSOR_VALUE.labels(reading.sensor_id).set(reading.value)
+            SENSOR_TIMESTAMP.labels(reading.sensor_id).set(reading.timestamp)
+
+    def report(readings: List[Reading]) -> None:
+        emitted = []
+        for reading in readings:
+            if policies.get(reading.sensor_id, policy).should_report(reading.value, reading.timestamp):
+                READINGS.labels(reading.sensor_id, 'emitted').inc()
+                emitted.append(reading)
+            else:
+                READINGS.labels(reading.sensor_id, 'suppressed').inc()
+        if emitted:
+            insert_sensor_data(db_conn, emitted)
+
+    def spill(reading: Reading) -> None:
+        # Only reached when the database has fallen BUS_QUEUE_SIZE readings behind
+        save_to_json_queue(reading.sensor_id, reading.value, datetime.fromtimestamp(reading.timestamp), reading.raw)
+
+    uploaded: Dict[int, float] = {}
+
+    def upload_frames(readings: List[Reading]) -> None:
+        upload_image = profiler.import_module('app.sensors.camera').upload_image
+        for reading in readings:
+            # The camera ticks as often as its cycle says, the detection API gets one frame per interval
+            if reading.timestamp - uploaded.get(reading.sensor_id, float('-inf')) < config.CAMERA_UPLOAD_INTERVAL:
+                continue
+            if upload_image(reading.payload):
+                uploaded[reading.sensor_id] = reading.timestamp
+
+    bus.subscribe(Subscriber('latest', record_latest, accepts=_numeric))
+    if segment_store:
+        bus.subscribe(Subscriber('segments', append_segments, accepts=_numeric))
+    bus.subscribe(Subscriber('metrics', export_metrics, accepts=_numeric))
+    bus.subscribe(Subscriber(
+        'database', report, maxsize=config.BUS_QUEUE_SIZE, overflow=OVERFLOW_SPILL, spill=spill,
+        batch_size=config.BUS_DB_BATCH_SIZE, batch_timeout=config.BUS_DB_BATCH_SECONDS, accepts=_numeric,
+    ))
+    # Uploads are slow, keep only the newest frames
+    bus.subscribe(Subscriber('camera', upload_frames, maxsize=2, accepts=lambda reading: reading.payload is not None))
+    return bus
 
 ################################################################################
 # Cycle Worker Function
 ################################################################################
 
-def cycle_worker(sensor_id: int, sensor, cycle: Dict[str, Any], stop_event: multiprocessing.Event, db_conn, sensor_type: str):
+def create_sensor(sensor_type: str):
+    """
+    Imports the driver for a sensor type on demand and constructs it.
+    Returns None for unknown sensor types.
+    """
+    driver = SENSOR_DRIVERS.get(sensor_type)
+    if driver is None:
+        return None
+    module_name, class_name, kwargs = driver
+    module = profiler.import_module(module_name)
+    with profiler.phase(f"init {class_name}"):
+        return getattr(module, class_name)(**kwargs)
+
+
+def init_sensor(sensor_type: str, sensor_id: Optional[int] = None):
+    """
+    Creates a sensor driver ready for reading, after claiming the pins it drives for the sensor.
+    Raises ResourceBusy if another sensor or relay holds one of them.
+    """
+    if arbiter and sensor_id is not None:
+        for pin in SENSOR_HARDWARE.get(sensor_type, ((), None))[0]:
+            arbiter.claim(pin, f"sensor:{sensor_id}")
+    sensor = create_sensor(sensor_type)
+    if sensor_type == 'light' and sensor:
+        sensor.power_on()
+    return sensor
+
+
+def release_sensor(sensor, sensor_type: Optional[str] = None) -> None:
+    """
+    Frees the hardware held by a driver instance that is being replaced. Drivers of GPIO pins
+    are left alone: RPi.GPIO keeps one pin state per process, so cleaning them up would
+    unconfigure the same pins the replacement has just set up.
+    """
+    if SENSOR_HARDWARE.get(sensor_type, ((), None))[0]:
+        return
+    for name in ('cleanup', 'power_down', 'stop_monitoring'):
+        if hasattr(sensor, name):
+            getattr(sensor, name)()
+            return
+
+
+def hardware_turn(sensor_id: int, map_value: str):
+    """
+    Context manager holding the sensor's bus or pin for one tick, in turn with other processes.
+    Raises ResourceBusy if a bus read waited HARDWARE_WAIT_TIMEOUT seconds for its turn.
+    """
+    resource = SENSOR_HARDWARE.get(map_value, ((), None))[1]
+    if not arbiter or not resource:
+        return nullcontext()
+    # A pump run waits for the run ahead of it however long it is, bus reads give up
+    timeout = None if map_value in PUMP_TYPES else config.HARDWARE_WAIT_TIMEOUT
+    return arbiter.transaction(resource, f"sensor:{sensor_id}", timeout)
+
+
+def read_sensor(sensor, map_value: str, interval: float) -> Tuple[Union[float, bytes, None], Optional[int]]:
+    """
+    Performs the tick's action and returns (reading, raw driver count), the count only for
+    drivers that keep one (pH ADC, BH1750, DS18B20).
+    """
+    if map_value in ('tank1', 'tank2'):
+        # The monitor is shared with its polling thread, take the temperature and its count together
+        return sensor.read_tank_and_raw("Tank 1" if map_value == 'tank1' else "Tank 2")
+    value = perform_sensor_action(sensor, map_value, interval)
+    raw = getattr(sensor, 'last_raw', None) if isinstance(value, (int, float)) else None
+    return value, raw
+
+
+def perform_sensor_action(sensor, map_value: str, interval: float) -> Union[float, bytes, None]:
+    """
+    Performs the sensor-specific action for one tick.
+    Returns the reading for sensors that produce one (JPEG bytes for the camera), otherwise None.
+    """
+    if map_value == 'ultrasonic':
+        return sensor.get_median_distance()
+    elif map_value == 'env_temp':
+        return sensor.read_temperature()
+    elif map_value == 'humidity':
+        return sensor.read_humidity()
+    elif map_value == 'camera':
+        return sensor.capture_jpeg()
+    elif map_value == 'ph':
+        return sensor.read_ph()
+    elif map_value == 'tank1':
+        return sensor.read_tank("Tank 1")
+    elif map_value == 'tank2':
+        return sensor.read_tank("Tank 2")
+    elif map_value == 'light':
+        return sensor.read_light()
+    elif map_value in PUMP_TYPES:
+        sensor.run_pump(duration=interval)
+    return None
+
+
+def cycle_worker(sensor_id: int, sensor, cycle: Dict[str, Any], stop_event: multiprocessing.Event, db_conn, sensor_type: str, sensor_config: Dict[str, Any] = None):
     """
     Handles the execution of a single cycle for a sensor.
     Updates the cycle status to inactive after it completes.
@@ -230,95 +460,175 @@ def cycle_worker(sensor_id: int, sensor, cycle: Dict[str, Any], stop_event: mult
     duration = cycle['duration_minutes'] * 60
     pause = cycle['pause']
     map_value = sensor_type
+    policy = ReportPolicy.from_config(sensor_config)
 
     logger.info(f"Cycle Worker {cycle_number} (Cycle ID: {cycle_id}) started for Sensor ID {sensor_id}. Duration: {duration}s, Interval: {interval}s, Map: {map_value}")
 
-    cycle_start = time.time()
-    try:
-        while not stop_event.is_set():
-            elapsed_time = time.time() - cycle_start
-            remaining_time = max(0, duration - elapsed_time)
+    # Resume the duration window (or the pause) of a cycle interrupted by a restart
+    checkpoint = CycleCheckpoint(config.CHECKPOINT_DIR, sensor_id, cycle, config.CHECKPOINT_WRITE_INTERVAL, config.CHECKPOINT_MAX_AGE)
+    state = checkpoint.load()
+    elapsed = min(state['elapsed'], duration) if state else 0
+    phase = state['phase'] if state else 'running'
+    if state:
+        logger.info(f"Cycle Worker {cycle_number} (Cycle ID: {cycle_id}) resuming at {elapsed:.0f}s of {duration}s ({state['phase']}).")
 
-            if remaining_time <= 0:
+    # A pump tick keeps the pump on for `interval` and off for `interval`
+    period = interval * 2 if sensor_type in PUMP_TYPES else interval
+    try:
+        schedule = FixedRateSchedule.from_config(period, sensor_config)
+    except (TypeError, ValueError) as e:
+        # A bad "schedule" section must not stop the cycle, it runs on the plain period
+        logger.error(f"Invalid schedule config for Sensor ID {sensor_id}, using the default schedule | Error: {e}")
+        schedule = FixedRateSchedule(period)
+    # Pump ticks drive the pump rather than sample a signal, they keep the fixed period
+    try:
+        adaptive = AdaptiveInterval.from_config(period, sensor_config) if sensor_type not in PUMP_TYPES else None
+    except (TypeError, ValueError) as e:
+        logger.error(f"Invalid adaptive config for Sensor ID {sensor_id}, sampling at the fixed rate | Error: {e}")
+        adaptive = None
+    if adaptive:
+        schedule.set_interval(adaptive.interval)
+    conditioning = ConditioningChain.from_config(sensor_config) if sensor_type not in PUMP_TYPES else None
+    # Driver calls run on a worker thread with a deadline, a driver that keeps missing it is replaced
+    read_timeout = (sensor_config or {}).get('read_timeout', config.READ_TIMEOUTS.get(sensor_type))
+    guard = DriverGuard(f"{map_value}:{sensor_id}", sensor, read_timeout, factory=lambda: init_sensor(sensor_type, sensor_id),
+                        release=lambda driver: release_sensor(driver, sensor_type), max_misses=config.READ_TIMEOUT_RECYCLE, max_stuck=config.READ_TIMEOUT_MAX_STUCK)
+    SAMPLE_INTERVAL.labels(sensor_id).set(schedule.interval)
+    cycle_end = time.monotonic() + duration - elapsed
+    completed = False
+    bus = build_reading_bus(db_conn, policy).start()
+    try:
+        while not stop_event.is_set() and phase == 'running':
+            if schedule.deadline() >= cycle_end:
                 break
 
+            missed = schedule.missed
+            tick = schedule.wait(stop_event)
+            if tick is None:
+                break
+            scheduled, timestamp = tick
+            if scheduled >= cycle_end:
+                break
+            if schedule.missed > missed:
+                skipped = schedule.missed - missed
+                TICKS_MISSED.labels(sensor_id).inc(skipped)
+                # One record per dropped grid point, at its own due time, given up when this tick ran
+                for dropped in range(schedule.tick - 1 - skipped, schedule.tick - 1):
+                    tracer.record(sensor_id, cycle_id, schedule.deadline(dropped), scheduled, scheduled, TICK_SKIPPED)
+
+            tick_start = time.monotonic()
+            outcome = TICK_OK
             try:
-                # Perform sensor-specific actions here
-                if isinstance(sensor, UltrasonicSensor):
-                    dist = sensor.get_median_distance()
-                    if dist is not None:
-                        insert_sensor_data(db_conn, sensor_id, dist)
-                elif isinstance(sensor, DHT22Sensor):
-                    if map_value == 'env_temp':
-                        temperature_c = sensor.read_temperature()
-                        if temperature_c is not None:
-                            insert_sensor_data(db_conn, sensor_id, temperature_c)
-                    if map_value == 'humidity':
-                        humidity = sensor.read_humidity()
-                        if humidity is not None:
-                            insert_sensor_data(db_conn, sensor_id, humidity)
-                elif isinstance(sensor, CameraCapture):
-                    try:
-                        sensor.start()
-                    except RuntimeError as e:
-                        logger.info(e)
-                elif isinstance(sensor, SensorReader):
-                    if map_value == 'ph':
-                        ph = sensor.read_ph()
-                        if ph is not None:
-                            insert_sensor_data(db_conn, sensor_id, ph)
-                            
-                elif isinstance(sensor, TemperatureMonitor):
-                    sensor.monitor_temperatures()
-                    if map_value == 'tank1':
-                        tank_1 = sensor.get_tank_1_temp()
-                        logger.info(tank_1)
-                        if tank_1 is not None:
-                            insert_sensor_data(db_conn, sensor_id, tank_1)
-                    elif map_value == 'tank2':
-                        tank_2 = sensor.get_tank_2_temp()
-                        logger.info(tank_2)
-
-                        if tank_2 is not None:
-                            insert_sensor_data(db_conn, sensor_id, tank_2)
-
-                elif isinstance(sensor, LightSensor):
-                    light_level = sensor.read_light()
-                    if light_level is not None:
-                        insert_sensor_data(db_conn, sensor_id, light_level)
-                
-                elif isinstance(sensor, PumpActivator):
-                    if map_value == 'pump_2':
-                        sensor.run_pump(duration=interval) 
-                    elif map_value == 'pump_tank':
-                        sensor.run_pump(duration=interval)         
-
+                # The turn is taken outside the guard: queueing for the bus is not a driver miss,
+                # and a call the guard gives up on hands the bus to the next process
+                with hardware_turn(sensor_id, map_value):
+                    read_start = time.perf_counter()
+                    value, raw = guard.call(read_sensor, map_value, interval)
+                    READ_SECONDS.labels(sensor_id, map_value).observe(time.perf_counter() - read_start)
+                if isinstance(value, bytes):
+                    bus.publish(Reading(sensor_id, map_value, math.nan, timestamp, value))
+                elif value is not None:
+                    if conditioning:
+                        value = conditioning.update(value, timestamp)
+                    bus.publish(Reading(sensor_id, map_value, value, timestamp, raw=raw))
+                    if adaptive:
+                        next_interval = adaptive.update(value, timestamp)
+                        if next_interval != schedule.interval:
+                            logger.debug(f"Sensor ID {sensor_id} sampling every {next_interval:.1f}s (was {schedule.interval:.1f}s).")
+                            schedule.set_interval(next_interval)
+                            SAMPLE_INTERVAL.labels(sensor_id).set(next_interval)
+                else:
+                    outcome = TICK_NO_VALUE
+                    if latest_values and map_value not in PUMP_TYPES and map_value != 'camera':
+                        latest_values.mark(sensor_id, STATUS_MISSING, timestamp)
+            except (ReadTimeout, ResourceBusy) as e:
+                outcome = TICK_TIMEOUT
+                if latest_values:
+                    latest_values.mark(sensor_id, STATUS_TIMEOUT, timestamp)
+                if isinstance(e, ReadTimeout):
+                    READ_TIMEOUTS.labels(sensor_id, map_value).inc()
+                logger.warning(f"Cycle {cycle_number} | Sensor ID {sensor_id}: {e}")
             except Exception as e:
+                outcome = TICK_ERROR
+                if latest_values:
+                    latest_values.mark(sensor_id, STATUS_ERROR, timestamp)
+                READ_ERRORS.labels(sensor_id, map_value).inc()
                 logger.error(f"Error in Cycle {cycle_number} | Sensor ID {sensor_id}: {e}\n{traceback.format_exc()}")
-
-            time.sleep(interval)
+            tracer.record(sensor_id, cycle_id, scheduled, tick_start, time.monotonic(), outcome)
+            checkpoint.save(duration - (cycle_end - time.monotonic()), schedule.timestamp(schedule.tick))
 
         if pause > 0 and not stop_event.is_set():
-            logger.info(f"Cycle Worker {cycle_number} (Cycle ID: {cycle_id}) pausing for {pause} seconds.")
-            time.sleep(pause)
+            pause_end = state['next_deadline'] if phase == 'pausing' else time.time() + pause
+            phase = 'pausing'
+            checkpoint.save(duration, pause_end, phase=phase, force=True)
+            remaining_pause = max(0, pause_end - time.time())
+            logger.info(f"Cycle Worker {cycle_number} (Cycle ID: {cycle_id}) pausing for {remaining_pause:.0f} seconds.")
+            stop_event.wait(remaining_pause)
+
+        completed = not stop_event.is_set()
 
     finally:
+        if completed:
+            checkpoint.clear()
+        elif phase == 'running':
+            checkpoint.save(duration - max(0, cycle_end - time.monotonic()), schedule.timestamp(schedule.tick), force=True)
         # Update the cycle status to inactive after completion
         logger.info(f"Cycle Worker {cycle_number} (Cycle ID: {cycle_id}) for Sensor ID {sensor_id} has completed.")
+        if policy.enabled:
+            logger.info(f"Report policy for Sensor ID {sensor_id}: {policy.stats()}")
+        if adaptive:
+            logger.info(f"Adaptive sampling for Sensor ID {sensor_id}: {adaptive.stats()}")
+        if guard.timeouts:
+            logger.info(f"Read deadlines for Sensor ID {sensor_id}: {guard.stats()}")
+        guard.close()
+        bus.stop()
+        metrics.flush()
+        if tracer.enabled and tracer.count:
+            tracer.dump()
         # update_cycle_status(db_conn, sensor_id, cycle_id)
 
 ################################################################################
 # Sensor Runner Function
 ################################################################################
 
-def run_sensor(sensor_id: int, stop_event: multiprocessing.Event, sensor_type: str):
+def restart_crashed_cycles(sensor_id: int, cycle_processes: Dict[int, multiprocessing.Process], running_cycles: Dict[int, Any],
+                           cycle_stops: Dict[int, Any], cycle_started: Dict[int, float]) -> bool:
+    """
+    Forgets cycle processes that died without completing their cycle, so they are started again.
+    A cycle that finished exits with code 0 and stays done. Returns True if any was forgotten.
+    """
+    crashed = False
+    for cycle_id, process in list(cycle_processes.items()):
+        if process.is_alive() or process.exitcode == 0:
+            continue
+        if time.monotonic() - cycle_started[cycle_id] < config.PROCESS_RESTART_DELAY:
+            continue
+        logger.warning(f"Cycle ID {cycle_id} for Sensor ID {sensor_id} died with exit code {process.exitcode}, restarting it.")
+        PROCESS_RESTARTS.labels(sensor_id).inc()
+        cycle_processes.pop(cycle_id)
+        running_cycles.pop(cycle_id)
+        cycle_stops.pop(cycle_id)
+        cycle_started.pop(cycle_id)
+        crashed = True
+    return crashed
+
+
+def run_sensor(sensor_id: int, stop_event: multiprocessing.Event, sensor_type: str, sensor_config: Dict[str, Any],
+               cycles: Tuple[Dict[str, Any], ...], updates) -> None:
     """
-    Initializes and runs sensor processes, managing cycles based on the is_active flag.
-    Starts cycles only if they are active, otherwise waits for cycles to be activated.
+    Initializes a sensor and runs one process per active cycle.
+    :param cycles: The sensor's active cycles from the configuration snapshot.
+    :param updates: Receiving end of a pipe, main sends the new cycles whenever they change.
     """
     sensor = None
     db_conn = None
+    exit_code = 0
     cycle_processes = {}
+    running_cycles = {}
+    cycle_started = {}
+    # Each cycle gets its own stop event: a process terminated while waiting on a shared
+    # multiprocessing.Event would leave later set() calls on it blocked forever
+    cycle_stops = {}
 
     try:
         db_conn = db
@@ -326,66 +636,69 @@ def run_sensor(sensor_id: int, stop_event: multiprocessing.Event, sensor_type: s
             logger.error(f"Database connection unavailable for Sensor ID {sensor_id}.")
             return
 
-        if sensor_type == 'ultrasonic':
-            sensor = UltrasonicSensor(trig_pin=18, echo_pin=15)
-        elif sensor_type in ['ph']:
-            sensor = SensorReader()
-        elif sensor_type in ['tank1', 'tank2']:
-            sensor = TemperatureMonitor()
-        elif sensor_type == 'light':
-            sensor = LightSensor()
-            sensor.power_on()
-        elif sensor_type in ['env_temp', 'humidity']:
-            sensor = DHT22Sensor()
-        elif sensor_type == 'camera':
-            sensor = CameraCapture()
-        elif sensor_type  == 'pump_tank':
-            sensor = PumpActivator(gpio_pin=16)
-        elif sensor_type ==  'pump_2':
-            sensor = PumpActivator(gpio_pin=20)
+        sensor = init_sensor(sensor_type, sensor_id)
 
         logger.info(f"Sensor ID {sensor_id} of type '{sensor_type}' initialized.")
+        logger.info(profiler.report(f"Sensor ID {sensor_id} startup"))
 
         while not stop_event.is_set():
-            activate_all_cycles(db_conn, sensor_id)
+            active_cycles = {cycle['cycle_id']: cycle for cycle in cycles}
 
-            cycles = fetch_cycles(db_conn, sensor_id)
-            active_cycle_ids = {cycle['cycle_id'] for cycle in cycles}
+            # Cycles that were removed, deactivated or changed stop first
+            for cycle_id in list(cycle_processes.keys()):
+                if active_cycles.get(cycle_id) != running_cycles[cycle_id]:
+                    process = cycle_processes.pop(cycle_id)
+                    running_cycles.pop(cycle_id)
+                    cycle_started.pop(cycle_id)
+                    cycle_stops.pop(cycle_id).set()
+                    process.join(timeout=5)
+                    if process.is_alive():
+                        logger.info(f"Terminating Cycle ID {cycle_id} for Sensor ID {sensor_id} as it is no longer active.")
+                        process.terminate()
+                        process.join(timeout=5)
+                        if process.is_alive():
+                            logger.warning(f"Cycle ID {cycle_id} for Sensor ID {sensor_id} did not terminate gracefully.")
 
-            for cycle in cycles:
-                cycle_id = cycle['cycle_id']
+            for cycle_id, cycle in active_cycles.items():
                 if cycle_id not in cycle_processes:
+                    cycle_stops[cycle_id] = multiprocessing.Event()
                     process = multiprocessing.Process(
                         target=cycle_worker,
-                        args=(sensor_id, sensor, cycle, stop_event, db_conn, sensor_type),
+                        args=(sensor_id, sensor, cycle, cycle_stops[cycle_id], db_conn, sensor_type, sensor_config),
                         name=f"Sensor-{sensor_id}-Cycle-{cycle_id}-Process"
                     )
                     process.start()
                     cycle_processes[cycle_id] = process
+                    running_cycles[cycle_id] = cycle
+                    cycle_started[cycle_id] = time.monotonic()
                     logger.info(f"Started Cycle ID {cycle_id} for Sensor ID {sensor_id}.")
 
-            for cycle_id in list(cycle_processes.keys()):
-                if cycle_id not in active_cycle_ids:
-                    process = cycle_processes.pop(cycle_id)
-                    if process.is_alive():
-                        logger.info(f"Terminating Cycle ID {cycle_id} for Sensor ID {sensor_id} as it is no longer active.")
-                        process.terminate()
-                        process.join(timeout=5)
-                        if process.is_alive():
-                            logger.warning(f"Cycle ID {cycle_id} for Sensor ID {sensor_id} did not terminate gracefully.")
-
-            if not active_cycle_ids:
+            if not active_cycles:
                 logger.info(f"No active cycles found for Sensor ID {sensor_id}. Waiting for cycles to be activated...")
             else:
                 logger.info(f"Monitoring active cycles for Sensor ID {sensor_id}.")
 
-            time.sleep(36000)
-
+            # Wait for new cycles or a crashed cycle process, checking the stop event every second
+            while not stop_event.is_set():
+                if updates.poll(1.0):
+                    while updates.poll():
+                        cycles = updates.recv()
+                    break
+                if restart_crashed_cycles(sensor_id, cycle_processes, running_cycles, cycle_stops, cycle_started):
+                    break
+
+    except ResourceBusy as e:
+        # Main leaves the sensor stopped until its configuration changes, rather than retrying
+        logger.error(f"Sensor ID {sensor_id} of type '{sensor_type}' not started: {e}")
+        exit_code = EXIT_HARDWARE_BUSY
     except Exception as e:
         logger.error(f"Error in {sensor_type}_sensor for Sensor ID {sensor_id}: {e}\n{traceback.format_exc()}")
     finally:
-        # Terminate all running cycle processes
+        # Give cycle processes a moment to checkpoint after a stop, then terminate the rest
+        for cycle_stop in cycle_stops.values():
+            cycle_stop.set()
         for cycle_id, process in cycle_processes.items():
+            process.join(timeout=5)
             if process.is_alive():
                 logger.info(f"Terminating Cycle ID {cycle_id} for Sensor ID {sensor_id} during shutdown.")
                 process.terminate()
@@ -403,54 +716,174 @@ def run_sensor(sensor_id: int, stop_event: multiprocessing.Event, sensor_type: s
         if db_conn:
             db_conn.close()
             logger.info(f"Database connection closed for Sensor ID {sensor_id}.")
+    if exit_code:
+        sys.exit(exit_code)
 
-def activate_all_cycles(db_conn, sensor_id: int) -> None:
+################################################################################
+# Configuration Snapshot
+################################################################################
+
+def refresh_snapshot(db_conn, current: Optional[ConfigSnapshot], activate_cycles: bool = False) -> ConfigSnapshot:
     """
-    Activates all cycles for a given sensor by setting is_active = 1.
+    Loads sensors, cycles and relays in one go. If the database cannot be read the current
+    snapshot is kept, or at startup the one cached by the last successful load.
+    :param activate_cycles: Switch every cycle of an active sensor back on first, done once at
+                            startup so cycles an operator deactivates stay off until a restart.
     """
     try:
-        update_query = """
-            UPDATE cycles
-            SET is_active = '1'
-            WHERE sensor_id = %s AND is_active = '0'
-        """
-        db_conn.execute_query(update_query, (sensor_id,))
-        logger.info(f"All cycles for Sensor ID {sensor_id} have been activated.")
+        snapshot = load_snapshot(db_conn, activate_cycles)
     except Exception as e:
-        logger.error(f"Failed to activate all cycles for Sensor ID {sensor_id} | Error: {e}\n{traceback.format_exc()}")
+        logger.error(f"Failed to load configuration from the database | Error: {e}")
+        if current is not None:
+            return current
+        snapshot = load_cache(config.CONFIG_CACHE_FILE)
+        if snapshot is None:
+            logger.error("No cached configuration, starting without sensors.")
+            return ConfigSnapshot.from_json({'sensors': {}, 'cycles': {}, 'relays': {}})
+        logger.warning(f"Using cached configuration {snapshot.version} from {datetime.fromtimestamp(snapshot.loaded_at)}.")
+        return snapshot
+
+    if current is None or snapshot.version != current.version:
+        logger.info(f"Loaded configuration {snapshot.version}: {len(snapshot.sensors)} sensors, "
+                    f"{sum(len(cycles) for cycles in snapshot.cycles.values())} cycles, {len(snapshot.relays)} relays.")
+        save_cache(snapshot, config.CONFIG_CACHE_FILE)
+    return snapshot
+
+def check_hardware(snapshot: ConfigSnapshot) -> Set[int]:
+    """
+    Logs GPIO pins that more than one sensor or relay of this node would drive, and sensors
+    whose cycles take turns on their pins. Returns the IDs of sensors that are not started
+    because of a conflict: a relay keeps its pin over a sensor, otherwise the sensor first in
+    name order keeps it. Deciding here, not by whichever process claims the pin first, keeps
+    the losing sensor from being restarted over and over.
+    """
+    uses = []
+    for sensor_id, sensor_config in snapshot.sensors.items():
+        if sensor_config.get('node') not in (None, config.NODE_ID):
+            continue
+        pins, resource = SENSOR_HARDWARE.get(sensor_config.get('map'), ((), None))
+        owner = f"sensor:{sensor_id}"
+        uses.extend(HardwareUse(owner, pin, True) for pin in pins)
+        if resource and resource not in pins:
+            uses.append(HardwareUse(owner, resource, False))
+        cycles = snapshot.cycles_for(sensor_id)
+        if pins and len(cycles) > 1:
+            logger.warning(f"Sensor ID {sensor_id} has {len(cycles)} active cycles on {', '.join(pins)}, their ticks take turns.")
+    for relay_id, relay in snapshot.relays.items():
+        if relay.gpio is not None and config.NODE_RELAYS.get(relay_id) in (None, config.NODE_ID):
+            uses.append(HardwareUse(f"relay:{relay_id}", f"gpio:{relay.gpio}", True))
+    for conflict in find_conflicts(uses):
+        logger.error(f"Hardware conflict: {conflict}.")
+    blocked = set()
+    for owner, resource in conflict_losers(uses).items():
+        if owner.startswith('sensor:'):
+            logger.error(f"Sensor ID {owner.split(':', 1)[1]} is not started, {resource} is kept for another owner.")
+            blocked.add(int(owner.split(':', 1)[1]))
+    return blocked
 
 ################################################################################
-# Sensor Fetching Function
+# Background Jobs
 ################################################################################
 
-def fetch_sensors_from_db(db_conn) -> Dict[int, str]:
+def maintain_segments() -> None:
     """
-    Fetches all active sensors from the database and maps their IDs to their types.
+    Compacts and expires segment store files in the background of the main process.
     """
-    try:
-        select_query = """
-            SELECT id, config
-            FROM sensors
-            WHERE is_active = 1
-        """
-        sensors = db_conn.fetch_all(select_query, (), dictionary=True)
-        sensor_map = {}
-        for sensor in sensors:
+    while True:
+        segment_store.maintain(config.SEGMENTS_COMPACT_AFTER, config.SEGMENTS_COMPACT_SPAN, config.SEGMENTS_RETENTION)
+        time.sleep(config.SEGMENTS_MAINTENANCE_INTERVAL)
+
+def run_retention() -> None:
+    """
+    Rolls up and expires old sensor_data rows every RETENTION_INTERVAL seconds.
+    Each run is bounded by RETENTION_MAX_SECONDS and resumes where the last one stopped.
+    """
+    while True:
+        try:
+            connection = connect_mysql(db)
             try:
-                config = json.loads(sensor['config'])
-                sensor_type = config.get('map')
-                if sensor_type:
-                    sensor_map[sensor['id']] = sensor_type
-                else:
-                    logger.warning(f"Sensor ID {sensor['id']} has no 'map' configuration.")
-            except json.JSONDecodeError as json_err:
-                logger.error(f"JSON decode error for Sensor ID {sensor['id']}: {json_err}")
-        logger.info(f"Fetched {len(sensor_map)} active sensors from the database.")
-        return sensor_map
-    except Exception as e:
-        logger.error(f"Failed to fetch sensors from database | Error: {e}\n{traceback.format_exc()}")
-        return {}
+                RetentionJob(
+                    connection,
+                    raw_days=config.RETENTION_RAW_DAYS,
+                    hourly_days=config.RETENTION_HOURLY_DAYS,
+                    chunk_hours=config.RETENTION_CHUNK_HOURS,
+                    delete_batch=config.RETENTION_DELETE_BATCH,
+                    max_seconds=config.RETENTION_MAX_SECONDS,
+                    drop_partitions=config.RETENTION_DROP_PARTITIONS,
+                ).run()
+            finally:
+                connection.close()
+        except Exception as e:
+            logger.error(f"Retention run failed: {e}")
+        time.sleep(config.RETENTION_INTERVAL)
+
+def reconcile_sensor_processes(snapshot: ConfigSnapshot, owned: Set[str], processes: Dict[int, multiprocessing.Process],
+                               stop_events: Dict[int, Any], channels: Dict[int, Dict[str, Any]],
+                               blocked: Set[int] = frozenset()) -> None:
+    """
+    Starts the processes of sensors this node owns and stops those of sensors it no longer owns
+    or that were deactivated. A sensor whose config changed is restarted, one whose cycles
+    changed is sent the new cycles. A process that died is started again, at most once every
+    PROCESS_RESTART_DELAY seconds, unless it exited because its pins were taken: that one waits
+    for a configuration change.
 
+    :param blocked: Sensors not to run because of a hardware conflict (see check_hardware).
+    """
+    for sensor_id in list(processes.keys()):
+        sensor_config = snapshot.sensors.get(sensor_id)
+        process = processes[sensor_id]
+        unchanged = (f"sensor:{sensor_id}" in owned and sensor_id not in blocked
+                     and sensor_config == channels[sensor_id]['config'])
+        dead = unchanged and not process.is_alive()
+        if dead and process.exitcode == EXIT_HARDWARE_BUSY:
+            continue
+        if dead and time.monotonic() - channels[sensor_id]['started'] < config.PROCESS_RESTART_DELAY:
+            continue
+        if unchanged and not dead:
+            continue
+        stop_events.pop(sensor_id).set()
+        processes.pop(sensor_id)
+        channels.pop(sensor_id)['pipe'].close()
+        process.join(timeout=10)
+        if process.is_alive():
+            process.terminate()
+        if dead:
+            logger.warning(f"Process for Sensor ID {sensor_id} died with exit code {process.exitcode}, restarting it.")
+            PROCESS_RESTARTS.labels(sensor_id).inc()
+        elif sensor_config is None:
+            logger.info(f"Stopped process for Sensor ID {sensor_id}, the sensor is no longer active.")
+        elif f"sensor:{sensor_id}" not in owned:
+            logger.info(f"Stopped process for Sensor ID {sensor_id}, it is now run by another node.")
+        elif sensor_id in blocked:
+            logger.info(f"Stopped process for Sensor ID {sensor_id}, its pins are now kept for another owner.")
+        else:
+            logger.info(f"Stopped process for Sensor ID {sensor_id} to apply its new configuration.")
+
+    for sensor_id, sensor_config in snapshot.sensors.items():
+        cycles = snapshot.cycles_for(sensor_id)
+        if f"sensor:{sensor_id}" not in owned or sensor_id in blocked:
+            continue
+        if sensor_id in processes:
+            channel = channels[sensor_id]
+            # A dead process gets the current cycles when it is restarted
+            if channel['cycles'] != cycles and processes[sensor_id].is_alive():
+                channel['pipe'].send(cycles)
+                channel['cycles'] = cycles
+            continue
+        sensor_type = sensor_config['map']
+        stop_events[sensor_id] = multiprocessing.Event()
+        receiver, sender = multiprocessing.Pipe(duplex=False)
+        process = multiprocessing.Process(
+            target=run_sensor,
+            args=(sensor_id, stop_events[sensor_id], sensor_type, sensor_config, cycles, receiver),
+            name=f"Sensor-{sensor_id}-Process"
+            # Removed daemon=True to allow child processes
+        )
+        process.start()
+        receiver.close()
+        processes[sensor_id] = process
+        channels[sensor_id] = {'pipe': sender, 'config': sensor_config, 'cycles': cycles, 'started': time.monotonic()}
+        logger.info(f"Started process for Sensor ID {sensor_id} with Sensor Type '{sensor_type}'.")
 
 ################################################################################
 # Main Function
@@ -460,8 +893,28 @@ def main() -> None:
     """
     Main entry point of the application. Initializes and manages sensor processes.
     """
-    stop_event = multiprocessing.Event()
-    processes = {}
+    global latest_values
+    stop_events: Dict[int, Any] = {}
+    processes: Dict[int, multiprocessing.Process] = {}
+    channels: Dict[int, Dict[str, Any]] = {}
+    # Renewal runs in the relay loop: a database that stops answering must fail it within NODE_DB_TIMEOUT
+    ownership = NodeOwnership(config.NODE_ID, lambda: connect_mysql(db, timeout=config.NODE_DB_TIMEOUT),
+                              config.NODE_LEASE_SECONDS, config.NODE_LEASES_ENABLED)
+
+    latest_values = LatestValueTable.create(config.SHM_NAME, config.SHM_CAPACITY)
+
+    if config.METRICS_ENABLED:
+        metrics.clear_directory()
+        serve_metrics(config.METRICS_HOST, config.METRICS_PORT)
+    if config.API_ENABLED:
+        serve_api(config.API_HOST, config.API_PORT, latest_values, history, config.API_POLL_INTERVAL)
+    if config.STREAM_ENABLED:
+        hub = FrameHub(open_stream_camera, config.STREAM_FPS, config.STREAM_IDLE_SECONDS, config.STREAM_WARMUP_FRAMES)
+        serve_stream(config.STREAM_HOST, config.STREAM_PORT, hub)
+    if segment_store:
+        threading.Thread(target=maintain_segments, name="SegmentMaintenance", daemon=True).start()
+    if config.RETENTION_ENABLED:
+        threading.Thread(target=run_retention, name="Retention", daemon=True).start()
 
     try:
         main_db_conn = db
@@ -469,34 +922,58 @@ def main() -> None:
             logger.critical("Main database connection is unavailable. Exiting application.")
             return
 
-        sensor_processes_info = fetch_sensors_from_db(main_db_conn)
-
-        for sensor_id, sensor_type in sensor_processes_info.items():
-            process = multiprocessing.Process(
-                target=run_sensor,
-                args=(sensor_id, stop_event, sensor_type),
-                name=f"Sensor-{sensor_id}-Process"
-                # Removed daemon=True to allow child processes
-            )
-            process.start()
-            processes[sensor_id] = process
-            logger.info(f"Started process for Sensor ID {sensor_id} with Sensor Type '{sensor_type}'.")
-            
-
-        logger.info("All sensor processes have been started. Entering main loop.")
+        with profiler.phase("load configuration"):
+            snapshot = refresh_snapshot(main_db_conn, None, activate_cycles=True)
+        blocked = check_hardware(snapshot)
+
+        RelayController = profiler.import_module('app.sensors.relay').RelayController
+        owned: Set[str] = set()
+        next_renewal = 0.0
+        next_refresh = time.monotonic() + config.CONFIG_REFRESH_INTERVAL
+        # Asked on every poll, so relays are switched off as soon as their lease runs out
+        controller = RelayController(owns=lambda relay_id: ownership.holds(f"relay:{relay_id}"), relays=snapshot.relays, arbiter=arbiter)
+
+        def update_ownership(force: bool = False) -> None:
+            # Sensors and relays pinned to a node by config are not leased
+            nonlocal next_renewal, next_refresh, snapshot, blocked
+            if time.monotonic() >= next_refresh:
+                next_refresh = time.monotonic() + config.CONFIG_REFRESH_INTERVAL
+                refreshed = refresh_snapshot(main_db_conn, snapshot)
+                if refreshed.relays != snapshot.relays:
+                    controller.apply_config(refreshed.relays)
+                if refreshed.version != snapshot.version:
+                    blocked = check_hardware(refreshed)
+                    force = True
+                snapshot = refreshed
+            if not force and time.monotonic() < next_renewal:
+                expired = {resource for resource in owned if not ownership.holds(resource)}
+                owned.difference_update(expired)
+                if expired or any(not process.is_alive() and process.exitcode != EXIT_HARDWARE_BUSY for process in processes.values()):
+                    reconcile_sensor_processes(snapshot, owned, processes, stop_events, channels, blocked)
+                return
+            next_renewal = time.monotonic() + config.NODE_RENEW_INTERVAL
+            resources = {f"sensor:{sensor_id}": sensor_config.get('node') for sensor_id, sensor_config in snapshot.sensors.items()}
+            resources.update({f"relay:{relay_id}": config.NODE_RELAYS.get(relay_id) for relay_id in snapshot.relays})
+            owned.clear()
+            owned.update(ownership.update(resources))
+            reconcile_sensor_processes(snapshot, owned, processes, stop_events, channels, blocked)
+
+        logger.info(f"Node '{config.NODE_ID}' entering main loop.")
 
         while True:
-            controller = RelayController()
-            controller.run()
+            update_ownership(force=True)
+            logger.info(profiler.report("Main process startup"))
+            controller.run(on_poll=update_ownership)
             time.sleep(1)
 
     except KeyboardInterrupt:
         logger.info("KeyboardInterrupt received. Initiating graceful shutdown...")
-        stop_event.set()
     except Exception as e:
         logger.error(f"Error in main program: {e}\n{traceback.format_exc()}")
-        stop_event.set()
     finally:
+        for event in stop_events.values():
+            event.set()
+        ownership.release()
         logger.info("Shutting down all sensor processes...")
         for sensor_id, process in processes.items():
             process.join(timeout=5)
@@ -505,10 +982,74 @@ def main() -> None:
                 process.terminate()
             logger.info(f"Process for Sensor ID {sensor_id} has been terminated.")
         logger.info("All sensor processes have been shut down. Exiting application.")
+        latest_values.close()
+        stop_logging()
+
+################################################################################
+# Replay Mode
+################################################################################
+
+def replay_main(args) -> None:
+    """
+    Feeds recorded readings through the same reading bus as the live drivers, on a virtual
+    clock, and prints throughput and end-to-end lag per sink. Nothing touches the production
+    database, the offline queue or the local segment store unless asked to.
+    """
+    global segment_store
+    # Replayed readings must not reach the production metrics or sensor log, which is itself a replay input
+    metrics.configure(None)
+    stop_logging()
+    start_logging(f"replay_{os.getpid()}.log", max_bytes=config.LOG_MAX_BYTES, backup_count=0, levels=config.LOG_LEVELS,
+                  burst=config.LOG_RATE_LIMIT_BURST, period=config.LOG_RATE_LIMIT_PERIOD)
+    if not args.verbose:
+        logger.setLevel(logging.WARNING)
+    config.OFFLINE_QUEUE_FILE = f"replay_{os.getpid()}_queue.json"
+    segment_store = SegmentStore(args.segments) if args.segments else None
+
+    readings = replay.load_readings(args.replay)
+    if not readings:
+        print(f"No readings found in {args.replay}.")
+        return
+    sensor_configs = replay.load_sensor_configs(args.sensors) if args.sensors and os.path.exists(args.sensors) else {}
+
+    if args.db_host:
+        db_conn = db.__class__(host=args.db_host, user=args.db_user, password=args.db_password, database=args.db_name)
+    else:
+        db_conn = replay.NullDatabase()
+
+    # Each sensor's report policy and filters, as its cycle worker would apply them
+    policies = {sensor_id: ReportPolicy.from_config(sensor_config) for sensor_id, sensor_config in sensor_configs.items()}
+    bus = build_reading_bus(db_conn, ReportPolicy(), policies).start()
+    result = replay.replay(readings, bus, args.speed, sensor_configs)
+    print(replay.format_report(result))
+    if isinstance(db_conn, replay.NullDatabase):
+        print(f"Database: {db_conn.rows} rows in {db_conn.statements} statements (not written)")
+    if os.path.exists(config.OFFLINE_QUEUE_FILE):
+        print(f"Readings the database refused are in {config.OFFLINE_QUEUE_FILE}")
+    stop_logging()
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Hydroponics sensor logger.")
+    parser.add_argument('--replay', metavar='PATH',
+                        help="replay a sensor_data export (.json/.csv), the offline queue or a sensor log instead of running the sensors")
+    parser.add_argument('--speed', type=float, default=1.0, help="replay speed, times real time (0: as fast as possible)")
+    parser.add_argument('--sensors', default='sensors.json', help="sensors table export used to name sensor types")
+    parser.add_argument('--segments', metavar='DIR', help="also append replayed readings to a segment store in DIR")
+    parser.add_argument('--db-host', help="insert replayed readings into this (scratch) database")
+    parser.add_argument('--db-user', default='root')
+    parser.add_argument('--db-password', default='')
+    parser.add_argument('--db-name', default='hydroponics_replay')
+    parser.add_argument('--verbose', action='store_true', help="keep per-reading log lines during a replay")
+    return parser.parse_args()
 
 ################################################################################
 # Entry Point
 ################################################################################
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    arguments = parse_args()
+    if arguments.replay:
+        replay_main(arguments)
+    else:
+        main()
\ No newline at end of file
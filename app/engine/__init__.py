@@ -1,3 +1,3 @@
 from .db import MySQLWrapper  
+# Connects lazily on the first query, importing app.engine does not touch the network
 db = MySQLWrapper(host='139.99.97.250', user='hydroponics', password=')[ZEy032Zy_oe8C8', database='hydroponics')
-db.connect()
\ No newline at end of file
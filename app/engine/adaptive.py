@@ -0,0 +1,119 @@
+import math
+from typing import Any, Dict, Optional
+
+
+class AdaptiveInterval:
+    def __init__(self, min_interval: float, max_interval: float, threshold: float,
+                 alpha: float = 0.3, grow: float = 1.5, shrink: float = 0.5, jump: float = 3.0,
+                 initial: Optional[float] = None):
+        """
+        Picks a sensor's sampling interval from how fast its signal is changing.
+
+        Each reading updates an exponentially weighted mean, variance and slope. The expected
+        movement over one interval, max(|slope| * interval, standard deviation), is compared
+        with `threshold`, the smallest change worth seeing:
+            below half the threshold  - the interval grows by `grow`
+            above the threshold       - the interval shrinks by `shrink`
+            a reading off the trend by more than `jump` thresholds drops straight to the minimum
+        The interval always stays within [min_interval, max_interval]. A threshold below the
+        sensor's noise keeps it at the minimum.
+
+        :param min_interval: Shortest interval in seconds.
+        :param max_interval: Longest interval in seconds.
+        :param threshold: Change in sensor units that is worth sampling faster for.
+        :param alpha: Weight of the newest reading in the running estimates.
+        :param initial: Starting interval, clamped into range (default: min_interval).
+        """
+        if not 0 < min_interval <= max_interval:
+            raise ValueError("adaptive intervals need 0 < min_interval <= max_interval")
+        if threshold <= 0:
+            raise ValueError("adaptive threshold must be positive")
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.threshold = threshold
+        self.alpha = alpha
+        self.grow = grow
+        self.shrink = shrink
+        self.jump = jump
+        self.interval = self._clamp(initial if initial is not None else min_interval)
+
+        self.mean: Optional[float] = None
+        self.variance = 0.0
+        self.slope = 0.0
+        self.last_value: Optional[float] = None
+        self.last_time: Optional[float] = None
+        self.samples = 0
+        self.jumps = 0
+
+    @classmethod
+    def from_config(cls, interval: float, config: Optional[Dict[str, Any]]) -> Optional["AdaptiveInterval"]:
+        """
+        Builds the estimator from the "adaptive" section of a sensor config, e.g.
+        {"map": "ultrasonic", "adaptive": {"min_interval": 5, "max_interval": 300, "threshold": 0.5}}
+        Without that section the sensor keeps its fixed cycle interval and None is returned.
+        The threshold defaults to the report deadband.
+
+        :param interval: The cycle's interval_seconds, used as the starting interval.
+        """
+        adaptive = (config or {}).get('adaptive')
+        if not adaptive:
+            return None
+        threshold = adaptive.get('threshold', ((config or {}).get('report') or {}).get('deadband'))
+        if threshold is None:
+            raise ValueError("adaptive sampling needs a threshold (or a report deadband)")
+        return cls(
+            min_interval=float(adaptive.get('min_interval', interval)),
+            max_interval=float(adaptive.get('max_interval', interval)),
+            threshold=float(threshold),
+            alpha=float(adaptive.get('alpha', 0.3)),
+            grow=float(adaptive.get('grow', 1.5)),
+            shrink=float(adaptive.get('shrink', 0.5)),
+            jump=float(adaptive.get('jump', 3.0)),
+            initial=interval,
+        )
+
+    def update(self, value: float, timestamp: float) -> float:
+        """
+        Feeds a reading and returns the interval to wait before the next one.
+        """
+        self.samples += 1
+        if self.mean is None:
+            self.mean = value
+            self.last_value = value
+            self.last_time = timestamp
+            return self.interval
+
+        dt = timestamp - self.last_time
+        predicted = self.last_value + self.slope * dt
+        if dt > 0:
+            self.slope += self.alpha * ((value - self.last_value) / dt - self.slope)
+        diff = value - self.mean
+        increment = self.alpha * diff
+        self.mean += increment
+        self.variance = (1 - self.alpha) * (self.variance + diff * increment)
+        self.last_value = value
+        self.last_time = timestamp
+
+        if abs(value - predicted) > self.jump * self.threshold:
+            self.jumps += 1
+            self.interval = self.min_interval
+            return self.interval
+
+        change = max(abs(self.slope) * self.interval, math.sqrt(self.variance))
+        if change > self.threshold:
+            self.interval = self._clamp(self.interval * self.shrink)
+        elif change < self.threshold / 2:
+            self.interval = self._clamp(self.interval * self.grow)
+        return self.interval
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            'samples': self.samples,
+            'jumps': self.jumps,
+            'interval': self.interval,
+            'slope': self.slope,
+            'stddev': math.sqrt(self.variance),
+        }
+
+    def _clamp(self, interval: float) -> float:
+        return min(self.max_interval, max(self.min_interval, interval))
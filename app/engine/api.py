@@ -0,0 +1,179 @@
+import json
+import logging
+import math
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict
+from urllib.parse import parse_qs, urlparse
+
+from .rollup import HistoryStore
+from .shm import LatestValueTable, STATUS_NAMES, STATUS_OK
+
+logger = logging.getLogger(__name__)
+
+
+class ReadingsFeed:
+    def __init__(self, table: LatestValueTable, history: HistoryStore, poll_interval: float = 0.5):
+        """
+        Copies new readings from the shared-memory table into this process's history store.
+        Only slots whose sequence number moved are read, so a poll costs one integer read per sensor.
+
+        :param table: Latest-value table written by the sensor processes.
+        :param history: Store that receives every new OK reading.
+        :param poll_interval: Seconds between polls.
+        """
+        self.table = table
+        self.history = history
+        self.poll_interval = poll_interval
+        self.sequences: Dict[int, int] = {}
+        self.version = 0
+
+    def poll(self) -> int:
+        """Pulls new readings once, returns how many sensors changed."""
+        changed = 0
+        for sensor_id in range(self.table.capacity):
+            sequence = self.table.sequence(sensor_id)
+            if sequence == self.sequences.get(sensor_id, 0):
+                continue
+            entry = self.table.read(sensor_id)
+            if entry is None:
+                continue
+            value, timestamp, sequence, status = entry
+            self.sequences[sensor_id] = sequence
+            if status == STATUS_OK and not math.isnan(value):
+                self.history.record(sensor_id, value, timestamp)
+            changed += 1
+        self.version += changed
+        return changed
+
+    def run(self) -> None:
+        while True:
+            try:
+                self.poll()
+            except Exception as e:
+                logger.error(f"Readings feed poll failed: {e}")
+            time.sleep(self.poll_interval)
+
+    def start(self) -> None:
+        threading.Thread(target=self.run, name="ReadingsFeed", daemon=True).start()
+
+
+class _ReadingsHandler(BaseHTTPRequestHandler):
+    feed: ReadingsFeed = None
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        query = {key: values[-1] for key, values in parse_qs(url.query).items()}
+        parts = [part for part in url.path.split('/') if part]
+        try:
+            if parts == ['sensors']:
+                self._latest_all(query)
+            elif len(parts) == 2 and parts[0] == 'sensors':
+                self._latest(int(parts[1]), query)
+            elif len(parts) == 3 and parts[0] == 'sensors' and parts[2] == 'history':
+                self._history(int(parts[1]), query)
+            elif len(parts) == 3 and parts[0] == 'sensors' and parts[2] == 'rollups':
+                self._rollups(int(parts[1]), query)
+            else:
+                self.send_error(404)
+        except (ValueError, KeyError) as e:
+            self.send_error(400, str(e))
+
+    def _latest_all(self, query):
+        version = self.feed.version
+        if self._not_modified(version, query):
+            return
+        sensors = {
+            str(sensor_id): _entry(value, timestamp, sequence, status)
+            for sensor_id, (value, timestamp, sequence, status) in self.feed.table.snapshot().items()
+        }
+        self._send_json({'version': version, 'sensors': sensors}, version)
+
+    def _latest(self, sensor_id, query):
+        entry = self.feed.table.read(sensor_id)
+        if entry is None:
+            self.send_error(404, f"No readings for sensor {sensor_id}")
+            return
+        if self._not_modified(entry[2], query):
+            return
+        self._send_json({'sensor_id': sensor_id, **_entry(*entry)}, entry[2])
+
+    def _history(self, sensor_id, query):
+        sequence = self.feed.sequences.get(sensor_id, 0)
+        if self._not_modified(sequence, query):
+            return
+        history = self.feed.history.get(sensor_id)
+        limit = int(query['limit']) if 'limit' in query else None
+        samples = history.recent(limit) if history else []
+        if 'seconds' in query:
+            cutoff = time.time() - float(query['seconds'])
+            samples = [sample for sample in samples if sample[0] >= cutoff]
+        self._send_json({'sensor_id': sensor_id, 'sequence': sequence, 'samples': samples}, sequence)
+
+    def _rollups(self, sensor_id, query):
+        sequence = self.feed.sequences.get(sensor_id, 0)
+        if self._not_modified(sequence, query):
+            return
+        history = self.feed.history.get(sensor_id)
+        resolution = int(query.get('resolution', 60))
+        body = {'sensor_id': sensor_id, 'sequence': sequence, 'resolution': resolution, 'buckets': [], 'summary': None}
+        if history:
+            if resolution not in history.rollups:
+                raise ValueError(f"resolution must be one of {sorted(history.rollups)}")
+            body['buckets'] = history.buckets(resolution, int(query['limit']) if 'limit' in query else None)
+            if 'seconds' in query:
+                body['summary'] = history.summary(float(query['seconds']), resolution)
+        self._send_json(body, sequence)
+
+    def _not_modified(self, version: int, query) -> bool:
+        """Answers 304 when the client's ETag or ?since= sequence is current."""
+        etag = f'"{version}"'
+        if self.headers.get('If-None-Match') == etag or ('since' in query and int(query['since']) >= version):
+            self.send_response(304)
+            self.send_header('ETag', etag)
+            self.end_headers()
+            return True
+        return False
+
+    def _send_json(self, body, version: int):
+        data = json.dumps(body).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.send_header('ETag', f'"{version}"')
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def _entry(value: float, timestamp: float, sequence: int, status: int) -> Dict:
+    return {
+        'value': None if math.isnan(value) else value,
+        'timestamp': timestamp,
+        'sequence': sequence,
+        'status': STATUS_NAMES.get(status, status),
+    }
+
+
+def serve_api(host: str, port: int, table: LatestValueTable, history: HistoryStore,
+              poll_interval: float = 0.5) -> ThreadingHTTPServer:
+    """
+    Starts the local read API on a daemon thread:
+        GET /sensors                                latest value of every sensor
+        GET /sensors/<id>                           latest value of one sensor
+        GET /sensors/<id>/history?limit=&seconds=   recent raw samples
+        GET /sensors/<id>/rollups?resolution=60&limit=&seconds=
+    Every response carries an ETag; If-None-Match or ?since=<sequence> gets a 304 when nothing changed.
+    """
+    feed = ReadingsFeed(table, history, poll_interval)
+    feed.poll()
+    feed.start()
+    handler = type('ReadingsHandler', (_ReadingsHandler,), {'feed': feed})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="ReadingsAPI", daemon=True).start()
+    logger.info(f"Readings API listening on http://{host}:{port}/sensors")
+    return server
@@ -0,0 +1,279 @@
+import argparse
+import fcntl
+import itertools
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional
+
+from .metrics import registry
+
+logger = logging.getLogger(__name__)
+
+WAIT_SECONDS = registry.histogram('hardware_wait_seconds', 'Time spent queued for a GPIO pin or bus', ['resource'])
+HELD_SECONDS = registry.histogram('hardware_held_seconds', 'Time a GPIO pin or bus was held per transaction', ['resource'])
+WAIT_TIMEOUTS = registry.counter('hardware_wait_timeouts_total', 'Transactions that gave up waiting for their turn', ['resource'])
+CLAIMS_REFUSED = registry.counter('hardware_claims_refused_total', 'Pin claims refused because another owner holds the pin', ['resource'])
+
+_tokens = itertools.count()
+
+
+class ResourceBusy(Exception):
+    """Raised when a pin is claimed by another owner, or a bus did not come free in time."""
+
+
+class HardwareUse(NamedTuple):
+    owner: str          # e.g. 'sensor:3', 'relay:2'
+    resource: str       # e.g. 'gpio:16', 'spi:0.0', 'i2c:1'
+    exclusive: bool     # an output pin only one owner may drive; shared resources take turns
+
+
+def _contested(uses: Iterable[HardwareUse]) -> List[tuple]:
+    # (resource, owner that keeps it, other owners) per resource driven exclusively but used by several
+    by_resource: Dict[str, List[HardwareUse]] = {}
+    for use in uses:
+        by_resource.setdefault(use.resource, []).append(use)
+    contested = []
+    for resource, users in sorted(by_resource.items()):
+        owners = sorted({use.owner for use in users})
+        drivers = sorted({use.owner for use in users if use.exclusive})
+        if drivers and len(owners) > 1:
+            contested.append((resource, drivers[0], [owner for owner in owners if owner != drivers[0]]))
+    return contested
+
+
+def find_conflicts(uses: Iterable[HardwareUse]) -> List[str]:
+    """
+    Describes every resource that is driven exclusively by one owner but also used by another.
+    Owners sharing a bus or a sensor pin are fine, their transactions are serialized.
+    """
+    return [f"{resource} is driven by {winner} and also used by {', '.join(others)}"
+            for resource, winner, others in _contested(uses)]
+
+
+def conflict_losers(uses: Iterable[HardwareUse]) -> Dict[str, str]:
+    """
+    Owner -> contested resource, for every owner that must give way in a conflict. The first
+    driver in name order keeps the resource, so relays ('relay:N') win over sensors.
+    """
+    losers: Dict[str, str] = {}
+    for resource, _, others in _contested(uses):
+        for owner in others:
+            losers.setdefault(owner, resource)
+    return losers
+
+
+def _alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+class HardwareArbiter:
+    def __init__(self, directory: str, poll_min: float = 0.0005, poll_max: float = 0.002):
+        """
+        Coordinates GPIO pins and buses between the processes of this node (and any other
+        program pointed at the same directory) through lock files.
+
+        A claim makes one owner the only driver of a pin for as long as the claiming process
+        lives: an flock on `<resource>.claim`, released by the kernel when the process exits,
+        however it exits. Processes forked after a claim do not inherit it, but code acting for
+        the same owner (a cycle process re-creating its sensor's driver) may claim it again.
+
+        A transaction holds a shared resource for one bus read or one pump run. Waiters queue
+        in `<resource>.queue` and are served strictly first come, first served, so a process
+        that reads in a tight loop cannot starve the others as it could with a bare flock.
+        Entries of processes that died are dropped by the next waiter that looks at the queue.
+
+        :param directory: Lock file directory, ideally on tmpfs (/dev/shm, /run/lock).
+        :param poll_min: First delay between checks of the queue, doubling up to `poll_max`.
+        """
+        self.directory = directory
+        self.poll_min = poll_min
+        self.poll_max = poll_max
+        os.makedirs(directory, exist_ok=True)
+        # resource -> (fd holding the flock, owner)
+        self._claims: Dict[str, tuple] = {}
+        self._lock = threading.Lock()
+        os.register_at_fork(after_in_child=self._drop_inherited_claims)
+
+    def claim(self, resource: str, owner: str) -> None:
+        """Makes `owner` the only driver of `resource`, raising ResourceBusy if someone else is."""
+        with self._lock:
+            if resource in self._claims:
+                holder = self._claims[resource][1]
+                if holder == owner:
+                    return
+                CLAIMS_REFUSED.labels(resource).inc()
+                raise ResourceBusy(f"{resource} is already claimed by {holder} in this process (pid {os.getpid()})")
+            fd = os.open(self._path(resource, 'claim'), os.O_RDWR | os.O_CREAT, 0o666)
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                holder = self._read(fd) or {}
+                os.close(fd)
+                if holder.get('owner') == owner:
+                    return
+                CLAIMS_REFUSED.labels(resource).inc()
+                raise ResourceBusy(f"{resource} is already claimed by {holder.get('owner', 'another program')} "
+                                   f"(pid {holder.get('pid', '?')})")
+            self._write(fd, {'owner': owner, 'pid': os.getpid(), 'since': time.time()})
+            self._claims[resource] = (fd, owner)
+        logger.info(f"{owner} claimed {resource}.")
+
+    def release(self, resource: str) -> None:
+        """Gives up this process's claim on `resource`, if it has one."""
+        with self._lock:
+            claim = self._claims.pop(resource, None)
+        if claim:
+            os.ftruncate(claim[0], 0)
+            os.close(claim[0])
+            logger.info(f"{claim[1]} released {resource}.")
+
+    @contextmanager
+    def transaction(self, resource: str, owner: str, timeout: Optional[float] = None):
+        """
+        Holds `resource` for the duration of the block, after every earlier waiter had its turn.
+        Raises ResourceBusy if the turn did not come within `timeout` seconds (None waits as
+        long as it takes; a holder that dies is skipped, so only a live holder can delay it).
+        """
+        token = f"{os.getpid()}-{threading.get_ident()}-{next(_tokens)}"
+        entry = {'token': token, 'owner': owner, 'pid': os.getpid(), 'queued': time.time()}
+        queued = time.monotonic()
+        self._update(resource, lambda queue: queue.append(entry))
+        delay = self.poll_min
+        try:
+            while not self._update(resource, lambda queue: self._serve(queue, token)):
+                if timeout is not None and time.monotonic() - queued >= timeout:
+                    WAIT_TIMEOUTS.labels(resource).inc()
+                    raise ResourceBusy(f"{resource} did not come free within {timeout:g}s")
+                time.sleep(delay)
+                delay = min(delay * 2, self.poll_max)
+            acquired = time.monotonic()
+            WAIT_SECONDS.labels(resource).observe(acquired - queued)
+            try:
+                yield
+            finally:
+                HELD_SECONDS.labels(resource).observe(time.monotonic() - acquired)
+        finally:
+            self._update(resource, lambda queue: self._leave(queue, token))
+
+    def status(self) -> List[Dict[str, Any]]:
+        """Claims and queues of every resource in the directory, for the status command."""
+        resources = {}
+        for name in sorted(os.listdir(self.directory)):
+            base, _, kind = name.rpartition('.')
+            if kind not in ('claim', 'queue'):
+                continue
+            resource = base.replace('-', ':', 1)
+            fd = os.open(os.path.join(self.directory, name), os.O_RDONLY)
+            try:
+                if kind == 'claim':
+                    # Probing the flock could make a concurrent claim fail, the holder's pid tells enough
+                    claim = self._read(fd)
+                    if claim and not _alive(claim['pid']):
+                        claim = None
+                    resources.setdefault(resource, {'resource': resource})['claim'] = claim
+                else:
+                    fcntl.flock(fd, fcntl.LOCK_SH)
+                    queue = [item for item in (self._read(fd) or []) if _alive(item['pid'])]
+                    resources.setdefault(resource, {'resource': resource})['queue'] = queue
+            finally:
+                os.close(fd)
+        return list(resources.values())
+
+    def _serve(self, queue: List[Dict[str, Any]], token: str) -> bool:
+        # Called with the queue file locked: drops dead processes, True if `token` is at the head
+        queue[:] = [item for item in queue if _alive(item['pid'])]
+        if queue and queue[0]['token'] == token:
+            queue[0].setdefault('since', time.time())
+            return True
+        return False
+
+    @staticmethod
+    def _leave(queue: List[Dict[str, Any]], token: str) -> None:
+        queue[:] = [item for item in queue if item['token'] != token]
+
+    def _update(self, resource: str, change, match=None) -> Any:
+        fd = os.open(self._path(resource, 'queue'), os.O_RDWR | os.O_CREAT, 0o666)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            queue = self._read(fd) or []
+            before = json.dumps(queue)
+            result = change(queue)
+            if json.dumps(queue) != before:
+                self._write(fd, queue)
+            return result
+        finally:
+            os.close(fd)
+
+    def _path(self, resource: str, kind: str) -> str:
+        return os.path.join(self.directory, f"{resource.replace(':', '-')}.{kind}")
+
+    @staticmethod
+    def _read(fd: int) -> Any:
+        os.lseek(fd, 0, os.SEEK_SET)
+        data = b''
+        while True:
+            chunk = os.read(fd, 65536)
+            if not chunk:
+                break
+            data += chunk
+        try:
+            return json.loads(data) if data else None
+        except ValueError:
+            return None
+
+    @staticmethod
+    def _write(fd: int, value: Any) -> None:
+        data = json.dumps(value).encode()
+        os.ftruncate(fd, 0)
+        os.pwrite(fd, data, 0)
+
+    def _drop_inherited_claims(self) -> None:
+        # The flock belongs to the open file, which parent and child now share: closing the
+        # child's copy leaves the parent's claim in place, keeping it would outlive a release
+        self._lock = threading.Lock()
+        for fd, _ in self._claims.values():
+            os.close(fd)
+        self._claims = {}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Show who holds and who waits for GPIO pins and buses.")
+    parser.add_argument('--dir', default='/dev/shm/hydroponics-hardware', help="lock file directory")
+    commands = parser.add_subparsers(dest='command', required=True)
+    commands.add_parser('status', help="list claims, current holders and waiters")
+    args = parser.parse_args()
+
+    if not os.path.isdir(args.dir):
+        print(f"No lock directory {args.dir}, nothing has been claimed on this node.")
+        return
+    now = time.time()
+    for resource in HardwareArbiter(args.dir).status():
+        claim = resource.get('claim')
+        queue = resource.get('queue') or []
+        line = f"{resource['resource']:<10}"
+        if claim:
+            line += f" claimed by {claim.get('owner')} (pid {claim.get('pid')}) for {now - claim.get('since', now):.0f}s"
+        if queue:
+            head = queue[0]
+            if 'since' in head:
+                line += f" | held by {head['owner']} (pid {head['pid']}) for {now - head['since']:.3f}s"
+            waiting = [item for item in queue if 'since' not in item]
+            if waiting:
+                line += " | waiting: " + ', '.join(f"{item['owner']} {now - item['queued']:.3f}s" for item in waiting)
+        elif not claim:
+            line += " free"
+        print(line)
+
+
+if __name__ == "__main__":
+    main()
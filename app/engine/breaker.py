@@ -0,0 +1,105 @@
+import logging
+import os
+import random
+import threading
+import time
+from typing import Callable, Dict
+
+from .metrics import registry
+
+logger = logging.getLogger(__name__)
+
+STATE_CLOSED = 'closed'
+STATE_HALF_OPEN = 'half_open'
+STATE_OPEN = 'open'
+STATE_VALUES = {STATE_CLOSED: 0, STATE_HALF_OPEN: 1, STATE_OPEN: 2}
+
+STATE = registry.gauge('circuit_state', 'Circuit breaker state: 0 closed, 1 half-open, 2 open', ['circuit'])
+OPENED = registry.counter('circuit_opened_total', 'Times a circuit breaker opened', ['circuit'])
+REJECTED = registry.counter('circuit_rejected_total', 'Calls failed fast by an open circuit breaker', ['circuit'])
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of making a call while the circuit is open."""
+
+
+class CircuitBreaker:
+    def __init__(self, name: str, failure_threshold: int = 3, base_delay: float = 2.0,
+                 max_delay: float = 120.0, jitter: float = 0.5, clock: Callable[[], float] = time.monotonic):
+        """
+        Stops calling a dependency that keeps failing, so callers fail in microseconds and take
+        their fallback instead of blocking on timeouts.
+
+            closed     - calls go through, `failure_threshold` consecutive failures open it
+            open       - calls raise CircuitOpenError until the backoff delay has passed
+            half_open  - a single trial call goes through, the others still fail fast;
+                         success closes the circuit, failure opens it again
+
+        The delay doubles every time the circuit reopens without a success in between, up to
+        `max_delay`, and is shortened by a random fraction of up to `jitter` so processes that
+        lost the same server do not all probe it at the same moment.
+        """
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.jitter = jitter
+        self.clock = clock
+        self.state = STATE_CLOSED
+        self.failures = 0
+        self.opens = 0
+        self.retry_at = 0.0
+        self.rejected = 0
+        self._lock = threading.Lock()
+        STATE.labels(name).set(STATE_VALUES[self.state])
+        os.register_at_fork(after_in_child=self._after_fork)
+
+    def before_call(self) -> None:
+        """Raises CircuitOpenError if the call must not be made now."""
+        with self._lock:
+            if self.state == STATE_CLOSED:
+                return
+            if self.state == STATE_OPEN and self.clock() >= self.retry_at:
+                self._set_state(STATE_HALF_OPEN)
+                return
+            self.rejected += 1
+        REJECTED.labels(self.name).inc()
+        raise CircuitOpenError(f"{self.name} circuit is {self.state}, retrying in {max(0.0, self.retry_at - self.clock()):.1f}s")
+
+    def record_success(self) -> None:
+        with self._lock:
+            self.failures = 0
+            if self.state != STATE_CLOSED:
+                logger.info(f"{self.name} circuit closed after {self.opens} open period(s).")
+                self.opens = 0
+                self._set_state(STATE_CLOSED)
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.failures += 1
+            if self.state == STATE_HALF_OPEN or (self.state == STATE_CLOSED and self.failures >= self.failure_threshold):
+                delay = min(self.max_delay, self.base_delay * 2 ** self.opens)
+                delay *= 1 - random.uniform(0, self.jitter)
+                self.opens += 1
+                self.retry_at = self.clock() + delay
+                self._set_state(STATE_OPEN)
+                OPENED.labels(self.name).inc()
+                logger.warning(f"{self.name} circuit open after {self.failures} failure(s), next try in {delay:.1f}s.")
+
+    def stats(self) -> Dict:
+        return {
+            'state': self.state,
+            'failures': self.failures,
+            'opens': self.opens,
+            'rejected': self.rejected,
+            'retry_in': max(0.0, self.retry_at - self.clock()) if self.state == STATE_OPEN else 0.0,
+        }
+
+    def _set_state(self, state: str) -> None:
+        self.state = state
+        STATE.labels(self.name).set(STATE_VALUES[state])
+
+    def _after_fork(self) -> None:
+        # The lock may have been held by another thread of the parent; metrics start from zero
+        self._lock = threading.Lock()
+        STATE.labels(self.name).set(STATE_VALUES[self.state])
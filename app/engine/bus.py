@@ -0,0 +1,173 @@
+import logging
+import math
+import threading
+import time
+from collections import deque
+from typing import Callable, List, NamedTuple, Optional
+
+from .metrics import registry
+
+logger = logging.getLogger(__name__)
+
+DELIVERED = registry.counter('bus_delivered_total', 'Readings handed to a subscriber', ['subscriber'])
+DROPPED = registry.counter('bus_dropped_total', 'Readings a subscriber lost to its overflow policy', ['subscriber'])
+HANDLER_ERRORS = registry.counter('bus_handler_errors_total', 'Subscriber handler calls that raised', ['subscriber'])
+HANDLER_SECONDS = registry.histogram('bus_handler_seconds', 'Time spent in a subscriber handler call', ['subscriber'])
+DEPTH = registry.gauge('bus_queue_depth', 'Readings waiting in a subscriber queue', ['subscriber'])
+
+OVERFLOW_DROP_OLDEST = 'drop_oldest'
+OVERFLOW_DROP_NEWEST = 'drop_newest'
+OVERFLOW_SPILL = 'spill'
+OVERFLOW_POLICIES = (OVERFLOW_DROP_OLDEST, OVERFLOW_DROP_NEWEST, OVERFLOW_SPILL)
+
+
+class Reading(NamedTuple):
+    sensor_id: int
+    sensor_type: str
+    value: float
+    timestamp: float
+    # Binary readings such as camera frames; value is NaN for those
+    payload: Optional[bytes] = None
+    # Driver count the value was converted from (ADC count, BH1750 word, DS18B20 millidegrees)
+    raw: Optional[int] = None
+
+    @property
+    def is_numeric(self) -> bool:
+        return self.payload is None and not math.isnan(self.value)
+
+
+class Subscriber:
+    def __init__(self, name: str, handler: Callable[[List[Reading]], None], maxsize: int = 1000,
+                 overflow: str = OVERFLOW_DROP_OLDEST, batch_size: int = 1, batch_timeout: float = 0.0,
+                 accepts: Optional[Callable[[Reading], bool]] = None,
+                 spill: Optional[Callable[[Reading], None]] = None):
+        """
+        A consumer of the reading bus with its own bounded queue and thread.
+
+        The handler always gets a list: up to `batch_size` readings, collected for at most
+        `batch_timeout` seconds once the first one arrives. When the queue is full:
+            drop_oldest - the oldest queued reading is discarded
+            drop_newest - the new reading is discarded
+            spill       - the oldest queued reading is passed to `spill` (e.g. a disk queue)
+
+        :param name: Label used in logs and metrics.
+        :param accepts: Filter evaluated at publish time, default: every reading.
+        """
+        if overflow not in OVERFLOW_POLICIES:
+            raise ValueError(f"Unknown overflow policy '{overflow}', expected one of {OVERFLOW_POLICIES}")
+        if overflow == OVERFLOW_SPILL and spill is None:
+            raise ValueError("the spill overflow policy needs a spill callable")
+        self.name = name
+        self.handler = handler
+        self.maxsize = maxsize
+        self.overflow = overflow
+        self.batch_size = batch_size
+        self.batch_timeout = batch_timeout
+        self.accepts = accepts
+        self.spill = spill
+        self.queue = deque()
+        self.condition = threading.Condition()
+        self.thread: Optional[threading.Thread] = None
+        self.stopping = False
+        self.dropped = 0
+        self._delivered = DELIVERED.labels(name)
+        self._dropped = DROPPED.labels(name)
+        self._depth = DEPTH.labels(name)
+
+    def offer(self, reading: Reading) -> bool:
+        """Queues a reading without blocking. Returns False if the reading itself was dropped."""
+        spilled = None
+        with self.condition:
+            if len(self.queue) >= self.maxsize:
+                self.dropped += 1
+                self._dropped.inc()
+                if self.overflow == OVERFLOW_DROP_NEWEST:
+                    return False
+                spilled = self.queue.popleft()
+            self.queue.append(reading)
+            self.condition.notify()
+        if spilled is not None and self.spill is not None:
+            try:
+                self.spill(spilled)
+            except Exception as e:
+                logger.error(f"Subscriber '{self.name}' failed to spill a reading: {e}")
+        return True
+
+    def start(self) -> None:
+        self.stopping = False
+        self.thread = threading.Thread(target=self._run, name=f"Bus-{self.name}", daemon=True)
+        self.thread.start()
+
+    def stop(self, timeout: float = 5.0) -> None:
+        """Delivers what is still queued, then stops the thread."""
+        with self.condition:
+            self.stopping = True
+            self.condition.notify()
+        if self.thread:
+            self.thread.join(timeout)
+            if self.thread.is_alive():
+                logger.warning(f"Subscriber '{self.name}' did not drain within {timeout}s, {len(self.queue)} readings left.")
+
+    def _take(self) -> List[Reading]:
+        with self.condition:
+            while not self.queue and not self.stopping:
+                self.condition.wait()
+            if self.batch_size > 1 and self.batch_timeout > 0:
+                deadline = time.monotonic() + self.batch_timeout
+                while len(self.queue) < self.batch_size and not self.stopping:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self.condition.wait(remaining)
+            batch = [self.queue.popleft() for _ in range(min(self.batch_size, len(self.queue)))]
+            self._depth.set(len(self.queue))
+            return batch
+
+    def _run(self) -> None:
+        while True:
+            batch = self._take()
+            if not batch:
+                return  # Stopping and drained
+            start = time.perf_counter()
+            try:
+                self.handler(batch)
+                self._delivered.inc(len(batch))
+            except Exception as e:
+                HANDLER_ERRORS.labels(self.name).inc()
+                logger.error(f"Subscriber '{self.name}' failed on {len(batch)} readings: {e}")
+            HANDLER_SECONDS.labels(self.name).observe(time.perf_counter() - start)
+
+
+class ReadingBus:
+    def __init__(self):
+        """
+        In-process publish/subscribe for readings. Publishing only appends to each subscriber's
+        queue, so slow sinks (the database, uploads) never hold up the sensor read that produced
+        the reading. Threads do not survive fork, create and start the bus in the process that
+        publishes.
+        """
+        self.subscribers: List[Subscriber] = []
+        self.started = False
+
+    def subscribe(self, subscriber: Subscriber) -> Subscriber:
+        self.subscribers.append(subscriber)
+        if self.started:
+            subscriber.start()
+        return subscriber
+
+    def publish(self, reading: Reading) -> None:
+        for subscriber in self.subscribers:
+            if subscriber.accepts is None or subscriber.accepts(reading):
+                subscriber.offer(reading)
+
+    def start(self) -> "ReadingBus":
+        for subscriber in self.subscribers:
+            subscriber.start()
+        self.started = True
+        return self
+
+    def stop(self, timeout: float = 5.0) -> None:
+        """Drains and stops every subscriber."""
+        for subscriber in self.subscribers:
+            subscriber.stop(timeout)
+        self.started = False
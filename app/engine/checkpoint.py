@@ -0,0 +1,97 @@
+import json
+import logging
+import os
+import time
+from typing import Any, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class CycleCheckpoint:
+    def __init__(self, directory: str, sensor_id: int, cycle: Dict[str, Any],
+                 write_interval: float = 30.0, max_age: float = 3600.0):
+        """
+        Persists a cycle's progress to <directory>/cycle-<sensor_id>-<cycle_id>.json.
+
+        Elapsed time is tracked relative to the cycle's own clock, so a restart resumes the
+        duration window where it stopped rather than from zero. Writes are throttled to one
+        per `write_interval` seconds and replace the file atomically.
+
+        :param directory: Directory holding the state files.
+        :param sensor_id: Sensor the cycle belongs to.
+        :param cycle: Cycle row from the configuration snapshot.
+        :param write_interval: Minimum seconds between writes.
+        :param max_age: State whose next deadline (the next tick, or the end of the pause) passed
+                        more than this long ago is ignored and the cycle starts fresh. It is
+                        judged against the deadline rather than the write time, as a pause or a
+                        tick period can be longer than `max_age`.
+        """
+        self.sensor_id = sensor_id
+        self.cycle_id = cycle['cycle_id']
+        self.write_interval = write_interval
+        self.max_age = max_age
+        # A cycle whose parameters changed in the DB must not resume old progress
+        self.signature = [cycle['interval_seconds'], cycle['duration_minutes'], cycle['pause']]
+        self.path = os.path.join(directory, f"cycle-{sensor_id}-{self.cycle_id}.json")
+        self._last_write = 0.0
+        os.makedirs(directory, exist_ok=True)
+
+    def load(self) -> Optional[Dict[str, Any]]:
+        """
+        Returns the saved progress, or None when there is none, it is stale or it belongs to
+        a cycle with different parameters.
+        """
+        try:
+            with open(self.path) as file:
+                state = json.load(file)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignoring unreadable checkpoint {self.path}: {e}")
+            return None
+
+        overdue = time.time() - state.get('next_deadline', state.get('saved_at', 0))
+        if overdue > self.max_age:
+            logger.info(f"Checkpoint for Cycle ID {self.cycle_id} was due {overdue:.0f}s ago, starting fresh.")
+            return None
+        if state.get('signature') != self.signature:
+            logger.info(f"Cycle ID {self.cycle_id} changed since its checkpoint, starting fresh.")
+            return None
+        return state
+
+    def save(self, elapsed: float, next_deadline: float, phase: str = 'running', force: bool = False) -> None:
+        """
+        Records progress if the write interval has passed (or `force` is set).
+
+        :param elapsed: Seconds of the cycle's duration already used.
+        :param next_deadline: Wall-clock time the next tick (or the end of the pause) is due.
+        :param phase: 'running' or 'pausing'.
+        :param force: Write regardless of the throttle.
+        """
+        now = time.monotonic()
+        if not force and now - self._last_write < self.write_interval:
+            return
+        self._last_write = now
+        state = {
+            'sensor_id': self.sensor_id,
+            'cycle_id': self.cycle_id,
+            'signature': self.signature,
+            'phase': phase,
+            'elapsed': elapsed,
+            'next_deadline': next_deadline,
+            'saved_at': time.time(),
+        }
+        tmp_path = f"{self.path}.tmp"
+        try:
+            with open(tmp_path, 'w') as file:
+                json.dump(state, file)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            logger.warning(f"Failed to write checkpoint {self.path}: {e}")
+
+    def clear(self) -> None:
+        """Removes the state file once the cycle has completed."""
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
@@ -0,0 +1,313 @@
+import argparse
+import math
+from collections import deque
+from typing import Any, Dict, List, Optional
+
+# Kernel taps below this weight are dropped from the vectorised EMA
+EMA_TAIL = 1e-12
+# Readings the rate clamp checks per vectorised scan
+RATE_SCAN = 256
+
+
+def _ema_batch(values: "np.ndarray", alpha: float, state: Optional[float]) -> "np.ndarray":
+    """
+    y[k] = y[k-1] + alpha * (x[k] - y[k-1]) over a whole array, as a convolution with the
+    truncated kernel alpha * (1 - alpha)^m plus the decaying previous state.
+    """
+    import numpy as np
+    n = len(values)
+    if state is None:
+        state = float(values[0])
+    decay = 1.0 - alpha
+    if decay <= 0:
+        return values.copy()
+    taps = min(n, int(math.log(EMA_TAIL) / math.log(decay)) + 1)
+    kernel = alpha * decay ** np.arange(taps)
+    result = np.convolve(values, kernel)[:n]
+    result += state * decay ** np.arange(1, n + 1)
+    return result
+
+
+class Stage:
+    """One step of a conditioning chain. Stages keep a fixed amount of state per sensor."""
+
+    def update(self, value: float, timestamp: float) -> float:
+        raise NotImplementedError
+
+    def batch(self, values: "np.ndarray", timestamps: "np.ndarray") -> "np.ndarray":
+        """
+        Filters a whole array of readings and leaves the stage in the same state as feeding
+        them one by one through update() would.
+        """
+        raise NotImplementedError
+
+    def reset(self) -> None:
+        raise NotImplementedError
+
+
+class EMA(Stage):
+    def __init__(self, alpha: float = 0.2):
+        """
+        Exponential moving average.
+        :param alpha: Weight of the newest reading, 0 < alpha <= 1.
+        """
+        if not 0 < alpha <= 1:
+            raise ValueError("EMA alpha must be in (0, 1]")
+        self.alpha = alpha
+        self.value: Optional[float] = None
+
+    def update(self, value: float, timestamp: float) -> float:
+        if self.value is None:
+            self.value = value
+        else:
+            self.value += self.alpha * (value - self.value)
+        return self.value
+
+    def batch(self, values, timestamps):
+        if not len(values):
+            return values.copy()
+        result = _ema_batch(values, self.alpha, self.value)
+        self.value = float(result[-1])
+        return result
+
+    def reset(self) -> None:
+        self.value = None
+
+
+class Kalman(Stage):
+    def __init__(self, process_variance: float = 1e-4, measurement_variance: float = 1e-2):
+        """
+        Scalar Kalman filter for a slowly drifting level (random walk model).
+        :param process_variance: How much the true value may move between readings (q).
+        :param measurement_variance: Sensor noise variance (r).
+        """
+        if process_variance < 0 or measurement_variance <= 0:
+            raise ValueError("Kalman variances must be positive")
+        self.q = process_variance
+        self.r = measurement_variance
+        self.estimate: Optional[float] = None
+        self.error = 0.0
+
+    def _gain(self) -> float:
+        self.error += self.q
+        gain = self.error / (self.error + self.r)
+        self.error *= 1 - gain
+        return gain
+
+    def update(self, value: float, timestamp: float) -> float:
+        if self.estimate is None:
+            self.estimate = value
+            self.error = self.r
+            return value
+        self.estimate += self._gain() * (value - self.estimate)
+        return self.estimate
+
+    def batch(self, values, timestamps):
+        import numpy as np
+        result = np.empty_like(values)
+        start = 0
+        # The gain does not depend on the data and settles within a few dozen readings,
+        # after which the filter is an EMA with the steady-state gain
+        while start < len(values):
+            previous = self.error
+            result[start] = self.update(float(values[start]), 0.0)
+            start += 1
+            if abs(self.error - previous) <= 1e-12 * max(previous, 1e-300):
+                break
+        if start < len(values):
+            gain = self.error + self.q
+            gain /= gain + self.r
+            result[start:] = _ema_batch(values[start:], gain, self.estimate)
+            self.estimate = float(result[-1])
+        return result
+
+    def reset(self) -> None:
+        self.estimate = None
+        self.error = 0.0
+
+
+class Median(Stage):
+    def __init__(self, size: int = 5):
+        """
+        Median of the last `size` readings, rejects isolated spikes without smearing steps.
+        """
+        if size < 1:
+            raise ValueError("median size must be at least 1")
+        self.size = size
+        self.window = deque(maxlen=size)
+
+    def update(self, value: float, timestamp: float) -> float:
+        self.window.append(value)
+        ordered = sorted(self.window)
+        middle = len(ordered) // 2
+        return ordered[middle] if len(ordered) % 2 else (ordered[middle - 1] + ordered[middle]) / 2
+
+    def batch(self, values, timestamps):
+        import numpy as np
+        from numpy.lib.stride_tricks import sliding_window_view
+        result = np.empty_like(values)
+        # Partial windows at the start of a sensor's history, one by one
+        head = 0
+        while len(self.window) < self.size - 1 and head < len(values):
+            result[head] = self.update(float(values[head]), 0.0)
+            head += 1
+        if head < len(values):
+            padded = np.concatenate([np.asarray(self.window, dtype=values.dtype)[-(self.size - 1):] if self.size > 1
+                                     else values[:0], values[head:]])
+            result[head:] = np.median(sliding_window_view(padded, self.size), axis=1)
+            self.window.extend(values[-self.size:].tolist())
+        return result
+
+    def reset(self) -> None:
+        self.window.clear()
+
+
+class RateClamp(Stage):
+    def __init__(self, max_rate: float):
+        """
+        Limits how fast the output may move: at most `max_rate` sensor units per second
+        away from the previous output.
+        """
+        if max_rate <= 0:
+            raise ValueError("max_rate must be positive")
+        self.max_rate = max_rate
+        self.value: Optional[float] = None
+        self.timestamp: Optional[float] = None
+        self.clamped = 0
+
+    def update(self, value: float, timestamp: float) -> float:
+        if self.value is not None:
+            limit = self.max_rate * max(0.0, timestamp - self.timestamp)
+            if value > self.value + limit:
+                value = self.value + limit
+                self.clamped += 1
+            elif value < self.value - limit:
+                value = self.value - limit
+                self.clamped += 1
+        self.value = value
+        self.timestamp = timestamp
+        return value
+
+    def batch(self, values, timestamps):
+        import numpy as np
+        result = values.copy()
+        n = len(values)
+        if n == 0:
+            return result
+        if self.value is None:
+            self.value, self.timestamp = float(values[0]), float(timestamps[0])
+        limits = self.max_rate * np.maximum(0.0, np.diff(timestamps, prepend=self.timestamp))
+        index = 0
+        while index < n:
+            # Where the output follows the input, only steps of the input itself can clamp.
+            # Scanning a bounded window keeps densely clamped data linear.
+            end = min(n, index + RATE_SCAN)
+            steps = np.abs(np.diff(values[index:end], prepend=self.value))
+            over = np.flatnonzero(steps > limits[index:end])
+            if not len(over):
+                index = end
+                self.value, self.timestamp = float(values[end - 1]), float(timestamps[end - 1])
+                continue
+            index += over[0]
+            if over[0]:
+                self.value, self.timestamp = float(values[index - 1]), float(timestamps[index - 1])
+            # Clamped: walk until the output has caught up with the input again
+            while index < n:
+                output = self.update(float(values[index]), float(timestamps[index]))
+                result[index] = output
+                index += 1
+                if output == values[index - 1]:
+                    break
+        self.value, self.timestamp = float(result[-1]), float(timestamps[-1])
+        return result
+
+    def reset(self) -> None:
+        self.value = None
+        self.timestamp = None
+
+
+STAGES = {
+    'ema': lambda spec: EMA(float(spec.get('alpha', 0.2))),
+    'kalman': lambda spec: Kalman(float(spec.get('q', 1e-4)), float(spec.get('r', 1e-2))),
+    'median': lambda spec: Median(int(spec.get('size', 5))),
+    'rate_clamp': lambda spec: RateClamp(float(spec['max_rate'])),
+}
+
+
+class ConditioningChain:
+    def __init__(self, stages: List[Stage]):
+        """
+        Runs each reading through the stages in order before it is published.
+        """
+        self.stages = stages
+
+    @classmethod
+    def from_config(cls, config: Optional[Dict[str, Any]]) -> Optional["ConditioningChain"]:
+        """
+        Builds the chain from the "filters" list of a sensor config, e.g.
+        {"map": "ph", "filters": [{"type": "median", "size": 5}, {"type": "kalman", "q": 1e-5, "r": 0.004}]}
+        Stages: ema (alpha), kalman (q, r), median (size), rate_clamp (max_rate per second).
+        Without filters the readings are published as read and None is returned.
+        """
+        filters = (config or {}).get('filters')
+        if not filters:
+            return None
+        stages = []
+        for spec in filters:
+            kind = spec.get('type')
+            if kind not in STAGES:
+                raise ValueError(f"Unknown filter '{kind}', expected one of {sorted(STAGES)}")
+            stages.append(STAGES[kind](spec))
+        return cls(stages)
+
+    def update(self, value: float, timestamp: float) -> float:
+        for stage in self.stages:
+            value = stage.update(value, timestamp)
+        return value
+
+    def batch(self, values: "np.ndarray", timestamps: "np.ndarray") -> "np.ndarray":
+        import numpy as np
+        values = np.asarray(values, dtype=np.float64)
+        timestamps = np.asarray(timestamps, dtype=np.float64)
+        for stage in self.stages:
+            values = stage.batch(values, timestamps)
+        return values
+
+    def reset(self) -> None:
+        for stage in self.stages:
+            stage.reset()
+
+
+################################################################################
+# Tuning
+################################################################################
+
+def main():
+    import json
+    import numpy as np
+    from .replay import load_readings
+
+    parser = argparse.ArgumentParser(description="Run recorded readings through a filter chain and compare noise.")
+    parser.add_argument('path', help="sensor_data export (.json/.csv), offline queue or sensor log")
+    parser.add_argument('filters', help='filter list as JSON, e.g. \'[{"type": "median", "size": 5}]\'')
+    parser.add_argument('--sensor', type=int, action='append', help="only these sensor IDs")
+    args = parser.parse_args()
+
+    readings = load_readings(args.path)
+    sensor_ids = args.sensor or sorted({reading.sensor_id for reading in readings})
+    print(f"{'sensor':>6}{'readings':>10}{'raw noise':>12}{'filtered':>12}{'mean shift':>12}")
+    for sensor_id in sensor_ids:
+        rows = [reading for reading in readings if reading.sensor_id == sensor_id]
+        if len(rows) < 3:
+            continue
+        timestamps = np.array([reading.timestamp for reading in rows])
+        values = np.array([reading.value for reading in rows])
+        chain = ConditioningChain.from_config({'filters': json.loads(args.filters)})
+        filtered = chain.batch(values, timestamps)
+        # Noise as the spread of reading-to-reading changes
+        print(f"{sensor_id:>6}{len(rows):>10}{np.std(np.diff(values)):>12.4f}{np.std(np.diff(filtered)):>12.4f}"
+              f"{np.mean(filtered - values):>12.4f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,110 +1,161 @@
+import os
 import mysql.connector
-from mysql.connector import Error
-from time import sleep
+from mysql.connector import Error, InterfaceError, OperationalError
+from time import perf_counter
+
+from .breaker import CircuitBreaker
+from .metrics import registry
+from .startup import profiler
+
+QUERY_SECONDS = registry.histogram('db_query_seconds', 'Time spent in MySQL calls', ['op'])
+QUERY_ERRORS = registry.counter('db_query_errors_total', 'MySQL calls that raised an error', ['op'])
+
+# Errors that mean the server could not be reached or the connection broke, as opposed to
+# errors the server answered with (bad SQL, constraint violations)
+CONNECTION_ERRORS = (InterfaceError, OperationalError, OSError)
 
 class MySQLWrapper:
-    def __init__(self, host, user, password, database):
+    def __init__(self, host, user, password, database, connect_timeout=10, breaker=None):
+        """
+        No connection is made here, the first query connects.
+        Forked processes drop the inherited connection and open their own on first use.
+
+        Calls go through a circuit breaker: while the server is unreachable they raise
+        CircuitOpenError straight away, so callers fall back (e.g. to the offline queue)
+        instead of waiting on connection timeouts.
+        """
         self.host = host
         self.user = user
         self.password = password
         self.database = database
+        self.connect_timeout = connect_timeout
         self.connection = None
+        self.breaker = breaker or CircuitBreaker('mysql')
+        os.register_at_fork(after_in_child=self._forget_connection)
 
     def connect(self):
-        """Establish a connection to the MySQL database."""
+        """Establish a connection to the MySQL database. Raises on failure."""
+        start = perf_counter()
         try:
             self.connection = mysql.connector.connect(
                 host=self.host,
                 user=self.user,
                 password=self.password,
                 database=self.database,
+                connection_timeout=self.connect_timeout,
                 autocommit=True,  # Enable autocommit
                 buffered=False,   # Disable result buffering
                 pool_reset_session=True  # Reset session variables
             )
-            if self.connection.is_connected():
-                print("Connected to MySQL database")
+            print("Connected to MySQL database")
         except Error as e:
+            self.connection = None
             print(f"Error: {e}")
+            raise
+        finally:
+            profiler.record('db connect', perf_counter() - start)
+
+    def _forget_connection(self):
+        # The socket belongs to the parent process, never use or close it here
+        self.connection = None
 
     def ensure_connection(self):
-        """Check if the connection is still active, reconnect if necessary."""
-        try:
-            if self.connection and self.connection.is_connected():
-                # Ping the server to verify connection
-                self.connection.ping(reconnect=True, attempts=3, delay=5)
-            else:
-                print("Reconnecting to the database...")
-                self.connect()
-        except Error:
-            print("Reconnecting to the database...")
+        """Connects if there is no connection yet. A broken connection shows up as an error on use."""
+        if self.connection is None:
             self.connect()
 
+    def _call(self, op, work):
+        """
+        Runs work(connection) through the circuit breaker. A connection that was already open
+        may have been dropped by the server while idle, that case is retried once on a fresh
+        connection. Errors are raised, never retried beyond that.
+        """
+        self.breaker.before_call()
+        start = perf_counter()
+        try:
+            for attempt in (1, 2):
+                reused = self.connection is not None
+                try:
+                    self.ensure_connection()
+                    result = work(self.connection)
+                    break
+                except CONNECTION_ERRORS:
+                    self._drop_connection()
+                    if attempt == 1 and reused:
+                        continue
+                    raise
+        except CONNECTION_ERRORS as e:
+            QUERY_ERRORS.labels(op).inc()
+            self.breaker.record_failure()
+            print(f"Error in {op}: {e}")
+            raise
+        except BaseException:
+            # The server answered, the error is the query's
+            QUERY_ERRORS.labels(op).inc()
+            self.breaker.record_success()
+            raise
+        self.breaker.record_success()
+        QUERY_SECONDS.labels(op).observe(perf_counter() - start)
+        return result
+
+    def _drop_connection(self):
+        connection, self.connection = self.connection, None
+        if connection is not None:
+            try:
+                connection.close()
+            except Exception:
+                pass
+
     def execute_query(self, query, params=None):
         """Execute a single query (INSERT, UPDATE, DELETE)."""
-        try:
-            self.ensure_connection()
-            with self.connection.cursor() as cursor:
+        def work(connection):
+            with connection.cursor() as cursor:
                 cursor.execute(query, params)
-                self.connection.commit()
-        except Error as e:
-            print(f"Error executing query: {e}")
-            self.handle_connection_error()
-            self.execute_query(query, params)
+                connection.commit()
+        self._call('execute', work)
+
+    def execute_many(self, query, seq_params):
+        """
+        Execute one statement for many parameter sets (batched INSERTs become one multi-row INSERT).
+        Errors are raised rather than retried, so the caller can keep the batch elsewhere.
+        """
+        def work(connection):
+            with connection.cursor() as cursor:
+                cursor.executemany(query, seq_params)
+                connection.commit()
+        self._call('execute_many', work)
 
     def fetch_all(self, query, params=None, dictionary=False):
         """Fetch all results for a SELECT query."""
-        try:
-            self.ensure_connection()
-            # Close any existing cursor
-            if hasattr(self, '_cursor') and self._cursor:
-                self._cursor.close()
-            
+        def work(connection):
             # Force the connection to reconnect
-            self.connection.cmd_reset_connection()
-            
-            with self.connection.cursor(dictionary=dictionary, buffered=False) as cursor:
+            connection.cmd_reset_connection()
+
+            with connection.cursor(dictionary=dictionary, buffered=False) as cursor:
                 cursor.execute("SET SESSION TRANSACTION ISOLATION LEVEL READ UNCOMMITTED")  # Allows reading uncommitted changes
                 cursor.execute(query, params)
                 result = cursor.fetchall()
-                self.connection.commit()  # Commit to ensure fresh data next time
-                return result
-        except Error as e:
-            print(f"Error fetching data: {e}")
-            self.handle_connection_error()
-            return self.fetch_all(query, params)  # Retry once after reconnection
-        
+                connection.commit()  # Commit to ensure fresh data next time
+            return result
+        return self._call('fetch_all', work)
+
     def fetch_one(self, query, params=None):
         """Fetch a single result for a SELECT query."""
-        try:
-            self.ensure_connection()
+        def work(connection):
             # Force the connection to reconnect
-            self.connection.cmd_reset_connection()
-            
-            with self.connection.cursor() as cursor:
+            connection.cmd_reset_connection()
+
+            with connection.cursor() as cursor:
                 cursor.execute("SET SESSION TRANSACTION ISOLATION LEVEL READ UNCOMMITTED")
                 cursor.execute(query, params)
                 result = cursor.fetchone()
-                self.connection.commit()
+                connection.commit()
                 return result
-        except Error as e:
-            print(f"Error fetching data: {e}")
-            self.handle_connection_error()
-            return self.fetch_one(query, params)  # Retry once after reconnection
+        return self._call('fetch_one', work)
 
     def close(self):
         """Close the MySQL connection."""
         if self.connection and self.connection.is_connected():
             self.connection.close()
             print("MySQL connection is closed")
-
-    def handle_connection_error(self):
-        """Handles MySQL connection errors by attempting a reconnection."""
-        if not self.connection or not self.connection.is_connected():
-            self.connect()
-            if self.connection.is_connected():
-                print("Reconnected to MySQL database")
-            else:
-                print("Failed to reconnect. Retrying in 5 seconds...")
-                sleep(5)
-                self.handle_connection_error()
+        self.connection = None
@@ -0,0 +1,220 @@
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Optional, Tuple
+from urllib.parse import parse_qs, urlparse
+
+from .metrics import registry
+
+logger = logging.getLogger(__name__)
+
+ENCODED = registry.counter('stream_frames_encoded_total', 'Frames captured and JPEG-encoded by the frame hub')
+DROPPED = registry.counter('stream_frames_dropped_total', 'Frames skipped by stream viewers that fell behind')
+VIEWERS = registry.gauge('stream_viewers', 'Connected MJPEG stream viewers')
+
+BOUNDARY = b'frame'
+INDEX_PAGE = b"""<!doctype html>
+<title>Grow bed</title>
+<body style="margin:0;background:#111"><img src="/stream.mjpg" style="width:100%"></body>
+"""
+
+
+class FrameHub:
+    def __init__(self, open_camera: Callable[[], Any], fps: float = 10.0, idle_seconds: float = 30.0,
+                 warmup_frames: int = 5):
+        """
+        Owns the camera for everything that wants frames: one capture thread reads and encodes
+        each frame once, and every viewer and snapshot is handed the same immutable JPEG bytes.
+        A viewer always gets the newest frame, frames it was too slow to send are skipped, so
+        more viewers cost no extra encodes and a slow one never holds up the others.
+
+        The camera is opened on the first request and released after `idle_seconds` without one.
+
+        :param open_camera: Returns a camera with capture_jpeg() and cleanup(), e.g. CameraCapture.
+        :param fps: Capture rate while the camera is open.
+        :param warmup_frames: Frames discarded after opening, while exposure settles.
+        """
+        self.open_camera = open_camera
+        self.fps = fps
+        self.idle_seconds = idle_seconds
+        self.warmup_frames = warmup_frames
+        self.sequence = 0
+        self.viewers = 0
+        self._jpeg: Optional[bytes] = None
+        self._captured_at = 0.0
+        self._last_demand = 0.0
+        self._thread: Optional[threading.Thread] = None
+        self._cond = threading.Condition()
+        # Held while the camera is open, a new capture thread waits for the old one to release it
+        self._camera_lock = threading.Lock()
+
+    def frame(self, after: int = 0, timeout: float = 5.0) -> Optional[Tuple[int, bytes]]:
+        """
+        Returns (sequence, jpeg) of the newest frame with a sequence above `after`, waiting up
+        to `timeout` seconds for the capture thread. None if no frame came in time.
+        """
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            self._demand()
+            while self._jpeg is None or self.sequence <= after:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return None
+                self._cond.wait(remaining)
+                self._demand()
+            return self.sequence, self._jpeg
+
+    def snapshot(self, max_age: float = 1.0, timeout: float = 5.0) -> Optional[bytes]:
+        """Returns the latest frame if it is at most `max_age` seconds old, otherwise waits for the next one."""
+        with self._cond:
+            if self._jpeg is not None and time.time() - self._captured_at <= max_age:
+                self._demand()
+                return self._jpeg
+            after = self.sequence
+        frame = self.frame(after, timeout)
+        return frame[1] if frame else None
+
+    @contextmanager
+    def viewer(self):
+        """Counts a connected stream viewer for the duration of the block."""
+        with self._cond:
+            self.viewers += 1
+            VIEWERS.set(self.viewers)
+        try:
+            yield
+        finally:
+            with self._cond:
+                self.viewers -= 1
+                VIEWERS.set(self.viewers)
+
+    def _demand(self) -> None:
+        # Called with self._cond held
+        self._last_demand = time.monotonic()
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._capture, name="FrameHub", daemon=True)
+            self._thread.start()
+
+    def _capture(self) -> None:
+        with self._camera_lock:
+            camera = None
+            try:
+                camera = self.open_camera()
+                for _ in range(self.warmup_frames):
+                    camera.capture_jpeg()
+                period = 1.0 / self.fps
+                next_frame = time.monotonic()
+                failures = 0
+                while True:
+                    with self._cond:
+                        if time.monotonic() - self._last_demand > self.idle_seconds:
+                            self._thread = None
+                            logger.info("Closing the camera, no stream viewers.")
+                            return
+                    jpeg = camera.capture_jpeg()
+                    if jpeg is None:
+                        failures += 1
+                        if failures >= 10:
+                            raise RuntimeError(f"{failures} captures in a row failed")
+                    else:
+                        failures = 0
+                        with self._cond:
+                            self.sequence += 1
+                            self._jpeg = jpeg
+                            self._captured_at = time.time()
+                            self._cond.notify_all()
+                        ENCODED.inc()
+                    next_frame += period
+                    delay = next_frame - time.monotonic()
+                    if delay > 0:
+                        time.sleep(delay)
+                    else:
+                        next_frame = time.monotonic()
+            except Exception as e:
+                logger.error(f"Camera stream capture failed: {e}")
+                with self._cond:
+                    self._thread = None
+                    self._jpeg = None
+            finally:
+                if camera is not None:
+                    try:
+                        camera.cleanup()
+                    except Exception as e:
+                        logger.warning(f"Failed to release the camera: {e}")
+
+
+class _StreamHandler(BaseHTTPRequestHandler):
+    hub: FrameHub = None
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        query = {key: values[-1] for key, values in parse_qs(url.query).items()}
+        try:
+            if url.path == '/':
+                self._send(200, 'text/html', INDEX_PAGE)
+            elif url.path == '/stream.mjpg':
+                self._stream(float(query['fps']) if 'fps' in query else None)
+            elif url.path == '/snapshot.jpg':
+                jpeg = self.hub.snapshot(float(query.get('max_age', 1.0)))
+                if jpeg is None:
+                    self.send_error(503, "No frame from the camera")
+                else:
+                    self._send(200, 'image/jpeg', jpeg)
+            else:
+                self.send_error(404)
+        except ValueError as e:
+            self.send_error(400, str(e))
+
+    def _send(self, status: int, content_type: str, body: bytes) -> None:
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('Cache-Control', 'no-store')
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _stream(self, fps: Optional[float]) -> None:
+        frame = self.hub.frame()
+        if frame is None:
+            self.send_error(503, "No frame from the camera")
+            return
+        self.send_response(200)
+        self.send_header('Content-Type', f"multipart/x-mixed-replace; boundary={BOUNDARY.decode()}")
+        self.send_header('Cache-Control', 'no-store')
+        self.end_headers()
+        period = 1.0 / fps if fps else 0.0
+        try:
+            with self.hub.viewer():
+                while frame is not None:
+                    sequence, jpeg = frame
+                    sent_at = time.monotonic()
+                    self.wfile.write(b'--%s\r\nContent-Type: image/jpeg\r\nContent-Length: %d\r\n\r\n' % (BOUNDARY, len(jpeg)))
+                    # The hub's bytes object itself, no per-viewer copy or encode
+                    self.wfile.write(jpeg)
+                    self.wfile.write(b'\r\n')
+                    if period:
+                        time.sleep(max(0.0, sent_at + period - time.monotonic()))
+                    frame = self.hub.frame(after=sequence)
+                    if frame and frame[0] > sequence + 1:
+                        DROPPED.inc(frame[0] - sequence - 1)
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+    def log_message(self, format, *args):
+        logger.debug(f"Stream {self.address_string()} {format % args}")
+
+
+def serve_stream(host: str, port: int, hub: FrameHub) -> ThreadingHTTPServer:
+    """
+    Starts the camera preview server on a daemon thread:
+        GET /                           page showing the stream
+        GET /stream.mjpg?fps=           MJPEG stream, optionally slower than the capture rate
+        GET /snapshot.jpg?max_age=1     one frame, at most max_age seconds old
+    """
+    handler = type('StreamHandler', (_StreamHandler,), {'hub': hub})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="CameraStream", daemon=True).start()
+    logger.info(f"Camera stream on http://{host}:{port}/stream.mjpg")
+    return server
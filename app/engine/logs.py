@@ -0,0 +1,147 @@
+import logging
+import logging.handlers
+import multiprocessing
+import queue
+import time
+from datetime import datetime
+from typing import Dict, Optional
+
+
+class TableFormatter(logging.Formatter):
+    """
+    Custom logging formatter to display logs in a structured table format.
+    """
+    def __init__(self):
+        self.timestamp_width = 20
+        self.level_width = 10
+        self.process_width = 25
+        self.message_width = 150
+        self._last_second = None
+        self._last_timestamp = ''
+        super().__init__()
+
+    def format(self, record):
+        # strftime only once per second, most records share the same timestamp
+        second = int(record.created)
+        if second != self._last_second:
+            self._last_second = second
+            self._last_timestamp = datetime.fromtimestamp(second).strftime('%Y-%m-%d %H:%M:%S')
+        timestamp = self._last_timestamp
+        level = record.levelname
+        process = record.processName
+        message = record.getMessage()
+
+        if len(message) > self.message_width - 3:
+            message = message[:self.message_width - 6] + '...'
+
+        formatted = f"{timestamp:<{self.timestamp_width}} | {level:<{self.level_width}} | {process:<{self.process_width}} | {message:<{self.message_width}}"
+        return formatted
+
+
+class RateLimitFilter(logging.Filter):
+    def __init__(self, burst: int = 5, period: float = 60.0):
+        """
+        Drops repeats of the same message from the same logging call (file, line and formatted
+        text) once `burst` of them were seen within `period` seconds. Distinct messages from
+        one call, such as one line per sensor, all get through. A summary of the dropped count
+        is attached to the next record that gets through. DEBUG records are never dropped, they
+        are only logged when asked for.
+
+        :param burst: Identical messages allowed per logging call and period.
+        :param period: Length of the rate-limit window in seconds.
+        """
+        super().__init__()
+        self.burst = burst
+        self.period = period
+        self._windows: Dict[tuple, list] = {}
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno <= logging.DEBUG:
+            return True
+        key = (record.pathname, record.lineno, record.getMessage())
+        now = time.monotonic()
+        window = self._windows.get(key)
+        if window is None or now - window[0] >= self.period:
+            suppressed = window[2] if window else 0
+            if len(self._windows) > 1024:
+                self._windows.clear()
+            self._windows[key] = [now, 1, 0]
+            if suppressed:
+                record.msg = f"{record.msg} (suppressed {suppressed} repeats)"
+            return True
+        if window[1] < self.burst:
+            window[1] += 1
+            return True
+        window[2] += 1
+        return False
+
+
+class NonBlockingQueueHandler(logging.handlers.QueueHandler):
+    """
+    QueueHandler that never blocks the caller; records are dropped when the queue is full.
+    """
+    dropped = 0
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            NonBlockingQueueHandler.dropped += 1
+
+
+_listener: Optional[logging.handlers.QueueListener] = None
+
+
+def start_logging(filename: str, max_bytes: int, backup_count: int,
+                  levels: Optional[Dict[str, str]] = None, queue_size: int = 10000,
+                  burst: int = 5, period: float = 60.0) -> logging.handlers.QueueListener:
+    """
+    Routes all logging through a multiprocessing queue drained by a single listener thread.
+
+    Worker processes forked afterwards inherit the queue handler, so they only pay for an
+    enqueue. The listener in this process does the formatting and the writes to the console
+    and to a size-rotated log file.
+
+    :param filename: Log file path.
+    :param max_bytes: Size at which the log file is rotated.
+    :param backup_count: Number of rotated files kept.
+    :param levels: Per-logger levels, e.g. {"app.sensors.relay": "WARNING"}; the root logger is INFO.
+    :param queue_size: Maximum queued records before new ones are dropped.
+    :param burst: Identical messages allowed per logging call and rate-limit period.
+    :param period: Rate-limit period in seconds.
+    """
+    global _listener
+    if _listener is not None:
+        return _listener
+
+    log_queue = multiprocessing.Queue(queue_size)
+    formatter = TableFormatter()
+
+    stream_handler = logging.StreamHandler()
+    stream_handler.setFormatter(formatter)
+    file_handler = logging.handlers.RotatingFileHandler(filename, maxBytes=max_bytes, backupCount=backup_count)
+    file_handler.setFormatter(formatter)
+
+    queue_handler = NonBlockingQueueHandler(log_queue)
+    queue_handler.addFilter(RateLimitFilter(burst, period))
+
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(queue_handler)
+    root.setLevel(logging.INFO)
+
+    for name, level in (levels or {}).items():
+        logging.getLogger(name).setLevel(level)
+
+    _listener = logging.handlers.QueueListener(log_queue, stream_handler, file_handler)
+    _listener.start()
+    return _listener
+
+
+def stop_logging() -> None:
+    """Flushes the queue and stops the listener thread."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
@@ -0,0 +1,372 @@
+import atexit
+import fcntl
+import glob
+import json
+import logging
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Counters and histograms of processes that exited, kept so totals never go backwards
+RETIRED_FILE = 'retired.json'
+
+# Latency buckets in seconds, from sub-millisecond DB calls up to slow driver reads
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class _Child:
+    __slots__ = ('value',)
+
+    def __init__(self):
+        self.value = 0.0
+
+    def inc(self, amount: float = 1.0) -> None:
+        self.value += amount
+
+    def dec(self, amount: float = 1.0) -> None:
+        self.value -= amount
+
+    def set(self, value: float) -> None:
+        self.value = value
+
+
+class _HistogramChild:
+    __slots__ = ('buckets', 'counts', 'sum', 'count')
+
+    def __init__(self, buckets: Tuple[float, ...]):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    @contextmanager
+    def time(self):
+        """Observes the wall time spent inside the block."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start)
+
+
+class Metric:
+    def __init__(self, registry: "MetricsRegistry", name: str, kind: str, documentation: str,
+                 labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.registry = registry
+        self.name = name
+        self.kind = kind
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self.children: Dict[Tuple[str, ...], object] = {}
+
+    def labels(self, *values):
+        """
+        Returns the child for the given label values, creating it on first use.
+        Look children up per call instead of holding on to them, forked processes start empty.
+        """
+        key = tuple(str(v) for v in values)
+        child = self.children.get(key)
+        if child is None:
+            if len(key) != len(self.labelnames):
+                raise ValueError(f"{self.name} expects labels {self.labelnames}, got {values}")
+            child = _HistogramChild(self.buckets) if self.kind == 'histogram' else _Child()
+            self.children[key] = child
+            self.registry.ensure_flusher()
+        return child
+
+    def inc(self, amount: float = 1.0) -> None:
+        self.labels().inc(amount)
+
+    def set(self, value: float) -> None:
+        self.labels().set(value)
+
+    def observe(self, value: float) -> None:
+        self.labels().observe(value)
+
+    def time(self):
+        return self.labels().time()
+
+    def snapshot(self) -> Dict:
+        samples = []
+        for key, child in list(self.children.items()):
+            if self.kind == 'histogram':
+                samples.append([list(key), [list(child.counts), child.sum, child.count]])
+            else:
+                samples.append([list(key), child.value])
+        return {
+            'type': self.kind,
+            'help': self.documentation,
+            'labels': list(self.labelnames),
+            'buckets': list(self.buckets),
+            'samples': samples,
+        }
+
+
+class MetricsRegistry:
+    def __init__(self):
+        """
+        Process-local counters, gauges and histograms.
+
+        Updates are plain attribute writes under the GIL. When a directory is configured, each
+        process periodically writes a JSON snapshot to <directory>/<pid>.json and the HTTP
+        endpoint merges the snapshots of all processes.
+        """
+        self.metrics: Dict[str, Metric] = {}
+        self.directory: Optional[str] = None
+        self.flush_interval = 10.0
+        self._flusher: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        os.register_at_fork(after_in_child=self._after_fork)
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Metric:
+        return self._register(name, 'counter', documentation, labelnames)
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Metric:
+        return self._register(name, 'gauge', documentation, labelnames)
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Metric:
+        return self._register(name, 'histogram', documentation, labelnames, buckets)
+
+    def configure(self, directory: Optional[str], flush_interval: float = 10.0) -> None:
+        """
+        Enables cross-process export through snapshot files.
+        :param directory: Directory holding one snapshot file per process.
+        :param flush_interval: Seconds between snapshot writes.
+        """
+        self.directory = directory
+        self.flush_interval = flush_interval
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+            atexit.register(self.flush)
+
+    def clear_directory(self) -> None:
+        """Removes snapshots left over from a previous run."""
+        if self.directory:
+            for path in glob.glob(os.path.join(self.directory, '*.json')):
+                os.remove(path)
+
+    def snapshot(self) -> Dict:
+        return {
+            'pid': os.getpid(),
+            'time': time.time(),
+            'metrics': {name: metric.snapshot() for name, metric in list(self.metrics.items())},
+        }
+
+    def flush(self) -> None:
+        """Writes this process's snapshot atomically."""
+        if not self.directory:
+            return
+        path = os.path.join(self.directory, f"{os.getpid()}.json")
+        tmp_path = f"{path}.tmp"
+        try:
+            with open(tmp_path, 'w') as file:
+                json.dump(self.snapshot(), file)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logger.warning(f"Failed to write metrics snapshot: {e}")
+
+    def ensure_flusher(self) -> None:
+        if not self.directory or self._flusher is not None:
+            return
+        with self._lock:
+            if self._flusher is None:
+                self._flusher = threading.Thread(target=self._flush_loop, name="MetricsFlusher", daemon=True)
+                self._flusher.start()
+
+    def collect(self) -> List[Dict]:
+        """Returns the snapshots of this process and every other process that exported one."""
+        snapshots = [self.snapshot()]
+        if self.directory:
+            self._retire_dead()
+            own = f"{os.getpid()}.json"
+            for path in glob.glob(os.path.join(self.directory, '*.json')):
+                if os.path.basename(path) == own:
+                    continue
+                try:
+                    with open(path) as file:
+                        snapshots.append(json.load(file))
+                except (OSError, ValueError):
+                    continue
+        return snapshots
+
+    def render(self) -> str:
+        """Renders the merged snapshots in the Prometheus text exposition format."""
+        return render_prometheus(self.collect())
+
+    def _register(self, name, kind, documentation, labelnames, buckets=DEFAULT_BUCKETS) -> Metric:
+        metric = self.metrics.get(name)
+        if metric is None:
+            metric = Metric(self, name, kind, documentation, labelnames, buckets)
+            self.metrics[name] = metric
+        return metric
+
+    def _retire_dead(self) -> None:
+        """
+        Folds the snapshots of processes that exited (cycle workers come and go) into
+        RETIRED_FILE and removes them. Their counters and histograms are added up there, their
+        gauges are dropped.
+        """
+        retired_path = os.path.join(self.directory, RETIRED_FILE)
+        with self._lock, open(f"{retired_path}.lock", 'w') as lock:
+            # Anything else reading the directory may be retiring the same files
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            dead = []
+            for path in glob.glob(os.path.join(self.directory, '*.json')):
+                pid = os.path.basename(path)[:-len('.json')]
+                if not pid.isdigit() or _alive(int(pid)):
+                    continue
+                try:
+                    with open(path) as file:
+                        dead.append((path, json.load(file)))
+                except (OSError, ValueError):
+                    dead.append((path, {}))
+            if not dead:
+                return
+            try:
+                with open(retired_path) as file:
+                    retired = json.load(file)
+            except (OSError, ValueError):
+                retired = {'pid': 'retired', 'time': 0, 'metrics': {}}
+            for _, snapshot in dead:
+                for name, data in snapshot.get('metrics', {}).items():
+                    if data['type'] == 'gauge':
+                        continue
+                    entry = retired['metrics'].setdefault(name, {**data, 'samples': []})
+                    values = {tuple(labels): value for labels, value in entry['samples']}
+                    for labels, value in data['samples']:
+                        _add_sample(data['type'], values, tuple(labels), value)
+                    entry['samples'] = [[list(key), value] for key, value in values.items()]
+            tmp_path = f"{retired_path}.tmp"
+            try:
+                with open(tmp_path, 'w') as file:
+                    json.dump(retired, file)
+                os.replace(tmp_path, retired_path)
+                for path, _ in dead:
+                    os.remove(path)
+            except OSError as e:
+                logger.warning(f"Failed to retire metrics snapshots: {e}")
+
+    def _flush_loop(self) -> None:
+        while True:
+            time.sleep(self.flush_interval)
+            self.flush()
+
+    def _after_fork(self) -> None:
+        # The child starts from zero so the parent's values are not counted twice
+        self._flusher = None
+        self._lock = threading.Lock()
+        for metric in self.metrics.values():
+            metric.children = {}
+
+
+def _alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def _add_sample(kind: str, values: Dict, key: Tuple, value) -> None:
+    """Merges one sample: gauges take the value, counters and histograms are summed."""
+    if kind == 'gauge':
+        values[key] = value
+    elif kind == 'histogram':
+        current = values.get(key)
+        if current is None:
+            values[key] = [list(value[0]), value[1], value[2]]
+        else:
+            current[0] = [a + b for a, b in zip(current[0], value[0])]
+            current[1] += value[1]
+            current[2] += value[2]
+    else:
+        values[key] = values.get(key, 0.0) + value
+
+
+def _format_labels(names: Iterable[str], values: Iterable[str], extra: str = '') -> str:
+    pairs = [f'{name}="{value}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _format_value(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+def render_prometheus(snapshots: List[Dict]) -> str:
+    """
+    Merges per-process snapshots: counters and histograms are summed, gauges keep the most
+    recently written value.
+    """
+    merged: Dict[str, Dict] = {}
+    for snapshot in sorted(snapshots, key=lambda s: s.get('time', 0)):
+        for name, data in snapshot.get('metrics', {}).items():
+            entry = merged.setdefault(name, {**data, 'values': {}})
+            values = entry['values']
+            for labels, value in data['samples']:
+                _add_sample(data['type'], values, tuple(labels), value)
+
+    lines = []
+    for name in sorted(merged):
+        entry = merged[name]
+        lines.append(f"# HELP {name} {entry['help']}")
+        lines.append(f"# TYPE {name} {entry['type']}")
+        for key, value in sorted(entry['values'].items()):
+            if entry['type'] == 'histogram':
+                counts, total, count = value
+                cumulative = 0
+                for bound, bucket_count in zip(list(entry['buckets']) + [float('inf')], counts):
+                    cumulative += bucket_count
+                    le = f'le="{_format_value(bound)}"'
+                    lines.append(f"{name}_bucket{_format_labels(entry['labels'], key, le)} {cumulative}")
+                lines.append(f"{name}_sum{_format_labels(entry['labels'], key)} {_format_value(total)}")
+                lines.append(f"{name}_count{_format_labels(entry['labels'], key)} {count}")
+            else:
+                lines.append(f"{name}{_format_labels(entry['labels'], key)} {_format_value(value)}")
+    return '\n'.join(lines) + '\n'
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split('?')[0] != '/metrics':
+            self.send_error(404)
+            return
+        body = registry.render().encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def serve_metrics(host: str, port: int) -> ThreadingHTTPServer:
+    """Starts the /metrics endpoint on a daemon thread."""
+    server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="MetricsServer", daemon=True).start()
+    logger.info(f"Metrics endpoint listening on http://{host}:{port}/metrics")
+    return server
+
+
+registry = MetricsRegistry()
@@ -0,0 +1,366 @@
+import argparse
+import hashlib
+import json
+import logging
+import math
+import os
+import random
+import re
+import statistics
+import time
+from datetime import date, datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+import mysql.connector
+
+from . import db as default_db
+
+logger = logging.getLogger(__name__)
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'migrations')
+MIGRATION_FILE = re.compile(r'^(\d{4})_(\w+)\.sql$')
+
+CREATE_MIGRATIONS_TABLE = """
+    CREATE TABLE IF NOT EXISTS schema_migrations (
+        version CHAR(4) NOT NULL PRIMARY KEY,
+        name VARCHAR(128) NOT NULL,
+        checksum CHAR(64) NOT NULL,
+        applied_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP
+    ) ENGINE=InnoDB
+"""
+
+
+def load_migrations(directory: str = MIGRATIONS_DIR) -> List[Tuple[str, str, str]]:
+    """Returns (version, name, path) of every NNNN_name.sql file, in version order."""
+    migrations = []
+    for filename in sorted(os.listdir(directory)):
+        match = MIGRATION_FILE.match(filename)
+        if match:
+            migrations.append((match.group(1), match.group(2), os.path.join(directory, filename)))
+    return migrations
+
+
+def split_statements(sql: str) -> List[str]:
+    """Splits a migration file on statement-ending semicolons, dropping -- comments."""
+    lines = [line for line in sql.splitlines() if not line.strip().startswith('--')]
+    return [statement.strip() for statement in re.split(r';\s*$', '\n'.join(lines), flags=re.M) if statement.strip()]
+
+
+def _checksum(path: str) -> str:
+    with open(path, 'rb') as file:
+        return hashlib.sha256(file.read()).hexdigest()
+
+
+def _to_days(day: date) -> int:
+    """MySQL TO_DAYS() of a date."""
+    return day.toordinal() + 365
+
+
+def _next_month(day: date) -> date:
+    return (day.replace(day=1) + timedelta(days=32)).replace(day=1)
+
+
+def ensure_partitions(connection, table: str = 'sensor_data', months_ahead: int = 3,
+                      today: Optional[date] = None) -> List[str]:
+    """
+    Splits monthly partitions off the MAXVALUE partition of a range-partitioned table until
+    the month `months_ahead` from now is covered. Does nothing on an unpartitioned table.
+    Unlike Migrator it does not create schema_migrations, so the retention job can call it.
+    Returns the names of the partitions added.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(
+            """
+            SELECT PARTITION_NAME, PARTITION_DESCRIPTION FROM information_schema.PARTITIONS
+            WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND PARTITION_NAME IS NOT NULL
+            """,
+            (table,),
+        )
+        partitions = cursor.fetchall()
+    bounds = [int(description) for _, description in partitions if description != 'MAXVALUE']
+    future = [name for name, description in partitions if description == 'MAXVALUE']
+    if not bounds or not future:
+        return []
+
+    month = date.fromordinal(max(bounds) - 365)
+    target = (today or date.today()).replace(day=1)
+    for _ in range(months_ahead + 1):
+        target = _next_month(target)
+
+    added = []
+    definitions = []
+    while month < target:
+        upper = _next_month(month)
+        name = f"p{month:%Y%m}"
+        definitions.append(f"PARTITION {name} VALUES LESS THAN ({_to_days(upper)})")
+        added.append(name)
+        month = upper
+    if definitions:
+        definitions.append(f"PARTITION {future[0]} VALUES LESS THAN MAXVALUE")
+        with connection.cursor() as cursor:
+            cursor.execute(f"ALTER TABLE {table} REORGANIZE PARTITION {future[0]} INTO ({', '.join(definitions)})")
+        logger.info(f"Added partitions {', '.join(added)} to {table}.")
+    return added
+
+
+class Migrator:
+    def __init__(self, connection, directory: str = MIGRATIONS_DIR):
+        """
+        Applies the versioned SQL files in `directory` in order and records each one in
+        schema_migrations. DDL commits implicitly, so a failing migration is not rolled back:
+        the error names the statement, fix it and run `up` again.
+
+        :param connection: mysql.connector connection with autocommit enabled.
+        :param directory: Directory of NNNN_name.sql files.
+        """
+        self.connection = connection
+        self.directory = directory
+        with self.connection.cursor() as cursor:
+            cursor.execute(CREATE_MIGRATIONS_TABLE)
+
+    def applied(self) -> Dict[str, str]:
+        """Returns {version: checksum} of applied migrations."""
+        with self.connection.cursor() as cursor:
+            cursor.execute("SELECT version, checksum FROM schema_migrations")
+            return dict(cursor.fetchall())
+
+    def status(self) -> List[Tuple[str, str, str]]:
+        """Returns (version, name, state) per migration: applied, pending or changed."""
+        applied = self.applied()
+        result = []
+        for version, name, path in load_migrations(self.directory):
+            if version not in applied:
+                state = 'pending'
+            elif applied[version] != _checksum(path):
+                state = 'changed'
+            else:
+                state = 'applied'
+            result.append((version, name, state))
+        return result
+
+    def up(self, target: Optional[str] = None) -> List[str]:
+        """
+        Applies pending migrations up to and including `target` (default: all).
+        Returns the applied versions.
+        """
+        applied = self.applied()
+        done = []
+        for version, name, path in load_migrations(self.directory):
+            if version in applied:
+                continue
+            if target is not None and version > target:
+                break
+            with open(path) as file:
+                statements = split_statements(file.read())
+            start = time.perf_counter()
+            with self.connection.cursor() as cursor:
+                for statement in statements:
+                    try:
+                        cursor.execute(statement)
+                    except mysql.connector.Error as e:
+                        raise RuntimeError(f"Migration {version}_{name} failed at:\n{statement}\n{e}") from e
+                cursor.execute(
+                    "INSERT INTO schema_migrations (version, name, checksum) VALUES (%s, %s, %s)",
+                    (version, name, _checksum(path)),
+                )
+            logger.info(f"Applied migration {version}_{name} in {time.perf_counter() - start:.2f}s.")
+            done.append(version)
+        self.ensure_partitions()
+        return done
+
+    def ensure_partitions(self, table: str = 'sensor_data', months_ahead: int = 3,
+                          today: Optional[date] = None) -> List[str]:
+        """See the module-level ensure_partitions."""
+        return ensure_partitions(self.connection, table, months_ahead, today)
+
+
+def connect(args, database: Optional[str] = None, timeout: Optional[float] = None):
+    """
+    Opens an autocommit connection that raises on errors, unlike MySQLWrapper.
+    :param args: Anything with host, user, password and database attributes (parsed arguments, a MySQLWrapper).
+    :param database: Overrides args.database, '' connects without selecting one.
+    :param timeout: Seconds a connect or a statement may take before it raises; the connector
+                    waits indefinitely by default.
+    """
+    options = {'connection_timeout': int(math.ceil(timeout))} if timeout else {}
+    return mysql.connector.connect(
+        host=args.host,
+        user=args.user,
+        password=args.password,
+        database=database if database is not None else args.database,
+        autocommit=True,
+        **options,
+    )
+
+
+################################################################################
+# Benchmark
+################################################################################
+
+def _measure(connection, sensors: int, days: int, queries: int, inserts: int) -> Dict[str, float]:
+    """Times the application's own statements against the current schema."""
+    now = datetime.now().replace(microsecond=0)
+    result = {}
+    with connection.cursor() as cursor:
+        start = time.perf_counter()
+        for _ in range(inserts):
+            # One autocommitted INSERT per reading, as insert_sensor_data does
+            cursor.execute(
+                "INSERT INTO sensor_data (sensor_id, value, reading_time) VALUES (%s, %s, %s)",
+                (random.randint(1, sensors), round(random.uniform(0, 100), 2), now),
+            )
+        result['insert_ms'] = (time.perf_counter() - start) * 1000 / inserts
+
+        durations = []
+        examined = []
+        for _ in range(queries):
+            sensor_id = random.randint(1, sensors)
+            window_end = now - timedelta(seconds=random.randint(0, days * 86400))
+            params = (sensor_id, window_end - timedelta(days=1), window_end)
+            query = """
+                SELECT reading_time, value FROM sensor_data
+                WHERE sensor_id = %s AND reading_time BETWEEN %s AND %s
+            """
+            start = time.perf_counter()
+            cursor.execute(query, params)
+            cursor.fetchall()
+            durations.append((time.perf_counter() - start) * 1000)
+            cursor.execute(f"EXPLAIN {query}", params)
+            plan = cursor.fetchall()
+            columns = [column[0] for column in cursor.description]
+            examined.append(sum(int(row[columns.index('rows')] or 0) for row in plan))
+        durations.sort()
+        result['range_query_p50_ms'] = statistics.median(durations)
+        result['range_query_p95_ms'] = durations[int(len(durations) * 0.95) - 1]
+        result['range_query_rows_examined'] = statistics.median(examined)
+
+        start = time.perf_counter()
+        for _ in range(queries):
+            cursor.execute(
+                "SELECT cycle_id, interval_seconds, duration_minutes, pause, is_active FROM cycles "
+                "WHERE sensor_id = %s AND is_active = 1",
+                (random.randint(1, sensors),),
+            )
+            cursor.fetchall()
+        result['cycles_query_ms'] = (time.perf_counter() - start) * 1000 / queries
+
+        cursor.execute(
+            "SELECT data_length + index_length FROM information_schema.TABLES "
+            "WHERE table_schema = DATABASE() AND table_name = 'sensor_data'"
+        )
+        result['table_mb'] = cursor.fetchone()[0] / 1e6
+    return result
+
+
+def bench(args) -> Dict[str, Dict[str, float]]:
+    """
+    Builds a throwaway database with the baseline schema, loads synthetic readings, measures,
+    applies the remaining migrations and measures again.
+    """
+    server = connect(args, database='')
+    with server.cursor() as cursor:
+        cursor.execute(f"DROP DATABASE IF EXISTS `{args.database}`")
+        cursor.execute(f"CREATE DATABASE `{args.database}`")
+    server.close()
+
+    connection = connect(args)
+    migrator = Migrator(connection)
+    migrator.up(target='0001')
+
+    now = datetime.now()
+    start = time.perf_counter()
+    with connection.cursor() as cursor:
+        for sensor_id in range(1, args.sensors + 1):
+            cursor.executemany(
+                "INSERT INTO cycles (sensor_id, interval_seconds, duration_minutes, pause, is_active) VALUES (%s, %s, %s, %s, %s)",
+                [(sensor_id, 60, 30, 10, '1' if n == 0 else '0') for n in range(5)],
+            )
+        batch = []
+        for n in range(args.rows):
+            reading_time = now - timedelta(seconds=args.days * 86400 * (1 - n / args.rows))
+            batch.append((n % args.sensors + 1, round(random.uniform(0, 100), 2), reading_time.replace(microsecond=0)))
+            if len(batch) == 5000:
+                cursor.executemany("INSERT INTO sensor_data (sensor_id, value, reading_time) VALUES (%s, %s, %s)", batch)
+                batch = []
+        if batch:
+            cursor.executemany("INSERT INTO sensor_data (sensor_id, value, reading_time) VALUES (%s, %s, %s)", batch)
+    logger.info(f"Loaded {args.rows} readings in {time.perf_counter() - start:.1f}s.")
+
+    results = {'before': _measure(connection, args.sensors, args.days, args.queries, args.inserts)}
+    start = time.perf_counter()
+    migrator.up()
+    results['migrate_seconds'] = {'total': time.perf_counter() - start}
+    results['after'] = _measure(connection, args.sensors, args.days, args.queries, args.inserts)
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT VERSION()")
+        server_version = cursor.fetchone()[0]
+    # Enough to tell later which server and data set the numbers came from
+    results['run'] = {'server': server_version, 'date': now.strftime('%Y-%m-%d'), 'rows': args.rows,
+                      'sensors': args.sensors, 'days': args.days, 'queries': args.queries, 'inserts': args.inserts}
+    connection.close()
+    return results
+
+
+################################################################################
+# Command Line
+################################################################################
+
+def main():
+    parser = argparse.ArgumentParser(description="Apply schema migrations to the hydroponics database.")
+    parser.add_argument('--host', default=default_db.host)
+    parser.add_argument('--user', default=default_db.user)
+    parser.add_argument('--password', default=default_db.password)
+    parser.add_argument('--database', default=default_db.database)
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    commands.add_parser('status', help="list migrations and whether they are applied")
+    up = commands.add_parser('up', help="apply pending migrations")
+    up.add_argument('--target', help="stop after this version, e.g. 0003")
+    partitions = commands.add_parser('partitions', help="add upcoming monthly partitions to sensor_data")
+    partitions.add_argument('--months-ahead', type=int, default=3)
+    bench_parser = commands.add_parser('bench', help="compare the schema before and after migrating, on a scratch database")
+    bench_parser.add_argument('--rows', type=int, default=500000)
+    bench_parser.add_argument('--sensors', type=int, default=11)
+    bench_parser.add_argument('--days', type=int, default=180)
+    bench_parser.add_argument('--queries', type=int, default=200)
+    bench_parser.add_argument('--inserts', type=int, default=1000)
+    bench_parser.add_argument('--json', action='store_true', help="print the results as JSON")
+    bench_parser.add_argument('--output', help="also write the results as JSON to this file, e.g. for migrations/BENCHMARK.md")
+
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s | %(levelname)s | %(message)s")
+
+    if args.command == 'bench':
+        # Whatever the database name, never drop and recreate one on the production server
+        if args.host == default_db.host:
+            parser.error("bench drops and recreates --database, pass --host of a local scratch server")
+        results = bench(args)
+        if args.output:
+            with open(args.output, 'w') as f:
+                json.dump(results, f, indent=2)
+        if args.json:
+            print(json.dumps(results, indent=2))
+            return
+        print(f"{'':<28}{'before':>12}{'after':>12}")
+        for key in results['before']:
+            print(f"{key:<28}{results['before'][key]:>12.3f}{results['after'][key]:>12.3f}")
+        print(f"{'migration seconds':<28}{results['migrate_seconds']['total']:>12.1f}")
+        print(f"{results['run']['server']}, {args.rows} rows over {args.days} days, {args.sensors} sensors")
+        return
+
+    connection = connect(args)
+    migrator = Migrator(connection)
+    if args.command == 'status':
+        for version, name, state in migrator.status():
+            print(f"{version}  {name:<32} {state}")
+    elif args.command == 'up':
+        applied = migrator.up(args.target)
+        print(f"Applied {len(applied)} migration(s).")
+    else:
+        added = migrator.ensure_partitions(months_ahead=args.months_ahead)
+        print(f"Added {len(added)} partition(s).")
+    connection.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,254 @@
+import argparse
+import hashlib
+import logging
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Optional, Set
+
+from . import db as default_db
+from .metrics import registry
+from .migrate import Migrator, connect
+
+logger = logging.getLogger(__name__)
+
+OWNED = registry.gauge('node_owned_resources', 'Sensors and relays this node currently runs')
+LEASE_ERRORS = registry.counter('node_lease_errors_total', 'Lease renewals that failed')
+
+HEARTBEAT = """
+    INSERT INTO node_heartbeats (node_id, last_seen, started_at) VALUES (%s, NOW(3), NOW(3))
+    ON DUPLICATE KEY UPDATE last_seen = NOW(3)
+"""
+
+# The node_id assignment runs first, so the expires_at condition sees the new owner: a lease
+# is extended by its holder, taken over once expired, and left alone otherwise
+CLAIM = """
+    INSERT INTO node_leases (resource, node_id, expires_at) VALUES {rows}
+    ON DUPLICATE KEY UPDATE
+        node_id = IF(node_id = VALUES(node_id) OR expires_at < NOW(3), VALUES(node_id), node_id),
+        expires_at = IF(node_id = VALUES(node_id), VALUES(expires_at), expires_at)
+"""
+
+
+def preferred_node(resource: str, nodes: Iterable[str]) -> Optional[str]:
+    """
+    Rendezvous hashing: every node computes the same preferred owner for a resource, and
+    only the resources of a node that leaves or joins change hands.
+    """
+    return max(nodes, key=lambda node: hashlib.sha1(f"{node}|{resource}".encode()).digest(), default=None)
+
+
+class NodeOwnership:
+    def __init__(self, node_id: str, connection_factory: Optional[Callable] = None,
+                 lease_seconds: float = 30.0, leases: bool = True):
+        """
+        Decides which sensors and relays this node runs when several nodes share one database.
+
+        A resource (e.g. 'sensor:3', 'relay:2') is assigned either statically, to the node
+        named in its config, or through a lease row. Leased resources are spread over the
+        live nodes by rendezvous hashing; a node claims the ones it is preferred for, hands
+        back the ones it no longer is, and takes over any lease whose holder stopped renewing.
+        Lease expiry is judged by the database clock, so node clocks do not need to agree.
+
+        If renewals fail, leased resources are only kept until the last successful lease runs
+        out, after which another node may take them: holds() turns False at that moment, even
+        if no renewal has been attempted since.
+
+        :param node_id: This node's name, unique per deployment.
+        :param connection_factory: Returns a new autocommit mysql.connector connection.
+        :param lease_seconds: Lease length; renew well within it.
+        :param leases: Without leases every resource not statically assigned elsewhere is owned.
+        """
+        self.node_id = node_id
+        self.connection_factory = connection_factory
+        self.lease_seconds = lease_seconds
+        self.leases = leases
+        self.owned: Set[str] = set()
+        self._leased: Set[str] = set()
+        self._valid_until = 0.0
+        self._connection = None
+
+    def update(self, resources: Dict[str, Optional[str]]) -> Set[str]:
+        """
+        Heartbeats, renews leases and returns the resources this node owns now.
+        :param resources: Resource name -> statically assigned node, or None to lease it.
+        """
+        owned = {resource for resource, node in resources.items() if node == self.node_id}
+        leased = [resource for resource, node in resources.items() if node is None]
+        if leased and not self.leases:
+            owned.update(leased)
+        elif leased:
+            started = time.monotonic()
+            try:
+                self._leased = self._renew(leased)
+                self._valid_until = started + self.lease_seconds
+            except Exception as e:
+                LEASE_ERRORS.inc()
+                self._connection = None
+                if time.monotonic() >= self._valid_until and self._leased:
+                    logger.error(f"Node {self.node_id} could not renew its leases and gives them up: {e}")
+                    self._leased = set()
+                else:
+                    logger.warning(f"Node {self.node_id} failed to renew leases: {e}")
+            owned.update(self._leased)
+
+        for resource in owned - self.owned:
+            logger.info(f"Node {self.node_id} now owns {resource}.")
+        for resource in self.owned - owned:
+            logger.info(f"Node {self.node_id} no longer owns {resource}.")
+        self.owned = owned
+        OWNED.set(len(owned))
+        return owned
+
+    def holds(self, resource: str) -> bool:
+        """Whether this node owns `resource` right now, False for a lease that ran out since the last renewal."""
+        if resource not in self.owned:
+            return False
+        return resource not in self._leased or time.monotonic() < self._valid_until
+
+    def release(self) -> None:
+        """Drops this node's leases so other nodes can take over without waiting for expiry."""
+        if not self.leases or not self._leased:
+            return
+        try:
+            with self._cursor() as cursor:
+                cursor.execute("DELETE FROM node_leases WHERE node_id = %s", (self.node_id,))
+                cursor.execute("DELETE FROM node_heartbeats WHERE node_id = %s", (self.node_id,))
+        except Exception as e:
+            logger.warning(f"Node {self.node_id} could not release its leases: {e}")
+        self._leased = set()
+
+    def _cursor(self):
+        if self._connection is None:
+            self._connection = self.connection_factory()
+        return self._connection.cursor()
+
+    def _renew(self, resources: List[str]) -> Set[str]:
+        with self._cursor() as cursor:
+            cursor.execute(HEARTBEAT, (self.node_id,))
+            cursor.execute(
+                "SELECT node_id FROM node_heartbeats WHERE last_seen > NOW(3) - INTERVAL %s SECOND",
+                (self.lease_seconds,),
+            )
+            alive = {row[0] for row in cursor.fetchall()} | {self.node_id}
+            wanted = [resource for resource in resources if preferred_node(resource, alive) == self.node_id]
+
+            # Hand back what another live node is now preferred for, it claims it on its next renewal
+            handed_back = [resource for resource in self._leased if resource not in wanted]
+            if handed_back:
+                cursor.execute(
+                    f"DELETE FROM node_leases WHERE node_id = %s AND resource IN ({', '.join(['%s'] * len(handed_back))})",
+                    (self.node_id, *handed_back),
+                )
+            if wanted:
+                rows = ', '.join(['(%s, %s, NOW(3) + INTERVAL %s SECOND)'] * len(wanted))
+                params = []
+                for resource in wanted:
+                    params.extend((resource, self.node_id, self.lease_seconds))
+                cursor.execute(CLAIM.format(rows=rows), params)
+
+            cursor.execute(
+                "SELECT resource FROM node_leases WHERE node_id = %s AND expires_at > NOW(3)",
+                (self.node_id,),
+            )
+            return {row[0] for row in cursor.fetchall()} & set(resources)
+
+
+################################################################################
+# Simulation
+################################################################################
+
+def simulate(args) -> bool:
+    """
+    Runs several nodes as threads against a scratch database and checks that every resource
+    has exactly one owner, that a stopped node's resources fail over, and that a returning
+    node gets its share back. Returns True if every check passed.
+    """
+    server = connect(args, database='')
+    with server.cursor() as cursor:
+        cursor.execute(f"DROP DATABASE IF EXISTS `{args.database}`")
+        cursor.execute(f"CREATE DATABASE `{args.database}`")
+    server.close()
+    setup = connect(args)
+    Migrator(setup).up()
+    setup.close()
+
+    resources = {f"sensor:{n}": None for n in range(1, args.sensors + 1)}
+    resources.update({f"relay:{n}": None for n in range(1, args.relays + 1)})
+    resources['sensor:0'] = 'node-0'  # statically pinned
+    nodes = {
+        f"node-{n}": NodeOwnership(f"node-{n}", lambda: connect(args), args.lease_seconds)
+        for n in range(args.nodes)
+    }
+    running = {node_id: threading.Event() for node_id in nodes}
+    for event in running.values():
+        event.set()
+    stop = threading.Event()
+
+    def heartbeat(ownership: NodeOwnership):
+        while not stop.is_set():
+            if running[ownership.node_id].is_set():
+                ownership.update(resources)
+            stop.wait(args.lease_seconds / 3)
+
+    threads = [threading.Thread(target=heartbeat, args=(ownership,), daemon=True) for ownership in nodes.values()]
+    for thread in threads:
+        thread.start()
+
+    ok = True
+
+    def check(title: str, live: List[str]) -> None:
+        nonlocal ok
+        owners: Dict[str, List[str]] = {resource: [] for resource in resources}
+        for node_id in live:
+            for resource in nodes[node_id].owned:
+                owners[resource].append(node_id)
+        doubled = {resource: holders for resource, holders in owners.items() if len(holders) > 1}
+        orphaned = [resource for resource, holders in owners.items() if not holders and resources[resource] in live + [None]]
+        shares = {node_id: len(nodes[node_id].owned) for node_id in live}
+        passed = not doubled and not orphaned
+        ok = ok and passed
+        print(f"[{'ok' if passed else 'FAIL'}] {title}: shares {shares}"
+              + (f", doubled {doubled}" if doubled else '') + (f", orphaned {orphaned}" if orphaned else ''))
+
+    settle = args.lease_seconds * 1.5
+    time.sleep(settle)
+    check("all nodes up", list(nodes))
+
+    victim = 'node-1'
+    running[victim].clear()
+    nodes[victim].owned = set()
+    time.sleep(args.lease_seconds + settle)
+    check(f"{victim} stopped heartbeating", [node_id for node_id in nodes if node_id != victim])
+
+    running[victim].set()
+    time.sleep(settle * 2)
+    check(f"{victim} rejoined", list(nodes))
+
+    stop.set()
+    for thread in threads:
+        thread.join()
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Simulate several nodes sharing sensors through DB leases.")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--user', default='root')
+    parser.add_argument('--password', default='')
+    parser.add_argument('--database', default='hydroponics_nodes_sim')
+    commands = parser.add_subparsers(dest='command', required=True)
+    sim = commands.add_parser('simulate', help="run simulated nodes on a scratch database and check failover")
+    sim.add_argument('--nodes', type=int, default=3)
+    sim.add_argument('--sensors', type=int, default=11)
+    sim.add_argument('--relays', type=int, default=4)
+    sim.add_argument('--lease-seconds', type=float, default=3.0)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.WARNING, format="%(asctime)s | %(levelname)s | %(message)s")
+
+    if args.database == default_db.database:
+        parser.error("simulate drops and recreates --database, use a scratch database")
+    raise SystemExit(0 if simulate(args) else 1)
+
+
+if __name__ == "__main__":
+    main()
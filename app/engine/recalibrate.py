@@ -0,0 +1,278 @@
+import argparse
+import json
+import logging
+import time
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+
+from . import db as default_db
+from .migrate import connect
+
+logger = logging.getLogger(__name__)
+
+
+class Conversion(NamedTuple):
+    convert: Callable[..., np.ndarray]
+    defaults: Dict[str, float]
+    unit: str
+
+
+# raw_value -> reading, vectorized over whole arrays. The defaults reproduce the drivers'
+# conversions, override any of them with --set name=value.
+CONVERSIONS = {
+    # MCP3008 count -> voltage -> pH, SensorReader.read_ph
+    'ph': Conversion(
+        lambda raw, adc_max, vref, neutral_voltage, volts_per_ph: (raw * (vref / adc_max) - neutral_voltage) / volts_per_ph,
+        {'adc_max': 1023.0, 'vref': 3.3, 'neutral_voltage': 2.5, 'volts_per_ph': 0.18}, 'pH',
+    ),
+    # BH1750 16-bit word -> lux, LightSensor.convert_to_number; a different measurement time
+    # register (MTreg, 69 by default) scales the result by 69 / mtreg
+    'bh1750': Conversion(
+        lambda raw, divisor, mtreg: raw * (69.0 / (divisor * mtreg)),
+        {'divisor': 1.2, 'mtreg': 69.0}, 'lx',
+    ),
+    # DS18B20 t= millidegrees -> °C with a two-point correction, TemperatureSensor.read_temp
+    'ds18b20': Conversion(
+        lambda raw, gain, offset: raw * (gain / 1000.0) + offset,
+        {'gain': 1.0, 'offset': 0.0}, '°C',
+    ),
+}
+
+# Sensor config 'map' -> conversion of its raw values
+MAP_CONVERSIONS = {
+    'ph': 'ph',
+    'light': 'bh1750',
+    'tank1': 'ds18b20',
+    'tank2': 'ds18b20',
+}
+
+SELECT_RAW = """
+    SELECT id, reading_time, value, raw_value
+    FROM sensor_data
+    WHERE sensor_id = %s AND reading_time >= %s AND reading_time < %s AND raw_value IS NOT NULL
+"""
+
+CREATE_STAGING = """
+    CREATE TEMPORARY TABLE IF NOT EXISTS recalibrated (
+        id INT NOT NULL,
+        reading_time DATETIME NOT NULL,
+        value DOUBLE NOT NULL,
+        PRIMARY KEY (id, reading_time)
+    ) ENGINE=MEMORY
+"""
+
+INSERT_STAGING = "INSERT INTO recalibrated (id, reading_time, value) VALUES (%s, %s, %s)"
+
+UPDATE_FROM_STAGING = """
+    UPDATE sensor_data d
+    INNER JOIN recalibrated r ON r.id = d.id AND r.reading_time = d.reading_time
+    SET d.value = r.value
+"""
+
+
+def convert(name: str, raw: np.ndarray, **params: float) -> np.ndarray:
+    """Converts an array of raw values with the named conversion, `params` overriding its defaults."""
+    conversion = CONVERSIONS[name]
+    unknown = set(params) - set(conversion.defaults)
+    if unknown:
+        raise ValueError(f"Unknown parameter(s) {sorted(unknown)} for {name}, expected {sorted(conversion.defaults)}")
+    return conversion.convert(np.asarray(raw, dtype=np.float64), **{**conversion.defaults, **params})
+
+
+class Recalibration:
+    def __init__(self, connection, conversion: str, params: Dict[str, float], chunk_hours: int = 24,
+                 write_batch: int = 5000, tolerance: float = 1e-4, apply: bool = False):
+        """
+        Recomputes sensor_data.value from raw_value over a time range, one `chunk_hours` window at
+        a time. Rows are fetched once, converted in a single NumPy expression per window, and only
+        those whose value changes by more than `tolerance` are written back: staged into a
+        temporary table with multi-row inserts and applied with one UPDATE ... JOIN per window.
+
+        The raw value is the driver's reading before any conditioning filter, so recalibrated
+        values of filtered sensors are unfiltered.
+
+        :param connection: mysql.connector connection with autocommit enabled.
+        :param conversion: Key of CONVERSIONS.
+        :param params: Calibration parameters overriding the conversion's defaults.
+        :param apply: Write the new values; otherwise only report what would change.
+        """
+        self.connection = connection
+        self.conversion = conversion
+        self.params = params
+        self.chunk = timedelta(hours=chunk_hours)
+        self.write_batch = write_batch
+        self.tolerance = tolerance
+        self.apply = apply
+        convert(conversion, np.zeros(1), **params)
+
+    def run(self, sensor_id: int, start: datetime, end: datetime) -> Dict[str, float]:
+        stats = {'rows': 0, 'changed': 0, 'max_change': 0.0, 'sum_change': 0.0,
+                 'fetch_seconds': 0.0, 'convert_seconds': 0.0, 'write_seconds': 0.0}
+        if self.apply:
+            with self.connection.cursor() as cursor:
+                cursor.execute(CREATE_STAGING)
+        position = start
+        while position < end:
+            window_end = min(position + self.chunk, end)
+            self._window(sensor_id, position, window_end, stats)
+            position = window_end
+
+        rows, changed = stats['rows'], stats['changed']
+        return {
+            'sensor_id': sensor_id,
+            'conversion': self.conversion,
+            'rows': rows,
+            'changed': changed,
+            'written': changed if self.apply else 0,
+            'mean_change': round(stats['sum_change'] / changed, 6) if changed else 0.0,
+            'max_change': round(stats['max_change'], 6),
+            'convert_rows_per_second': round(rows / stats['convert_seconds']) if stats['convert_seconds'] else None,
+            'fetch_seconds': round(stats['fetch_seconds'], 3),
+            'convert_seconds': round(stats['convert_seconds'], 3),
+            'write_seconds': round(stats['write_seconds'], 3),
+        }
+
+    def _window(self, sensor_id: int, start: datetime, end: datetime, stats: Dict[str, float]) -> None:
+        fetch_start = time.perf_counter()
+        with self.connection.cursor() as cursor:
+            cursor.execute(SELECT_RAW, (sensor_id, start, end))
+            rows = cursor.fetchall()
+        stats['fetch_seconds'] += time.perf_counter() - fetch_start
+        if not rows:
+            return
+
+        convert_start = time.perf_counter()
+        ids, times, values, raw = zip(*rows)
+        values = np.fromiter(values, dtype=np.float64, count=len(rows))
+        new_values = convert(self.conversion, np.fromiter(raw, dtype=np.float64, count=len(rows)), **self.params)
+        change = np.abs(new_values - values)
+        changed = np.flatnonzero(change > self.tolerance)
+        stats['convert_seconds'] += time.perf_counter() - convert_start
+
+        stats['rows'] += len(rows)
+        stats['changed'] += len(changed)
+        if len(changed):
+            stats['max_change'] = max(stats['max_change'], float(change[changed].max()))
+            stats['sum_change'] += float(change[changed].sum())
+        if not self.apply or not len(changed):
+            return
+
+        write_start = time.perf_counter()
+        new_list = new_values[changed].tolist()
+        staged = [(ids[index], times[index], new_list[position]) for position, index in enumerate(changed.tolist())]
+        with self.connection.cursor() as cursor:
+            cursor.execute("DELETE FROM recalibrated")
+            for offset in range(0, len(staged), self.write_batch):
+                cursor.executemany(INSERT_STAGING, staged[offset:offset + self.write_batch])
+            cursor.execute(UPDATE_FROM_STAGING)
+        stats['write_seconds'] += time.perf_counter() - write_start
+        logger.info(f"Sensor {sensor_id} {start} - {end}: {len(changed)} of {len(rows)} values rewritten.")
+
+
+def _sensor_conversion(connection, sensor_id: int) -> Optional[str]:
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT config FROM sensors WHERE id = %s", (sensor_id,))
+        row = cursor.fetchone()
+    if not row:
+        return None
+    try:
+        return MAP_CONVERSIONS.get(json.loads(row[0]).get('map'))
+    except (TypeError, ValueError):
+        return None
+
+
+def _rolled_up_until(connection) -> Optional[datetime]:
+    with connection.cursor() as cursor:
+        cursor.execute("SHOW TABLES LIKE 'retention_watermarks'")
+        if not cursor.fetchall():
+            return None
+        cursor.execute("SELECT position FROM retention_watermarks WHERE name = 'hourly'")
+        row = cursor.fetchone()
+    return row[0] if row else None
+
+
+def _parse_params(items: List[str]) -> Dict[str, float]:
+    params = {}
+    for item in items:
+        name, _, value = item.partition('=')
+        if not value:
+            raise argparse.ArgumentTypeError(f"Expected name=value, got '{item}'")
+        params[name.strip()] = float(value)
+    return params
+
+
+def benchmark(rows: int) -> List[Tuple[str, float]]:
+    """Rows per second of each conversion over `rows` random raw values, without the database."""
+    rng = np.random.default_rng(0)
+    raw = rng.integers(0, 1024, rows).astype(np.float64)
+    results = []
+    for name in CONVERSIONS:
+        convert(name, raw[:1000])
+        start = time.perf_counter()
+        convert(name, raw)
+        results.append((name, rows / (time.perf_counter() - start)))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Reconvert stored readings from their raw values with new calibration parameters.")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    run_parser = commands.add_parser('run', help="recalibrate sensors over a time range (dry run unless --apply)")
+    run_parser.add_argument('--host', default=default_db.host)
+    run_parser.add_argument('--user', default=default_db.user)
+    run_parser.add_argument('--password', default=default_db.password)
+    run_parser.add_argument('--database', default=default_db.database)
+    run_parser.add_argument('--sensor', type=int, action='append', required=True, help="sensor ID, repeatable")
+    run_parser.add_argument('--start', type=datetime.fromisoformat, required=True)
+    run_parser.add_argument('--end', type=datetime.fromisoformat, default=None, help="default: now")
+    run_parser.add_argument('--conversion', choices=sorted(CONVERSIONS), help="default: from the sensor's map")
+    run_parser.add_argument('--set', action='append', default=[], metavar='NAME=VALUE', help="calibration parameter, repeatable")
+    run_parser.add_argument('--chunk-hours', type=int, default=24)
+    run_parser.add_argument('--tolerance', type=float, default=1e-4, help="smallest change that is written back")
+    run_parser.add_argument('--apply', action='store_true', help="write the new values")
+
+    commands.add_parser('conversions', help="list conversions and their default parameters")
+    bench_parser = commands.add_parser('bench', help="measure conversion throughput without the database")
+    bench_parser.add_argument('--rows', type=int, default=10_000_000)
+
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s | %(levelname)s | %(message)s")
+
+    if args.command == 'conversions':
+        for name, conversion in CONVERSIONS.items():
+            defaults = ', '.join(f"{key}={value:g}" for key, value in conversion.defaults.items())
+            maps = ', '.join(key for key, value in MAP_CONVERSIONS.items() if value == name)
+            print(f"{name:<9} -> {conversion.unit:<3} maps: {maps:<12} defaults: {defaults}")
+        return
+    if args.command == 'bench':
+        for name, rate in benchmark(args.rows):
+            print(f"{name:<9} {rate / 1e6:8.1f} M rows/s")
+        return
+
+    params = _parse_params(args.set)
+    end = args.end or datetime.now()
+    connection = connect(args)
+    try:
+        rolled = _rolled_up_until(connection)
+        if rolled and args.start < rolled:
+            logger.warning(f"Readings before {rolled} are already rolled up and their raw rows expired; "
+                           f"hourly and daily aggregates are not recomputed.")
+        for sensor_id in args.sensor:
+            conversion = args.conversion or _sensor_conversion(connection, sensor_id)
+            if conversion is None:
+                logger.error(f"Sensor {sensor_id} has no raw conversion, pass --conversion.")
+                continue
+            stats = Recalibration(connection, conversion, params, args.chunk_hours, tolerance=args.tolerance,
+                                  apply=args.apply).run(sensor_id, args.start, end)
+            print(stats)
+        if not args.apply:
+            print("Dry run, nothing written. Add --apply to write the new values.")
+    finally:
+        connection.close()
+
+
+if __name__ == "__main__":
+    main()
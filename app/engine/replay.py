@@ -0,0 +1,225 @@
+import csv
+import gzip
+import json
+import logging
+import re
+import statistics
+import time
+from datetime import datetime
+from typing import Callable, Dict, List, NamedTuple, Optional
+
+from .bus import Reading, ReadingBus
+from .conditioning import ConditioningChain
+
+logger = logging.getLogger(__name__)
+
+LOG_LINE = re.compile(
+    r'^(?P<time>\d{4}-\d\d-\d\d \d\d:\d\d:\d\d)\S*\s+\|.*?Data Inserted \| Sensor ID: (?P<sensor_id>\d+) \| Value: (?P<value>[-\d.]+)'
+)
+
+
+class RecordedReading(NamedTuple):
+    timestamp: float
+    sensor_id: int
+    value: float
+
+
+def _parse_time(text: str) -> float:
+    return datetime.fromisoformat(text.strip()).timestamp()
+
+
+def _open(path: str):
+    return gzip.open(path, 'rt') if path.endswith('.gz') else open(path)
+
+
+def load_readings(path: str) -> List[RecordedReading]:
+    """
+    Loads recorded readings, sorted by time, from any of:
+        a sensor_data export (phpMyAdmin JSON, or CSV with sensor_id, value, reading_time columns)
+        the offline queue (sensor_data_queue.json)
+        the application log ("Data Inserted" lines, timed by the log timestamp; they are
+        logged at DEBUG, see LOG_LEVELS)
+    """
+    readings = []
+    with _open(path) as file:
+        if '.log' in path:
+            for line in file:
+                match = LOG_LINE.match(line)
+                if match:
+                    readings.append(RecordedReading(_parse_time(match['time']), int(match['sensor_id']), float(match['value'])))
+        elif '.csv' in path:
+            for row in csv.DictReader(file):
+                readings.append(RecordedReading(_parse_time(row['reading_time']), int(row['sensor_id']), float(row['value'])))
+        else:
+            rows = json.load(file)
+            if rows and 'type' in rows[0]:
+                # phpMyAdmin export: header, database and table entries
+                rows = [row for entry in rows if entry.get('type') == 'table' and entry.get('name') == 'sensor_data'
+                        for row in entry['data']]
+            for row in rows:
+                readings.append(RecordedReading(_parse_time(row['reading_time']), int(row['sensor_id']), float(row['value'])))
+    readings.sort()
+    return readings
+
+
+def load_sensor_configs(path: str) -> Dict[int, Dict]:
+    """Maps sensor IDs to their parsed config from a phpMyAdmin export of the sensors table."""
+    with open(path) as file:
+        entries = json.load(file)
+    configs = {}
+    for entry in entries:
+        if entry.get('type') == 'table' and entry.get('name') == 'sensors':
+            for row in entry['data']:
+                try:
+                    configs[int(row['id'])] = json.loads(row['config'])
+                except (KeyError, TypeError, ValueError):
+                    continue
+    return configs
+
+
+class VirtualClock:
+    def __init__(self, start: float, speed: float):
+        """
+        Recorded time running `speed` times faster than real time from `start`.
+        A speed of 0 runs as fast as possible.
+        """
+        self.start = start
+        self.speed = speed
+        self.real_start = time.monotonic()
+
+    def now(self) -> float:
+        if self.speed <= 0:
+            return float('inf')
+        return self.start + (time.monotonic() - self.real_start) * self.speed
+
+    def sleep_until(self, timestamp: float) -> None:
+        if self.speed <= 0:
+            return
+        delay = (timestamp - self.now()) / self.speed
+        if delay > 0:
+            time.sleep(delay)
+
+
+class NullDatabase:
+    """Stands in for MySQLWrapper during a replay, counting what would have been written."""
+
+    def __init__(self):
+        self.rows = 0
+        self.statements = 0
+
+    def execute_query(self, query, params=None):
+        self.statements += 1
+        self.rows += 1
+
+    def execute_many(self, query, seq_params):
+        self.statements += 1
+        self.rows += len(seq_params)
+
+    def fetch_all(self, query, params=None, dictionary=False):
+        return []
+
+    def close(self):
+        pass
+
+
+class LagProbe:
+    def __init__(self, bus: ReadingBus):
+        """
+        Measures the time from publishing a reading to each subscriber having handled it,
+        by wrapping the subscribers' handlers.
+        """
+        self.published: Dict[int, float] = {}
+        self.lags: Dict[str, List[float]] = {}
+        for subscriber in bus.subscribers:
+            self.lags[subscriber.name] = []
+            subscriber.handler = self._wrap(subscriber.name, subscriber.handler)
+
+    def _wrap(self, name: str, handler: Callable[[List[Reading]], None]) -> Callable[[List[Reading]], None]:
+        lags = self.lags[name]
+
+        def timed(readings: List[Reading]) -> None:
+            handler(readings)
+            done = time.monotonic()
+            lags.extend(done - self.published[id(reading)] for reading in readings)
+        return timed
+
+    def mark(self, reading: Reading) -> None:
+        self.published[id(reading)] = time.monotonic()
+
+
+def replay(readings: List[RecordedReading], bus: ReadingBus, speed: float = 1.0,
+           sensor_configs: Optional[Dict[int, Dict]] = None) -> Dict:
+    """
+    Publishes recorded readings on a started bus at their recorded times on a virtual clock,
+    drains the bus and returns throughput and per-subscriber lag figures.
+
+    :param speed: Times real speed, 0 for as fast as possible.
+    :param sensor_configs: Sensor ID -> config, naming the sensor type and conditioning the
+                           readings with the sensor's filters before they are published, as
+                           the cycle worker does.
+    """
+    sensor_configs = sensor_configs or {}
+    chains = {sensor_id: ConditioningChain.from_config(sensor_config) for sensor_id, sensor_config in sensor_configs.items()}
+    probe = LagProbe(bus)
+    # Keep the published readings alive so their id() stays unique until they are handled
+    published = []
+    behind = []
+    clock = VirtualClock(readings[0].timestamp if readings else 0.0, speed)
+    real_start = time.monotonic()
+    for recorded in readings:
+        clock.sleep_until(recorded.timestamp)
+        if speed > 0:
+            behind.append(max(0.0, clock.now() - recorded.timestamp))
+        chain = chains.get(recorded.sensor_id)
+        value = chain.update(recorded.value, recorded.timestamp) if chain else recorded.value
+        sensor_type = sensor_configs.get(recorded.sensor_id, {}).get('map', 'replay')
+        reading = Reading(recorded.sensor_id, sensor_type, value, recorded.timestamp)
+        probe.mark(reading)
+        published.append(reading)
+        bus.publish(reading)
+    publish_seconds = time.monotonic() - real_start
+    bus.stop(timeout=600)
+    total_seconds = time.monotonic() - real_start
+
+    span = readings[-1].timestamp - readings[0].timestamp if readings else 0.0
+    result = {
+        'readings': len(readings),
+        'sensors': len({reading.sensor_id for reading in readings}),
+        'recorded_seconds': span,
+        'publish_seconds': publish_seconds,
+        'total_seconds': total_seconds,
+        'achieved_speed': span / publish_seconds if publish_seconds > 0 else None,
+        'throughput': len(readings) / total_seconds if total_seconds > 0 else None,
+        'schedule_lag_max': max(behind) if behind else 0.0,
+        'subscribers': {},
+    }
+    for subscriber in bus.subscribers:
+        lags = sorted(probe.lags[subscriber.name])
+        result['subscribers'][subscriber.name] = {
+            'handled': len(lags),
+            'dropped': subscriber.dropped,
+            'lag_p50': statistics.median(lags) if lags else None,
+            'lag_p95': lags[max(0, int(len(lags) * 0.95) - 1)] if lags else None,
+            'lag_max': lags[-1] if lags else None,
+        }
+    return result
+
+
+def format_report(result: Dict) -> str:
+    lines = [
+        f"Replayed {result['readings']} readings from {result['sensors']} sensors "
+        f"({result['recorded_seconds'] / 3600:.1f}h recorded) in {result['total_seconds']:.1f}s",
+    ]
+    if result['achieved_speed']:
+        lines.append(f"Achieved speed {result['achieved_speed']:.0f}x, throughput {result['throughput']:.0f} readings/s, "
+                     f"publisher at most {result['schedule_lag_max']:.1f}s (virtual) behind schedule")
+    lines.append(f"{'subscriber':<12}{'handled':>10}{'dropped':>10}{'lag p50':>12}{'lag p95':>12}{'lag max':>12}")
+    for name, stats in result['subscribers'].items():
+        if stats['handled']:
+            lines.append(
+                f"{name:<12}{stats['handled']:>10}{stats['dropped']:>10}"
+                f"{stats['lag_p50'] * 1000:>10.1f}ms{stats['lag_p95'] * 1000:>10.1f}ms{stats['lag_max'] * 1000:>10.1f}ms"
+            )
+        elif stats['dropped']:
+            lines.append(f"{name:<12}{0:>10}{stats['dropped']:>10}")
+    return '\n'.join(lines)
@@ -0,0 +1,90 @@
+import time
+from typing import Any, Dict, Optional
+
+
+class ReportPolicy:
+    def __init__(self, deadband: float = 0.0, deadband_pct: float = 0.0,
+                 heartbeat_seconds: float = 0.0, step: Optional[float] = None):
+        """
+        Decides which readings are worth writing to the database.
+
+        A reading is reported when it moves further than the deadband from the last
+        reported value, when the heartbeat interval has passed without a report, or
+        when it jumps by at least `step` (forced report). With no deadband configured
+        every reading is reported.
+
+        :param deadband: Absolute change required to report.
+        :param deadband_pct: Change relative to the last reported value, in percent.
+        :param heartbeat_seconds: Maximum silent interval before a report is forced.
+        :param step: Change that always forces a report.
+        """
+        self.deadband = deadband
+        self.deadband_pct = deadband_pct
+        self.heartbeat_seconds = heartbeat_seconds
+        self.step = step
+        self.last_value: Optional[float] = None
+        self.last_time: Optional[float] = None
+
+        self.emitted = 0
+        self.suppressed = 0
+        self.forced = 0
+        self.heartbeats = 0
+
+    @classmethod
+    def from_config(cls, config: Optional[Dict[str, Any]]) -> "ReportPolicy":
+        """
+        Builds a policy from the "report" section of a sensor config, e.g.
+        {"map": "ph", "report": {"deadband": 0.05, "heartbeat_seconds": 900, "step": 0.5}}
+        """
+        report = (config or {}).get('report') or {}
+        step = report.get('step')
+        return cls(
+            deadband=float(report.get('deadband', 0.0)),
+            deadband_pct=float(report.get('deadband_pct', 0.0)),
+            heartbeat_seconds=float(report.get('heartbeat_seconds', 0.0)),
+            step=float(step) if step is not None else None,
+        )
+
+    @property
+    def enabled(self) -> bool:
+        return self.deadband > 0 or self.deadband_pct > 0
+
+    def should_report(self, value: float, now: Optional[float] = None) -> bool:
+        """
+        Checks a reading against the policy and updates the counters.
+        :return: True if the reading should be written.
+        """
+        now = time.monotonic() if now is None else now
+
+        if not self.enabled or self.last_value is None:
+            return self._emit(value, now)
+
+        delta = abs(value - self.last_value)
+        if self.step is not None and delta >= self.step:
+            self.forced += 1
+            return self._emit(value, now)
+        if self.heartbeat_seconds and now - self.last_time >= self.heartbeat_seconds:
+            self.heartbeats += 1
+            return self._emit(value, now)
+
+        threshold = max(self.deadband, abs(self.last_value) * self.deadband_pct / 100.0)
+        if delta > threshold:
+            return self._emit(value, now)
+
+        self.suppressed += 1
+        return False
+
+    def stats(self) -> Dict[str, int]:
+        """Returns the emitted/suppressed counters."""
+        return {
+            'emitted': self.emitted,
+            'suppressed': self.suppressed,
+            'forced': self.forced,
+            'heartbeats': self.heartbeats,
+        }
+
+    def _emit(self, value: float, now: float) -> bool:
+        self.last_value = value
+        self.last_time = now
+        self.emitted += 1
+        return True
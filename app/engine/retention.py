@@ -0,0 +1,292 @@
+import argparse
+import logging
+import re
+import time
+from datetime import date, datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+from . import db as default_db
+from .migrate import connect, ensure_partitions
+
+logger = logging.getLogger(__name__)
+
+LOCK_NAME = 'hydroponics_retention'
+PARTITION_NAME = re.compile(r'^p\d{6}$')
+
+ROLLUP_HOURLY = """
+    INSERT INTO sensor_data_hourly (sensor_id, bucket, min_value, max_value, avg_value, sample_count)
+    SELECT sensor_id, DATE(reading_time) + INTERVAL HOUR(reading_time) HOUR, MIN(value), MAX(value), AVG(value), COUNT(*)
+    FROM sensor_data
+    WHERE reading_time >= %s AND reading_time < %s
+    GROUP BY sensor_id, DATE(reading_time) + INTERVAL HOUR(reading_time) HOUR
+    ON DUPLICATE KEY UPDATE
+        min_value = VALUES(min_value), max_value = VALUES(max_value),
+        avg_value = VALUES(avg_value), sample_count = VALUES(sample_count)
+"""
+
+ROLLUP_DAILY = """
+    INSERT INTO sensor_data_daily (sensor_id, bucket, min_value, max_value, avg_value, sample_count)
+    SELECT sensor_id, DATE(bucket), MIN(min_value), MAX(max_value),
+           SUM(avg_value * sample_count) / SUM(sample_count), SUM(sample_count)
+    FROM sensor_data_hourly
+    WHERE bucket >= %s AND bucket < %s
+    GROUP BY sensor_id, DATE(bucket)
+    ON DUPLICATE KEY UPDATE
+        min_value = VALUES(min_value), max_value = VALUES(max_value),
+        avg_value = VALUES(avg_value), sample_count = VALUES(sample_count)
+"""
+
+
+def _floor_hour(moment: datetime) -> datetime:
+    return moment.replace(minute=0, second=0, microsecond=0)
+
+
+def _floor_day(moment: datetime) -> datetime:
+    return moment.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+class RetentionJob:
+    def __init__(self, connection, raw_days: int = 30, hourly_days: int = 365, chunk_hours: int = 6,
+                 delete_batch: int = 5000, max_seconds: float = 300, drop_partitions: bool = True):
+        """
+        Rolls raw sensor_data into sensor_data_hourly, hourly rows into sensor_data_daily, and
+        removes what has been rolled up once it is past retention.
+
+        Progress is kept in retention_watermarks, one row per step:
+            hourly          raw rows before this are aggregated and verified
+            raw_deleted     raw rows before this are deleted
+            daily           hourly rows before this are aggregated
+            hourly_deleted  hourly rows before this are deleted
+        Aggregation is an upsert recomputed from the source, so repeating a chunk after a crash
+        is harmless, and deletes never pass the aggregation watermark.
+
+        Work is done in `chunk_hours` ranges and `delete_batch` row deletes so no statement
+        holds locks for long, and a run stops after `max_seconds` to resume on the next one.
+
+        The session reads at READ COMMITTED, so the rollups' INSERT ... SELECT take no gap locks
+        on sensor_data. The server refuses that with binlog_format=STATEMENT: on a server
+        writing a statement-based binary log the job keeps REPEATABLE READ, and the rollup
+        ranges can then briefly block inserts into the chunk being aggregated.
+
+        The job never changes the schema: it does nothing until `python -m app.engine.migrate up`
+        has created its tables.
+
+        :param connection: mysql.connector connection with autocommit enabled.
+        :param raw_days: Raw readings are kept this many days.
+        :param hourly_days: Hourly aggregates are kept this many days, daily ones forever.
+        :param drop_partitions: Drop whole monthly partitions of sensor_data instead of deleting their rows.
+        """
+        self.connection = connection
+        self.raw_days = raw_days
+        self.hourly_days = hourly_days
+        self.chunk = timedelta(hours=chunk_hours)
+        self.delete_batch = delete_batch
+        self.max_seconds = max_seconds
+        self.drop_partitions = drop_partitions
+        self._deadline = 0.0
+
+    def run(self, now: Optional[datetime] = None) -> Dict[str, int]:
+        """
+        Runs every step until it is done or out of time.
+        :return: Counts of what was done, or an empty dict if another runner holds the lock.
+        """
+        now = now or datetime.now()
+        self._deadline = time.monotonic() + self.max_seconds
+        stats = {'hours_rolled': 0, 'days_rolled': 0, 'raw_deleted': 0, 'partitions_dropped': 0, 'hourly_deleted': 0}
+        with self.connection.cursor() as cursor:
+            for table in ('schema_migrations', 'retention_watermarks'):
+                cursor.execute("SHOW TABLES LIKE %s", (table,))
+                if not cursor.fetchall():
+                    logger.warning(f"Table {table} is missing, run `python -m app.engine.migrate up`.")
+                    return {}
+            cursor.execute("SELECT @@log_bin, @@binlog_format")
+            log_bin, binlog_format = cursor.fetchone()
+            if log_bin and str(binlog_format).upper() == 'STATEMENT':
+                logger.warning("Statement-based binary log, rolling up at REPEATABLE READ.")
+            else:
+                # Range reads without gap locks, so the sensor processes' inserts are never blocked
+                cursor.execute("SET SESSION TRANSACTION ISOLATION LEVEL READ COMMITTED")
+            cursor.execute("SELECT GET_LOCK(%s, 0)", (LOCK_NAME,))
+            if not cursor.fetchone()[0]:
+                logger.info("Another retention run holds the lock, skipping.")
+                return {}
+        try:
+            raw_cutoff = _floor_hour(now - timedelta(days=self.raw_days))
+            hourly_cutoff = _floor_day(now - timedelta(days=self.hourly_days))
+            stats['hours_rolled'] = self._rollup_hourly(raw_cutoff)
+            rolled = self._watermark('hourly')
+            if rolled:
+                stats['days_rolled'] = self._rollup_daily(_floor_day(rolled))
+                if self.drop_partitions:
+                    stats['partitions_dropped'] = self._drop_partitions(rolled)
+                stats['raw_deleted'] = self._delete_raw(rolled)
+            daily = self._watermark('daily')
+            if daily:
+                stats['hourly_deleted'] = self._delete_hourly(min(daily, hourly_cutoff))
+            ensure_partitions(self.connection)
+        finally:
+            with self.connection.cursor() as cursor:
+                cursor.execute("SELECT RELEASE_LOCK(%s)", (LOCK_NAME,))
+                cursor.fetchall()
+        logger.info(f"Retention run: {stats}")
+        return stats
+
+    def _out_of_time(self) -> bool:
+        return time.monotonic() > self._deadline
+
+    def _watermark(self, name: str) -> Optional[datetime]:
+        with self.connection.cursor() as cursor:
+            cursor.execute("SELECT position FROM retention_watermarks WHERE name = %s", (name,))
+            row = cursor.fetchone()
+        return row[0] if row else None
+
+    def _set_watermark(self, name: str, position: datetime) -> None:
+        with self.connection.cursor() as cursor:
+            cursor.execute(
+                "INSERT INTO retention_watermarks (name, position) VALUES (%s, %s) "
+                "ON DUPLICATE KEY UPDATE position = VALUES(position)",
+                (name, position),
+            )
+
+    def _start(self, name: str, query: str) -> Optional[datetime]:
+        """Current watermark, initialized from the oldest source row on the first run."""
+        position = self._watermark(name)
+        if position is None:
+            with self.connection.cursor() as cursor:
+                cursor.execute(query)
+                oldest = cursor.fetchone()[0]
+            if oldest is None:
+                return None
+            position = _floor_hour(oldest) if isinstance(oldest, datetime) else datetime.combine(oldest, datetime.min.time())
+            self._set_watermark(name, position)
+        return position
+
+    def _rollup_hourly(self, until: datetime) -> int:
+        position = self._start('hourly', "SELECT MIN(reading_time) FROM sensor_data")
+        hours = 0
+        while position is not None and position < until and not self._out_of_time():
+            end = min(position + self.chunk, until)
+            with self.connection.cursor() as cursor:
+                cursor.execute(ROLLUP_HOURLY, (position, end))
+                # Aggregates must account for every raw row before anything is deleted
+                cursor.execute("SELECT COUNT(*) FROM sensor_data WHERE reading_time >= %s AND reading_time < %s", (position, end))
+                raw = cursor.fetchone()[0]
+                cursor.execute("SELECT COALESCE(SUM(sample_count), 0) FROM sensor_data_hourly WHERE bucket >= %s AND bucket < %s", (position, end))
+                rolled = int(cursor.fetchone()[0])
+            if raw != rolled:
+                # A late reading landed in the chunk between the two statements, try it again next run
+                logger.warning(f"Hourly rollup of {position} - {end} saw {raw} raw rows but aggregated {rolled}, retrying later.")
+                break
+            self._set_watermark('hourly', end)
+            hours += int((end - position).total_seconds() // 3600)
+            position = end
+        return hours
+
+    def _rollup_daily(self, until: datetime) -> int:
+        position = self._start('daily', "SELECT MIN(bucket) FROM sensor_data_hourly")
+        days = 0
+        if position is not None:
+            position = _floor_day(position)
+        while position is not None and position < until and not self._out_of_time():
+            end = min(position + timedelta(days=1), until)
+            with self.connection.cursor() as cursor:
+                cursor.execute(ROLLUP_DAILY, (position, end))
+            self._set_watermark('daily', end)
+            days += 1
+            position = end
+        return days
+
+    def _sensor_ids(self, start: datetime, end: datetime) -> List[int]:
+        with self.connection.cursor() as cursor:
+            cursor.execute("SELECT DISTINCT sensor_id FROM sensor_data_hourly WHERE bucket >= %s AND bucket < %s", (start, end))
+            return [row[0] for row in cursor.fetchall()]
+
+    def _delete_raw(self, until: datetime) -> int:
+        """Deletes rolled-up raw rows per sensor in small batches, using the (sensor_id, reading_time) index."""
+        position = self._start('raw_deleted', "SELECT MIN(reading_time) FROM sensor_data")
+        deleted = 0
+        while position is not None and position < until and not self._out_of_time():
+            end = min(position + self.chunk, until)
+            for sensor_id in self._sensor_ids(position, end):
+                deleted += self._delete_batches(
+                    "DELETE FROM sensor_data WHERE sensor_id = %s AND reading_time >= %s AND reading_time < %s LIMIT %s",
+                    (sensor_id, position, end, self.delete_batch),
+                )
+                if self._out_of_time():
+                    return deleted
+            self._set_watermark('raw_deleted', end)
+            position = end
+        return deleted
+
+    def _delete_hourly(self, until: datetime) -> int:
+        position = self._start('hourly_deleted', "SELECT MIN(bucket) FROM sensor_data_hourly")
+        if position is None or position >= until:
+            return 0
+        deleted = self._delete_batches(
+            "DELETE FROM sensor_data_hourly WHERE bucket >= %s AND bucket < %s LIMIT %s",
+            (position, until, self.delete_batch),
+        )
+        if not self._out_of_time():
+            self._set_watermark('hourly_deleted', until)
+        return deleted
+
+    def _delete_batches(self, query: str, params: Tuple) -> int:
+        deleted = 0
+        while True:
+            with self.connection.cursor() as cursor:
+                cursor.execute(query, params)
+                count = cursor.rowcount
+            deleted += count
+            if count < self.delete_batch or self._out_of_time():
+                return deleted
+
+    def _drop_partitions(self, until: datetime) -> int:
+        """Drops monthly partitions of sensor_data that lie entirely before `until`."""
+        with self.connection.cursor() as cursor:
+            cursor.execute(
+                """
+                SELECT PARTITION_NAME, PARTITION_DESCRIPTION FROM information_schema.PARTITIONS
+                WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'sensor_data' AND PARTITION_NAME IS NOT NULL
+                """
+            )
+            partitions = cursor.fetchall()
+        dropped = 0
+        for name, description in partitions:
+            if not PARTITION_NAME.match(name) or description == 'MAXVALUE':
+                continue
+            upper = date.fromordinal(int(description) - 365)
+            if datetime.combine(upper, datetime.min.time()) <= until:
+                with self.connection.cursor() as cursor:
+                    cursor.execute(f"ALTER TABLE sensor_data DROP PARTITION {name}")
+                logger.info(f"Dropped sensor_data partition {name}.")
+                dropped += 1
+        return dropped
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Roll up and expire old sensor_data rows.")
+    parser.add_argument('--host', default=default_db.host)
+    parser.add_argument('--user', default=default_db.user)
+    parser.add_argument('--password', default=default_db.password)
+    parser.add_argument('--database', default=default_db.database)
+    parser.add_argument('--raw-days', type=int, default=30)
+    parser.add_argument('--hourly-days', type=int, default=365)
+    parser.add_argument('--chunk-hours', type=int, default=6)
+    parser.add_argument('--delete-batch', type=int, default=5000)
+    parser.add_argument('--max-seconds', type=float, default=300)
+    parser.add_argument('--no-drop-partitions', action='store_true', help="delete rows even where a whole partition could be dropped")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s | %(levelname)s | %(message)s")
+
+    connection = connect(args)
+    try:
+        RetentionJob(
+            connection, args.raw_days, args.hourly_days, args.chunk_hours,
+            args.delete_batch, args.max_seconds, not args.no_drop_partitions,
+        ).run()
+    finally:
+        connection.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,216 @@
+import math
+import threading
+import time
+from array import array
+from typing import Dict, List, Optional, Tuple
+
+# Rollup resolution (seconds) -> number of buckets kept
+RESOLUTIONS = {
+    60: 1440,     # 1 minute buckets, 24 hours
+    900: 672,     # 15 minute buckets, 7 days
+    3600: 720,    # 1 hour buckets, 30 days
+}
+
+RAW_CAPACITY = 3600
+
+
+class RollupWindow:
+    def __init__(self, resolution: int, buckets: int):
+        """
+        Streaming rollups at a fixed resolution, stored as a ring of parallel typed arrays.
+
+        :param resolution: Bucket width in seconds.
+        :param buckets: Number of buckets kept before the oldest is overwritten.
+        """
+        self.resolution = resolution
+        self.size = buckets
+        self.starts = array('d', [-1.0]) * buckets
+        self.counts = array('L', [0]) * buckets
+        self.mins = array('d', [0.0]) * buckets
+        self.maxs = array('d', [0.0]) * buckets
+        self.means = array('d', [0.0]) * buckets
+        self.m2s = array('d', [0.0]) * buckets
+        self.latest = -1.0
+
+    def add(self, timestamp: float, value: float) -> None:
+        """Fold a sample into its bucket using Welford's update (O(1))."""
+        start = timestamp - (timestamp % self.resolution)
+        slot = int(start // self.resolution) % self.size
+
+        if self.starts[slot] != start:
+            if self.starts[slot] > start:
+                return  # Sample older than the ring, nothing to update
+            self.starts[slot] = start
+            self.counts[slot] = 0
+            self.mins[slot] = value
+            self.maxs[slot] = value
+            self.means[slot] = 0.0
+            self.m2s[slot] = 0.0
+
+        count = self.counts[slot] + 1
+        delta = value - self.means[slot]
+        mean = self.means[slot] + delta / count
+        self.counts[slot] = count
+        self.means[slot] = mean
+        self.m2s[slot] += delta * (value - mean)
+        if value < self.mins[slot]:
+            self.mins[slot] = value
+        if value > self.maxs[slot]:
+            self.maxs[slot] = value
+        if start > self.latest:
+            self.latest = start
+
+    def buckets(self, limit: Optional[int] = None) -> List[Dict[str, float]]:
+        """
+        Returns the most recent buckets, oldest first.
+        :param limit: Maximum number of buckets to return (default: all in the ring).
+        """
+        if self.latest < 0:
+            return []
+        limit = min(limit or self.size, self.size)
+        oldest = self.latest - (limit - 1) * self.resolution
+        result = []
+        for i in range(limit):
+            start = oldest + i * self.resolution
+            slot = int(start // self.resolution) % self.size
+            if self.starts[slot] == start and self.counts[slot]:
+                result.append(self._bucket(slot))
+        return result
+
+    def summary(self, seconds: float, now: Optional[float] = None) -> Optional[Dict[str, float]]:
+        """
+        Combines the buckets covering the last `seconds` into a single set of stats.
+        :return: Combined stats or None if no samples fall in the window.
+        """
+        now = time.time() if now is None else now
+        span = min(int(math.ceil(seconds / self.resolution)), self.size)
+        newest = now - (now % self.resolution)
+        count, mean, m2 = 0, 0.0, 0.0
+        low, high = math.inf, -math.inf
+        for i in range(span):
+            start = newest - i * self.resolution
+            slot = int(start // self.resolution) % self.size
+            n = self.counts[slot]
+            if self.starts[slot] != start or not n:
+                continue
+            # Chan et al. parallel combination of mean/variance
+            delta = self.means[slot] - mean
+            total = count + n
+            mean += delta * n / total
+            m2 += self.m2s[slot] + delta * delta * count * n / total
+            count = total
+            low = min(low, self.mins[slot])
+            high = max(high, self.maxs[slot])
+        if not count:
+            return None
+        return {
+            'start': newest - (span - 1) * self.resolution,
+            'count': count,
+            'min': low,
+            'max': high,
+            'mean': mean,
+            'variance': m2 / (count - 1) if count > 1 else 0.0,
+        }
+
+    def _bucket(self, slot: int) -> Dict[str, float]:
+        count = self.counts[slot]
+        return {
+            'start': self.starts[slot],
+            'count': count,
+            'min': self.mins[slot],
+            'max': self.maxs[slot],
+            'mean': self.means[slot],
+            'variance': self.m2s[slot] / (count - 1) if count > 1 else 0.0,
+        }
+
+
+class SensorHistory:
+    def __init__(self, capacity: int = RAW_CAPACITY, resolutions: Optional[Dict[int, int]] = None):
+        """
+        Recent raw samples plus multi-resolution rollups for a single sensor.
+
+        :param capacity: Number of raw samples kept in the ring buffer.
+        :param resolutions: Mapping of bucket width (seconds) to bucket count.
+        """
+        self.capacity = capacity
+        self.timestamps = array('d', [0.0]) * capacity
+        self.values = array('d', [0.0]) * capacity
+        self.total = 0
+        self.rollups = {
+            resolution: RollupWindow(resolution, buckets)
+            for resolution, buckets in (resolutions or RESOLUTIONS).items()
+        }
+        self._lock = threading.Lock()
+
+    def add(self, value: float, timestamp: Optional[float] = None) -> None:
+        """Stores a raw sample and updates every rollup (O(1))."""
+        timestamp = time.time() if timestamp is None else timestamp
+        with self._lock:
+            slot = self.total % self.capacity
+            self.timestamps[slot] = timestamp
+            self.values[slot] = value
+            self.total += 1
+            for window in self.rollups.values():
+                window.add(timestamp, value)
+
+    def latest(self) -> Optional[Tuple[float, float]]:
+        """Returns the newest (timestamp, value) pair or None if empty."""
+        with self._lock:
+            if not self.total:
+                return None
+            slot = (self.total - 1) % self.capacity
+            return self.timestamps[slot], self.values[slot]
+
+    def recent(self, count: Optional[int] = None) -> List[Tuple[float, float]]:
+        """Returns up to `count` of the newest raw samples, oldest first."""
+        with self._lock:
+            available = min(self.total, self.capacity)
+            count = available if count is None else min(count, available)
+            first = self.total - count
+            return [
+                (self.timestamps[i % self.capacity], self.values[i % self.capacity])
+                for i in range(first, self.total)
+            ]
+
+    def buckets(self, resolution: int, limit: Optional[int] = None) -> List[Dict[str, float]]:
+        """Returns the most recent rollup buckets for the given resolution."""
+        with self._lock:
+            return self.rollups[resolution].buckets(limit)
+
+    def summary(self, seconds: float, resolution: Optional[int] = None) -> Optional[Dict[str, float]]:
+        """
+        Returns count/min/max/mean/variance over the last `seconds`.
+        Uses the coarsest resolution that still fits the window unless one is given.
+        """
+        if resolution is None:
+            fitting = [r for r in self.rollups if r <= seconds]
+            resolution = max(fitting) if fitting else min(self.rollups)
+        with self._lock:
+            return self.rollups[resolution].summary(seconds)
+
+
+class HistoryStore:
+    def __init__(self, capacity: int = RAW_CAPACITY):
+        """
+        Per-sensor in-memory history, created lazily on the first sample.
+        :param capacity: Raw samples kept per sensor.
+        """
+        self.capacity = capacity
+        self._sensors: Dict[int, SensorHistory] = {}
+        self._lock = threading.Lock()
+
+    def record(self, sensor_id: int, value: float, timestamp: Optional[float] = None) -> None:
+        """Adds a sample for the given sensor."""
+        history = self._sensors.get(sensor_id)
+        if history is None:
+            with self._lock:
+                history = self._sensors.setdefault(sensor_id, SensorHistory(self.capacity))
+        history.add(value, timestamp)
+
+    def get(self, sensor_id: int) -> Optional[SensorHistory]:
+        """Returns the history for a sensor or None if it has no samples yet."""
+        return self._sensors.get(sensor_id)
+
+    def sensor_ids(self) -> List[int]:
+        """Returns the IDs of all sensors with recorded samples."""
+        return sorted(self._sensors)
@@ -0,0 +1,100 @@
+import math
+import time
+from typing import Any, Dict, Optional, Tuple
+
+MISSED_SKIP = 'skip'
+MISSED_CATCH_UP = 'catch_up'
+MISSED_COALESCE = 'coalesce'
+MISSED_POLICIES = (MISSED_SKIP, MISSED_CATCH_UP, MISSED_COALESCE)
+
+
+class FixedRateSchedule:
+    def __init__(self, interval: float, missed: str = MISSED_SKIP, align: bool = True):
+        """
+        Fixed-rate tick schedule against monotonic deadlines.
+
+        Tick k is due at origin + k * interval, so the time spent in the driver call, the insert
+        or the sync does not push later ticks back. With `align`, the origin is the next multiple
+        of `interval` on the wall clock, so samples land on predictable timestamps.
+
+        How ticks that are more than a full interval overdue are handled:
+            skip     - drop them and wait for the next grid point
+            catch_up - run every missed tick back to back
+            coalesce - run a single tick now for the latest missed grid point
+
+        :param interval: Period between ticks in seconds.
+        :param missed: Missed-tick policy, one of MISSED_POLICIES.
+        :param align: Align ticks to multiples of `interval` on the wall clock.
+        """
+        if interval <= 0:
+            raise ValueError("interval must be positive")
+        if missed not in MISSED_POLICIES:
+            raise ValueError(f"Unknown missed-tick policy '{missed}', expected one of {MISSED_POLICIES}")
+        self.interval = interval
+        self.missed_policy = missed
+        self.tick = 0
+        self.missed = 0
+
+        now_mono = time.monotonic()
+        now_wall = time.time()
+        offset = (-now_wall) % interval if align else 0.0
+        self.wall_origin = now_wall + offset
+        self.mono_origin = now_mono + offset
+
+    @classmethod
+    def from_config(cls, interval: float, config: Optional[Dict[str, Any]]) -> "FixedRateSchedule":
+        """
+        Builds a schedule from the "schedule" section of a sensor config, e.g.
+        {"map": "ph", "schedule": {"missed": "coalesce", "align": true}}
+        """
+        schedule = (config or {}).get('schedule') or {}
+        return cls(interval, schedule.get('missed', MISSED_SKIP), bool(schedule.get('align', True)))
+
+    def deadline(self, tick: Optional[int] = None) -> float:
+        """Monotonic due time of a tick (default: the next one)."""
+        return self.mono_origin + (self.tick if tick is None else tick) * self.interval
+
+    def timestamp(self, tick: int) -> float:
+        """Wall-clock timestamp of a tick's grid point."""
+        return self.wall_origin + tick * self.interval
+
+    def set_interval(self, interval: float) -> None:
+        """
+        Changes the period. The new grid starts at the last tick that ran, so the next tick is
+        due one new interval after it and already elapsed ticks keep their timestamps.
+        """
+        if interval <= 0:
+            raise ValueError("interval must be positive")
+        if self.tick > 0:
+            self.mono_origin = self.deadline(self.tick - 1)
+            self.wall_origin = self.timestamp(self.tick - 1)
+            self.tick = 1
+        self.interval = interval
+
+    def wait(self, stop_event) -> Optional[Tuple[float, float]]:
+        """
+        Blocks until the next tick is due.
+        :param stop_event: Event that aborts the wait when set.
+        :return: (monotonic deadline, wall-clock timestamp) of the tick, or None if stopped.
+        """
+        now = time.monotonic()
+        due = self.deadline()
+        if now - due >= self.interval:
+            latest = int(math.floor((now - self.mono_origin) / self.interval))
+            if self.missed_policy == MISSED_SKIP:
+                self.missed += latest + 1 - self.tick
+                self.tick = latest + 1
+            elif self.missed_policy == MISSED_COALESCE:
+                self.missed += latest - self.tick
+                self.tick = latest
+            due = self.deadline()
+
+        delay = due - now
+        if delay > 0 and stop_event.wait(delay):
+            return None
+        if stop_event.is_set():
+            return None
+
+        tick = self.tick
+        self.tick += 1
+        return due, self.timestamp(tick)
@@ -0,0 +1,324 @@
+import argparse
+import bisect
+import fcntl
+import json
+import logging
+import mmap
+import os
+import struct
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+COLUMN = struct.Struct('<d')
+DTYPE = '<f8'
+# Present next to a segment whose timestamps were not appended in order
+UNSORTED = '.unsorted'
+# Lists the segments a compaction is merging, until they are removed
+MANIFEST = 'compact.json'
+
+
+class SegmentStore:
+    def __init__(self, root: str, segment_seconds: int = 86400):
+        """
+        On-disk per-sensor history in fixed-width column files.
+
+        Each sensor has a directory of segments named <start>-<span>, each made of a .ts and a
+        .val file holding little-endian float64 timestamps and values. Segment starts are aligned
+        to their span, so the sorted list of segment names is the sparse time index: a range
+        query bisects it, maps the matching files with mmap and binary searches the timestamp
+        column, returning NumPy views without copying. Readings appended out of order (several
+        processes write the same sensor) mark their segment, which is then sorted when read.
+
+        Compaction writes a manifest of the segments it merges before the merged files replace
+        anything, and removes it once the merged segments are gone; an interrupted compaction
+        is finished from the manifest the next time the store is opened or compacted.
+
+        :param root: Directory holding one sub-directory per sensor.
+        :param segment_seconds: Span of newly written segments.
+        """
+        self.root = root
+        self.segment_seconds = segment_seconds
+        self._files: Dict[int, Tuple[int, object, object]] = {}
+        self._lock = threading.Lock()
+        os.makedirs(root, exist_ok=True)
+        os.register_at_fork(after_in_child=self._forget_files)
+        for sensor_id in self.sensor_ids():
+            with self._compacting(sensor_id, blocking=False) as locked:
+                if locked:
+                    self._recover(sensor_id)
+
+    def append(self, sensor_id: int, timestamp: float, value: float) -> None:
+        """Appends one reading to the sensor's current segment."""
+        start = int(timestamp - timestamp % self.segment_seconds)
+        with self._lock:
+            current = self._files.get(sensor_id)
+            if current is None or current[0] != start:
+                if current is not None:
+                    current[1].close()
+                    current[2].close()
+                directory = self._directory(sensor_id)
+                os.makedirs(directory, exist_ok=True)
+                base = os.path.join(directory, f"{start}-{self.segment_seconds}")
+                current = (start, open(f"{base}.ts", 'a+b'), open(f"{base}.val", 'ab'))
+                self._files[sensor_id] = current
+            _, ts_file, val_file = current
+            # Several cycle processes may append to the same sensor, keep both columns in step
+            fcntl.flock(ts_file, fcntl.LOCK_EX)
+            try:
+                size = os.fstat(ts_file.fileno()).st_size
+                if size >= COLUMN.size:
+                    last, = COLUMN.unpack(os.pread(ts_file.fileno(), COLUMN.size, size - size % COLUMN.size - COLUMN.size))
+                    if timestamp < last:
+                        open(ts_file.name[:-len('.ts')] + UNSORTED, 'a').close()
+                ts_file.write(COLUMN.pack(timestamp))
+                val_file.write(COLUMN.pack(value))
+                ts_file.flush()
+                val_file.flush()
+            finally:
+                fcntl.flock(ts_file, fcntl.LOCK_UN)
+
+    def sensor_ids(self) -> List[int]:
+        return sorted(int(name) for name in os.listdir(self.root) if name.isdigit())
+
+    def segments(self, sensor_id: int) -> List[Tuple[int, int]]:
+        """Returns the (start, span) of every segment of a sensor, oldest first."""
+        directory = self._directory(sensor_id)
+        if not os.path.isdir(directory):
+            return []
+        names = os.listdir(directory)
+        result = set()
+        for name in names:
+            stem, ext = os.path.splitext(name)
+            if ext == '.ts' and '-' in stem:
+                start, span = stem.split('-', 1)
+                result.add((int(start), int(span)))
+        if MANIFEST in names:
+            # Once the merged segment is in place, its sources would only show readings twice
+            manifest = self._read_manifest(sensor_id)
+            if manifest and not any(name.endswith('.tmp') for name in names):
+                result -= {tuple(member) for member in manifest['members']}
+        return sorted(result)
+
+    def iter_range(self, sensor_id: int, start: float, end: float) -> Iterator[Tuple["np.ndarray", "np.ndarray"]]:
+        """
+        Yields (timestamps, values) views for each segment overlapping [start, end).
+        The views are backed by read-only mmaps and are not copied, except for segments
+        appended out of order, which are sorted first.
+        """
+        import numpy as np
+        segments = self.segments(sensor_id)
+        # Segments are sorted by start; the first candidate is the last one starting before `start`
+        first = max(0, bisect.bisect_right(segments, (int(start), float('inf'))) - 1)
+        for segment_start, span in segments[first:]:
+            if segment_start >= end:
+                break
+            if segment_start + span <= start:
+                continue
+            columns = self._map(sensor_id, segment_start, span)
+            if columns is None:
+                continue
+            timestamps, values = columns
+            if os.path.exists(self._base(sensor_id, segment_start, span) + UNSORTED):
+                order = np.argsort(timestamps, kind='stable')
+                timestamps, values = timestamps[order], values[order]
+            low, high = timestamps.searchsorted([start, end])
+            if high > low:
+                yield timestamps[low:high], values[low:high]
+
+    def query(self, sensor_id: int, start: float, end: float) -> Tuple["np.ndarray", "np.ndarray"]:
+        """
+        Returns all readings in [start, end). A range inside one segment is a zero-copy view,
+        a range spanning several segments is concatenated.
+        """
+        import numpy as np
+        parts = list(self.iter_range(sensor_id, start, end))
+        if not parts:
+            return np.empty(0, DTYPE), np.empty(0, DTYPE)
+        if len(parts) == 1:
+            return parts[0]
+        return np.concatenate([p[0] for p in parts]), np.concatenate([p[1] for p in parts])
+
+    def compact(self, sensor_id: int, older_than: float, target_span: int, now: Optional[float] = None) -> int:
+        """
+        Merges segments that ended more than `older_than` seconds ago into `target_span`
+        segments, sorted by timestamp. Returns the number of segments written.
+
+        :param target_span: Must be a multiple of every merged segment's span.
+        """
+        import numpy as np
+        now = time.time() if now is None else now
+        with self._compacting(sensor_id):
+            self._recover(sensor_id)
+            groups: Dict[int, List[Tuple[int, int]]] = {}
+            for segment_start, span in self.segments(sensor_id):
+                if segment_start + span > now - older_than or span >= target_span or target_span % span:
+                    continue
+                groups.setdefault(segment_start - segment_start % target_span, []).append((segment_start, span))
+
+            written = 0
+            for group_start, members in groups.items():
+                if group_start + target_span > now - older_than:
+                    continue  # The group is not complete yet
+                base = self._base(sensor_id, group_start, target_span)
+                existing = [(group_start, target_span)] if os.path.exists(f"{base}.ts") else []
+                columns = [c for c in (self._map(sensor_id, s, sp) for s, sp in existing + members) if c is not None]
+                if columns:
+                    timestamps = np.concatenate([c[0] for c in columns])
+                    values = np.concatenate([c[1] for c in columns])
+                    order = np.argsort(timestamps, kind='stable')
+                    for ext, column in (('.ts', timestamps[order]), ('.val', values[order])):
+                        with open(f"{base}{ext}.tmp", 'wb') as file:
+                            file.write(column.astype(DTYPE).tobytes())
+                            file.flush()
+                            os.fsync(file.fileno())
+                    written += 1
+                # From here on the merge is finished by _recover, even after a crash
+                self._write_manifest(sensor_id, {'target': [group_start, target_span], 'members': members})
+                self._recover(sensor_id)
+        return written
+
+    def expire(self, sensor_id: int, retention: float, now: Optional[float] = None) -> int:
+        """Deletes segments that ended more than `retention` seconds ago. Returns how many."""
+        now = time.time() if now is None else now
+        removed = 0
+        for segment_start, span in self.segments(sensor_id):
+            if segment_start + span <= now - retention:
+                self._remove(sensor_id, segment_start, span)
+                removed += 1
+        return removed
+
+    def maintain(self, compact_after: float, compact_span: int, retention: float) -> None:
+        """Runs compaction and expiry for every sensor."""
+        for sensor_id in self.sensor_ids():
+            try:
+                expired = self.expire(sensor_id, retention)
+                compacted = self.compact(sensor_id, compact_after, compact_span)
+                if expired or compacted:
+                    logger.info(f"Segment store Sensor ID {sensor_id}: {compacted} compacted, {expired} expired.")
+            except Exception as e:
+                logger.error(f"Segment maintenance failed for Sensor ID {sensor_id}: {e}")
+
+    def _recover(self, sensor_id: int) -> None:
+        """
+        Finishes the compaction recorded in the sensor's manifest: moves the merged columns in
+        place and removes the merged segments. Without a manifest, merged columns left behind
+        were never complete and are deleted. Called with the compaction lock held.
+        """
+        directory = self._directory(sensor_id)
+        manifest = self._read_manifest(sensor_id)
+        if manifest is None:
+            for name in os.listdir(directory):
+                if name.endswith('.tmp'):
+                    os.remove(os.path.join(directory, name))
+            return
+        base = self._base(sensor_id, *manifest['target'])
+        for ext in ('.ts', '.val'):
+            if os.path.exists(f"{base}{ext}.tmp"):
+                os.replace(f"{base}{ext}.tmp", f"{base}{ext}")
+        if os.path.exists(f"{base}{UNSORTED}"):
+            os.remove(f"{base}{UNSORTED}")
+        for segment_start, span in manifest['members']:
+            self._remove(sensor_id, segment_start, span)
+        os.remove(os.path.join(directory, MANIFEST))
+
+    def _read_manifest(self, sensor_id: int) -> Optional[Dict]:
+        try:
+            with open(os.path.join(self._directory(sensor_id), MANIFEST)) as file:
+                return json.load(file)
+        except FileNotFoundError:
+            return None
+
+    def _write_manifest(self, sensor_id: int, manifest: Dict) -> None:
+        path = os.path.join(self._directory(sensor_id), MANIFEST)
+        with open(f"{path}.part", 'w') as file:
+            json.dump(manifest, file)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(f"{path}.part", path)
+
+    @contextmanager
+    def _compacting(self, sensor_id: int, blocking: bool = True):
+        # Only one process compacts or recovers a sensor at a time; yields False if busy
+        with open(os.path.join(self._directory(sensor_id), '.compact.lock'), 'w') as lock:
+            try:
+                fcntl.flock(lock, fcntl.LOCK_EX | (0 if blocking else fcntl.LOCK_NB))
+            except BlockingIOError:
+                yield False
+                return
+            yield True
+
+    def _directory(self, sensor_id: int) -> str:
+        return os.path.join(self.root, str(sensor_id))
+
+    def _base(self, sensor_id: int, start: int, span: int) -> str:
+        return os.path.join(self._directory(sensor_id), f"{start}-{span}")
+
+    def _map(self, sensor_id: int, start: int, span: int) -> Optional[Tuple["np.ndarray", "np.ndarray"]]:
+        import numpy as np
+        base = self._base(sensor_id, start, span)
+        columns = []
+        for ext in ('.ts', '.val'):
+            try:
+                with open(f"{base}{ext}", 'rb') as file:
+                    size = os.fstat(file.fileno()).st_size
+                    if size < COLUMN.size:
+                        return None
+                    columns.append(np.frombuffer(mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ), dtype=DTYPE))
+            except FileNotFoundError:
+                return None
+        # A crash between the two writes can leave one column a row longer
+        rows = min(len(columns[0]), len(columns[1]))
+        return columns[0][:rows], columns[1][:rows]
+
+    def _remove(self, sensor_id: int, start: int, span: int) -> None:
+        base = self._base(sensor_id, start, span)
+        with self._lock:
+            current = self._files.get(sensor_id)
+            if current is not None and current[1].name == f"{base}.ts":
+                current[1].close()
+                current[2].close()
+                del self._files[sensor_id]
+        for ext in ('.ts', '.val', UNSORTED):
+            try:
+                os.remove(f"{base}{ext}")
+            except FileNotFoundError:
+                pass
+
+    def _forget_files(self) -> None:
+        # Forked children open their own handles, the parent's stay untouched
+        self._files = {}
+        self._lock = threading.Lock()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Query or maintain the local segment store.")
+    parser.add_argument('--root', default='history', help="segment store directory")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    query = commands.add_parser('query', help="print readings of a sensor in a time range")
+    query.add_argument('sensor_id', type=int)
+    query.add_argument('--hours', type=float, default=24, help="how far back to read")
+
+    maintain = commands.add_parser('maintain', help="compact and expire segments")
+    maintain.add_argument('--compact-after', type=float, default=7 * 86400)
+    maintain.add_argument('--compact-span', type=int, default=28 * 86400)
+    maintain.add_argument('--retention', type=float, default=365 * 86400)
+
+    args = parser.parse_args()
+    store = SegmentStore(args.root)
+    if args.command == 'query':
+        now = time.time()
+        timestamps, values = store.query(args.sensor_id, now - args.hours * 3600, now)
+        print(f"{len(values)} readings")
+        if len(values):
+            print(f"min {values.min():.3f} | max {values.max():.3f} | mean {values.mean():.3f}")
+    else:
+        store.maintain(args.compact_after, args.compact_span, args.retention)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,165 @@
+import argparse
+import math
+import multiprocessing
+import struct
+import time
+from multiprocessing import resource_tracker, shared_memory
+from typing import Dict, Optional, Tuple
+
+HEADER = struct.Struct('<4sIII')        # magic, version, capacity, slot size
+SLOT = struct.Struct('<QddI4x')         # sequence, value, timestamp, status
+SEQUENCE = struct.Struct('<Q')
+MAGIC = b'HLVT'
+VERSION = 1
+
+STATUS_EMPTY = 0
+STATUS_OK = 1
+STATUS_MISSING = 2
+STATUS_ERROR = 3
+STATUS_TIMEOUT = 4
+
+STATUS_NAMES = {
+    STATUS_EMPTY: 'empty',
+    STATUS_OK: 'ok',
+    STATUS_MISSING: 'missing',
+    STATUS_ERROR: 'error',
+    STATUS_TIMEOUT: 'timeout',
+}
+
+
+class LatestValueTable:
+    def __init__(self, shm: shared_memory.SharedMemory, capacity: int, owner: bool, write_lock=None):
+        """
+        Fixed-layout shared-memory table of the latest reading per sensor, indexed by sensor ID.
+
+        Each slot is guarded by a sequence number (seqlock): a writer makes it odd, updates the
+        slot and makes it even again. Readers never lock, they retry when the sequence is odd
+        or changed while they were copying the slot. Writers are serialized by a process-shared
+        lock, so only processes forked from the creator can write.
+
+        Use create() in the main process before forking and attach() from other tools.
+        """
+        self.shm = shm
+        self.buffer = shm.buf
+        self.capacity = capacity
+        self.owner = owner
+        self._write_lock = write_lock
+
+    @classmethod
+    def create(cls, name: str, capacity: int = 256) -> "LatestValueTable":
+        """Creates (or replaces) the named table."""
+        size = HEADER.size + capacity * SLOT.size
+        try:
+            stale = shared_memory.SharedMemory(name=name)
+            stale.close()
+            stale.unlink()
+        except FileNotFoundError:
+            pass
+        shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+        shm.buf[:size] = bytes(size)
+        HEADER.pack_into(shm.buf, 0, MAGIC, VERSION, capacity, SLOT.size)
+        return cls(shm, capacity, owner=True, write_lock=multiprocessing.Lock())
+
+    @classmethod
+    def attach(cls, name: str) -> "LatestValueTable":
+        """Attaches read-only to a table created by another process."""
+        shm = shared_memory.SharedMemory(name=name)
+        # Attaching must not make this process unlink the segment on exit
+        resource_tracker.unregister(shm._name, 'shared_memory')
+        magic, version, capacity, slot_size = HEADER.unpack_from(shm.buf, 0)
+        if magic != MAGIC or version != VERSION or slot_size != SLOT.size:
+            shm.close()
+            raise ValueError(f"Shared memory '{name}' is not a latest-value table")
+        return cls(shm, capacity, owner=False)
+
+    def _offset(self, sensor_id: int) -> Optional[int]:
+        if 0 <= sensor_id < self.capacity:
+            return HEADER.size + sensor_id * SLOT.size
+        return None
+
+    def write(self, sensor_id: int, value: float, timestamp: Optional[float] = None, status: int = STATUS_OK) -> bool:
+        """
+        Publishes a reading. Returns False if the sensor ID does not fit the table.
+        """
+        offset = self._offset(sensor_id)
+        if offset is None or self._write_lock is None:
+            return False
+        timestamp = time.time() if timestamp is None else timestamp
+        with self._write_lock:
+            self._store(offset, value, timestamp, status)
+        return True
+
+    def mark(self, sensor_id: int, status: int, timestamp: Optional[float] = None) -> bool:
+        """Updates a slot's status (e.g. a missed or failed read) and keeps the last value."""
+        offset = self._offset(sensor_id)
+        if offset is None or self._write_lock is None:
+            return False
+        timestamp = time.time() if timestamp is None else timestamp
+        # Read and rewrite under the lock, so a write landing in between is not undone
+        with self._write_lock:
+            sequence, value = SLOT.unpack_from(self.buffer, offset)[:2]
+            self._store(offset, value if sequence else math.nan, timestamp, status)
+        return True
+
+    def _store(self, offset: int, value: float, timestamp: float, status: int) -> None:
+        # Called with the write lock held: odd sequence while the slot is being rewritten
+        sequence = SEQUENCE.unpack_from(self.buffer, offset)[0]
+        SEQUENCE.pack_into(self.buffer, offset, sequence + 1)
+        SLOT.pack_into(self.buffer, offset, sequence + 1, value, timestamp, status)
+        SEQUENCE.pack_into(self.buffer, offset, sequence + 2)
+
+    def read(self, sensor_id: int, retries: int = 100) -> Optional[Tuple[float, float, int, int]]:
+        """
+        Returns (value, timestamp, sequence, status) for a sensor, or None if it was never
+        written or the ID does not fit the table.
+        """
+        offset = self._offset(sensor_id)
+        if offset is None:
+            return None
+        for _ in range(retries):
+            before, value, timestamp, status = SLOT.unpack_from(self.buffer, offset)
+            if before & 1:
+                continue
+            if SEQUENCE.unpack_from(self.buffer, offset)[0] == before:
+                if before == 0:
+                    return None
+                return value, timestamp, before // 2, status
+        return None
+
+    def sequence(self, sensor_id: int) -> int:
+        """Returns the number of writes to a sensor's slot, cheap enough to poll for changes."""
+        offset = self._offset(sensor_id)
+        return SEQUENCE.unpack_from(self.buffer, offset)[0] // 2 if offset is not None else 0
+
+    def snapshot(self) -> Dict[int, Tuple[float, float, int, int]]:
+        """Returns every written slot."""
+        result = {}
+        for sensor_id in range(self.capacity):
+            entry = self.read(sensor_id)
+            if entry is not None:
+                result[sensor_id] = entry
+        return result
+
+    def close(self) -> None:
+        self.buffer = None
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Print the latest reading of every sensor from shared memory.")
+    parser.add_argument('--name', default='hydroponics_latest', help="shared memory segment name")
+    args = parser.parse_args()
+
+    table = LatestValueTable.attach(args.name)
+    try:
+        now = time.time()
+        for sensor_id, (value, timestamp, sequence, status) in table.snapshot().items():
+            print(f"{sensor_id:>4} | {value:>10.3f} | {now - timestamp:>7.1f}s ago | seq {sequence:>8} | {STATUS_NAMES.get(status, status)}")
+    finally:
+        table.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,170 @@
+import hashlib
+import json
+import logging
+import os
+import time
+from typing import Any, Dict, NamedTuple, Optional, Tuple
+
+from .metrics import registry
+
+logger = logging.getLogger(__name__)
+
+LOAD_SECONDS = registry.histogram('config_snapshot_load_seconds', 'Time spent loading sensors, cycles and relays')
+LOAD_ERRORS = registry.counter('config_snapshot_load_errors_total', 'Snapshot loads that failed')
+
+# Every cycle of an active sensor is switched on when the application starts
+ACTIVATE_CYCLES = """
+    UPDATE cycles c
+    INNER JOIN sensors s ON s.id = c.sensor_id
+    SET c.is_active = 1
+    WHERE s.is_active = 1 AND c.is_active = 0
+"""
+
+SELECT_SENSORS = """
+    SELECT id, config
+    FROM sensors
+    WHERE is_active = 1
+"""
+
+SELECT_CYCLES = """
+    SELECT c.sensor_id, c.cycle_id, c.interval_seconds, c.duration_minutes, c.pause, c.is_active
+    FROM cycles c
+    INNER JOIN sensors s ON s.id = c.sensor_id
+    WHERE s.is_active = 1 AND c.is_active = 1
+    ORDER BY c.sensor_id, c.cycle_id
+"""
+
+SELECT_RELAYS = """
+    SELECT r.id, d.device_name, d.gpio, r.control_mode
+    FROM relays r
+    INNER JOIN devices d ON d.device_id = r.device_id
+    ORDER BY r.id
+"""
+
+
+class FrozenDict(dict):
+    """A dict that refuses changes, so one snapshot can be shared by every worker."""
+
+    def _readonly(self, *args, **kwargs):
+        raise TypeError("configuration snapshots are read-only")
+
+    __setitem__ = __delitem__ = __ior__ = clear = pop = popitem = setdefault = update = _readonly
+
+    def __reduce__(self):
+        return FrozenDict, (dict(self),)
+
+
+def freeze(value: Any) -> Any:
+    """Deep-copies JSON-like data into FrozenDicts and tuples."""
+    if isinstance(value, dict):
+        return FrozenDict((key, freeze(item)) for key, item in value.items())
+    if isinstance(value, (list, tuple)):
+        return tuple(freeze(item) for item in value)
+    return value
+
+
+class RelayConfig(NamedTuple):
+    relay_id: int
+    name: str
+    gpio: int
+    control_mode: str
+
+
+class ConfigSnapshot(NamedTuple):
+    """
+    Sensors, cycles and relays of the whole deployment at one point in time.
+    `version` changes only when the content does.
+    """
+    sensors: FrozenDict     # sensor ID -> parsed sensor config, the type is config['map']
+    cycles: FrozenDict      # sensor ID -> tuple of cycle rows (FrozenDicts), ordered by cycle ID
+    relays: FrozenDict      # relay ID -> RelayConfig
+    version: str
+    loaded_at: float
+
+    def cycles_for(self, sensor_id: int) -> Tuple[FrozenDict, ...]:
+        return self.cycles.get(sensor_id, ())
+
+    def to_json(self) -> Dict[str, Any]:
+        return {
+            'sensors': {str(sensor_id): sensor_config for sensor_id, sensor_config in self.sensors.items()},
+            'cycles': {str(sensor_id): list(cycles) for sensor_id, cycles in self.cycles.items()},
+            'relays': {str(relay_id): relay._asdict() for relay_id, relay in self.relays.items()},
+        }
+
+    @classmethod
+    def from_json(cls, data: Dict[str, Any], loaded_at: Optional[float] = None) -> "ConfigSnapshot":
+        sensors = {int(sensor_id): sensor_config for sensor_id, sensor_config in data['sensors'].items()}
+        cycles = {int(sensor_id): rows for sensor_id, rows in data['cycles'].items()}
+        relays = {int(relay_id): RelayConfig(**relay) for relay_id, relay in data['relays'].items()}
+        version = hashlib.sha1(json.dumps(data, sort_keys=True, default=str).encode()).hexdigest()[:12]
+        return cls(freeze(sensors), FrozenDict((sensor_id, freeze(rows)) for sensor_id, rows in cycles.items()),
+                   FrozenDict(relays), version, loaded_at if loaded_at is not None else time.time())
+
+
+def load_snapshot(db_conn, activate_cycles: bool = False) -> ConfigSnapshot:
+    """
+    Loads the configuration of every active sensor with a fixed number of queries, however many
+    sensors, cycles and relays there are: one SELECT each for sensors, cycles and relays, after
+    one UPDATE activating every cycle if `activate_cycles`. Raises if the database cannot be read.
+    """
+    start = time.perf_counter()
+    try:
+        if activate_cycles:
+            db_conn.execute_query(ACTIVATE_CYCLES)
+        sensors = {}
+        for row in db_conn.fetch_all(SELECT_SENSORS, (), dictionary=True):
+            try:
+                sensor_config = json.loads(row['config'])
+            except (TypeError, ValueError) as e:
+                logger.error(f"JSON decode error for Sensor ID {row['id']}: {e}")
+                continue
+            if not sensor_config.get('map'):
+                logger.warning(f"Sensor ID {row['id']} has no 'map' configuration.")
+                continue
+            sensors[str(row['id'])] = sensor_config
+
+        cycles: Dict[str, list] = {}
+        for row in db_conn.fetch_all(SELECT_CYCLES, (), dictionary=True):
+            if str(row['sensor_id']) in sensors:
+                cycles.setdefault(str(row['sensor_id']), []).append({
+                    'cycle_id': row['cycle_id'],
+                    'cycle_number': 1,
+                    'interval_seconds': row['interval_seconds'],
+                    'duration_minutes': row['duration_minutes'],
+                    'pause': row['pause'],
+                    'is_active': row['is_active'],
+                })
+
+        relays = {
+            str(relay_id): {'relay_id': relay_id, 'name': name, 'gpio': gpio, 'control_mode': control_mode}
+            for relay_id, name, gpio, control_mode in db_conn.fetch_all(SELECT_RELAYS)
+        }
+    except Exception:
+        LOAD_ERRORS.inc()
+        raise
+    finally:
+        LOAD_SECONDS.observe(time.perf_counter() - start)
+
+    return ConfigSnapshot.from_json({'sensors': sensors, 'cycles': cycles, 'relays': relays})
+
+
+def save_cache(snapshot: ConfigSnapshot, path: str) -> None:
+    """Writes the snapshot atomically so a restart without the database can start from it."""
+    tmp_path = f"{path}.tmp"
+    try:
+        with open(tmp_path, 'w') as file:
+            json.dump(snapshot.to_json(), file, default=str)
+        os.replace(tmp_path, path)
+    except OSError as e:
+        logger.warning(f"Failed to write configuration cache {path}: {e}")
+
+
+def load_cache(path: str) -> Optional[ConfigSnapshot]:
+    try:
+        with open(path) as file:
+            return ConfigSnapshot.from_json(json.load(file), loaded_at=os.path.getmtime(path))
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError, KeyError, TypeError) as e:
+        logger.warning(f"Ignoring unreadable configuration cache {path}: {e}")
+        return None
@@ -0,0 +1,50 @@
+import importlib
+import time
+from contextlib import contextmanager
+from typing import List, Tuple
+
+# Taken when the first module of the application imports this one
+PROCESS_START = time.monotonic()
+
+
+class StartupProfiler:
+    def __init__(self):
+        """
+        Collects how long each startup phase (module imports, DB connect, config queries) took.
+        """
+        self.phases: List[Tuple[str, float]] = []
+
+    def record(self, name: str, seconds: float) -> None:
+        self.phases.append((name, seconds))
+
+    @contextmanager
+    def phase(self, name: str):
+        """Times the block as a named phase."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - start)
+
+    def import_module(self, name: str):
+        """Imports a module, timing it as an 'import <name>' phase on first load."""
+        start = time.perf_counter()
+        module = importlib.import_module(name)
+        elapsed = time.perf_counter() - start
+        if elapsed > 0.0001:
+            self.record(f"import {name}", elapsed)
+        return module
+
+    def report(self, title: str = "Startup") -> str:
+        """Formats the phases, slowest first, with totals for imports and DB connects."""
+        since_start = time.monotonic() - PROCESS_START
+        imports = sum(seconds for name, seconds in self.phases if name.startswith('import '))
+        connects = sum(seconds for name, seconds in self.phases if name.startswith('db connect'))
+        lines = [f"{title} report: {since_start * 1000:.0f}ms since process start | "
+                 f"imports {imports * 1000:.0f}ms | db connect {connects * 1000:.0f}ms"]
+        for name, seconds in sorted(self.phases, key=lambda phase: phase[1], reverse=True):
+            lines.append(f"  {seconds * 1000:8.1f}ms  {name}")
+        return '\n'.join(lines)
+
+
+profiler = StartupProfiler()
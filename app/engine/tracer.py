@@ -0,0 +1,161 @@
+import argparse
+import math
+import os
+import signal
+import struct
+from collections import defaultdict
+from typing import Dict, Iterator, List, Optional, Tuple
+
+# sensor_id, cycle_id, scheduled, start, end (monotonic seconds), outcome
+RECORD = struct.Struct('<iidddB7x')
+HEADER = struct.Struct('<4sII')
+MAGIC = b'HTRC'
+VERSION = 1
+
+TICK_OK = 0
+TICK_ERROR = 1
+TICK_NO_VALUE = 2
+TICK_TIMEOUT = 3
+TICK_SKIPPED = 4
+
+OUTCOMES = {
+    TICK_OK: 'ok',
+    TICK_ERROR: 'error',
+    TICK_NO_VALUE: 'no_value',
+    TICK_TIMEOUT: 'timeout',
+    TICK_SKIPPED: 'skipped',
+}
+
+
+class TickTracer:
+    def __init__(self):
+        """
+        Records the scheduled, start and end time of every cycle tick into a preallocated
+        binary ring buffer. Disabled until enable() is called, recording is then a single
+        struct.pack_into per tick.
+        """
+        self.enabled = False
+        self.capacity = 0
+        self.directory = '.'
+        self.buffer = bytearray()
+        self.count = 0
+
+    def enable(self, capacity: int = 65536, directory: str = '.', signum: int = signal.SIGUSR1) -> None:
+        """
+        Allocates the ring buffer and installs the dump signal handler.
+        Processes forked afterwards inherit both and trace into their own copy.
+
+        :param capacity: Number of ticks kept before the oldest are overwritten.
+        :param directory: Where trace-<pid>.bin files are written on dump.
+        :param signum: Signal that triggers a dump.
+        """
+        self.capacity = capacity
+        self.directory = directory
+        self.buffer = bytearray(capacity * RECORD.size)
+        self.count = 0
+        self.enabled = True
+        os.makedirs(directory, exist_ok=True)
+        signal.signal(signum, self._handle_signal)
+
+    def record(self, sensor_id: int, cycle_id: int, scheduled: float, start: float, end: float, outcome: int) -> None:
+        if not self.enabled:
+            return
+        offset = (self.count % self.capacity) * RECORD.size
+        RECORD.pack_into(self.buffer, offset, sensor_id, cycle_id, scheduled, start, end, outcome)
+        self.count += 1
+
+    def dump(self, path: Optional[str] = None) -> str:
+        """
+        Writes the buffered ticks, oldest first, to a trace file.
+        :return: Path of the written file.
+        """
+        path = path or os.path.join(self.directory, f"trace-{os.getpid()}.bin")
+        stored = min(self.count, self.capacity)
+        first = (self.count - stored) % self.capacity if self.capacity else 0
+        view = memoryview(self.buffer)
+        with open(path, 'wb') as file:
+            file.write(HEADER.pack(MAGIC, VERSION, stored))
+            split = (first + stored) - self.capacity
+            if split > 0:
+                file.write(view[first * RECORD.size:])
+                file.write(view[:split * RECORD.size])
+            else:
+                file.write(view[first * RECORD.size:(first + stored) * RECORD.size])
+        return path
+
+    def _handle_signal(self, signum, frame):
+        if self.count:
+            self.dump()
+
+
+def read_trace(path: str) -> Iterator[Tuple[int, int, float, float, float, int]]:
+    """Yields (sensor_id, cycle_id, scheduled, start, end, outcome) records from a trace file."""
+    with open(path, 'rb') as file:
+        magic, version, count = HEADER.unpack(file.read(HEADER.size))
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{path} is not a tick trace file")
+        data = file.read(count * RECORD.size)
+    yield from RECORD.iter_unpack(data)
+
+
+def percentile(values: List[float], pct: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    if not values:
+        return 0.0
+    index = max(0, min(len(values) - 1, math.ceil(pct / 100.0 * len(values)) - 1))
+    return values[index]
+
+
+def analyze(paths: List[str], top: int = 10) -> str:
+    """Builds the per-sensor jitter report for the given trace files."""
+    jitters: Dict[int, List[float]] = defaultdict(list)
+    durations: Dict[int, List[float]] = defaultdict(list)
+    outcomes: Dict[int, Dict[str, int]] = defaultdict(lambda: defaultdict(int))
+    worst = []
+
+    for path in paths:
+        for sensor_id, cycle_id, scheduled, start, end, outcome in read_trace(path):
+            outcomes[sensor_id][OUTCOMES.get(outcome, str(outcome))] += 1
+            if outcome == TICK_SKIPPED:
+                # Never ran: counted, but kept out of the jitter and duration figures
+                continue
+            jitter = start - scheduled
+            jitters[sensor_id].append(jitter)
+            durations[sensor_id].append(end - start)
+            worst.append((jitter, sensor_id, cycle_id, end - start, OUTCOMES.get(outcome, str(outcome))))
+
+    lines = [
+        f"{'sensor':>6} | {'ticks':>7} | {'jitter p50':>10} | {'p90':>8} | {'p99':>8} | {'max':>8} | {'dur p50':>8} | {'dur p99':>8} | outcomes",
+        "-" * 110,
+    ]
+    for sensor_id in sorted(outcomes):
+        # A sensor whose ticks were all skipped has no timings
+        j = sorted(jitters[sensor_id]) or [0.0]
+        d = sorted(durations[sensor_id])
+        counts = ', '.join(f"{name}={n}" for name, n in sorted(outcomes[sensor_id].items()))
+        lines.append(
+            f"{sensor_id:>6} | {len(jitters[sensor_id]):>7} | {percentile(j, 50) * 1000:>8.1f}ms | {percentile(j, 90) * 1000:>6.1f}ms | "
+            f"{percentile(j, 99) * 1000:>6.1f}ms | {j[-1] * 1000:>6.1f}ms | {percentile(d, 50) * 1000:>6.1f}ms | "
+            f"{percentile(d, 99) * 1000:>6.1f}ms | {counts}"
+        )
+
+    lines.append("")
+    lines.append(f"Worst {top} ticks by jitter:")
+    for jitter, sensor_id, cycle_id, duration, outcome in sorted(worst, reverse=True)[:top]:
+        lines.append(f"  sensor {sensor_id} cycle {cycle_id}: late {jitter * 1000:.1f}ms, took {duration * 1000:.1f}ms, {outcome}")
+    return '\n'.join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Print per-sensor scheduling jitter from tick trace dumps.")
+    parser.add_argument('paths', nargs='+', help="trace-<pid>.bin files written on SIGUSR1")
+    parser.add_argument('--top', type=int, default=10, help="number of worst ticks to list")
+    args = parser.parse_args()
+    print(analyze(args.paths, args.top))
+
+
+# Module-level tracer shared by the cycle workers of this process
+tracer = TickTracer()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,173 @@
+import logging
+import queue
+import threading
+from typing import Any, Callable, Dict, List, Optional
+
+from .metrics import registry
+
+logger = logging.getLogger(__name__)
+
+TIMEOUTS = registry.counter('driver_call_timeouts_total', 'Driver calls that missed their deadline', ['driver'])
+RECYCLED = registry.counter('driver_recycled_total', 'Driver instances replaced after missing deadlines', ['driver'])
+STUCK = registry.gauge('driver_stuck_calls', 'Replaced driver instances still blocked in a call', ['driver'])
+
+
+class ReadTimeout(Exception):
+    """Raised when a driver call misses its deadline, the call may still be running."""
+
+
+class _Call:
+    __slots__ = ('func', 'args', 'done', 'result', 'error')
+
+    def __init__(self, func: Callable, args: tuple):
+        self.func = func
+        self.args = args
+        self.done = threading.Event()
+        self.result = None
+        self.error: Optional[BaseException] = None
+
+
+class _Worker:
+    def __init__(self, name: str, driver: Any, factory: Optional[Callable[[], Any]],
+                 release: Optional[Callable[[Any], None]]):
+        """
+        The thread that makes every call on one driver instance, so a call that blocks in the
+        hardware blocks this thread and not the caller. Creates the driver with `factory` on
+        its first call if it has none yet.
+        """
+        self.driver = driver
+        self.factory = factory
+        self.release = release
+        self.owns_driver = False
+        self.current: Optional[_Call] = None
+        self.requests: queue.SimpleQueue = queue.SimpleQueue()
+        self.thread = threading.Thread(target=self._serve, name=f"{name}-driver", daemon=True)
+        self.thread.start()
+
+    @property
+    def blocked(self) -> bool:
+        return self.current is not None and not self.current.done.is_set()
+
+    def submit(self, func: Callable, args: tuple) -> _Call:
+        self.current = _Call(func, args)
+        self.requests.put(self.current)
+        return self.current
+
+    def retire(self) -> None:
+        """Stops the thread once its current call returns, releasing a driver it created."""
+        self.requests.put(None)
+
+    def _serve(self) -> None:
+        while True:
+            call = self.requests.get()
+            if call is None:
+                break
+            try:
+                if self.driver is None:
+                    self.driver = self.factory()
+                    self.owns_driver = True
+                call.result = call.func(self.driver, *call.args)
+            except Exception as e:
+                call.error = e
+            call.done.set()
+        if self.release and self.owns_driver and self.driver is not None:
+            try:
+                self.release(self.driver)
+            except Exception as e:
+                logger.warning(f"Failed to release driver {self.thread.name}: {e}")
+
+
+class DriverGuard:
+    def __init__(self, name: str, driver: Any, timeout: Optional[float],
+                 factory: Optional[Callable[[], Any]] = None, release: Optional[Callable[[Any], None]] = None,
+                 max_misses: int = 3, max_stuck: int = 2):
+        """
+        Runs driver calls on a worker thread and gives up waiting after `timeout` seconds, so
+        a read that hangs in the hardware (a DHT22 that never answers, an echo pin that never
+        toggles) costs the caller at most the deadline and raises ReadTimeout.
+
+        While a timed-out call is still blocked, further calls fail fast without touching the
+        driver. After `max_misses` consecutive misses the watchdog recycles the instance: the
+        blocked worker is abandoned, and the next call builds a fresh driver with `factory` on a
+        new thread. An abandoned worker releases its driver with `release` if and when its call
+        returns. Python cannot kill a thread, so at most `max_stuck` abandoned workers may still
+        be blocked; beyond that calls keep failing fast until one of them returns.
+
+        :param name: Label for logs, thread names and metrics.
+        :param driver: The driver instance to start with, owned by the caller.
+        :param timeout: Deadline per call in seconds; None calls the driver directly.
+        :param factory: Builds a replacement driver; without one the instance is never recycled.
+        :param release: Frees the hardware held by a replaced driver.
+        """
+        self.name = name
+        self.timeout = timeout
+        self.factory = factory
+        self.release = release
+        self.max_misses = max_misses
+        self.max_stuck = max_stuck
+        self.misses = 0
+        self.timeouts = 0
+        self.recycles = 0
+        self._driver = driver
+        self._worker: Optional[_Worker] = None
+        self._abandoned: List[_Worker] = []
+
+    def call(self, func: Callable[..., Any], *args) -> Any:
+        """Returns func(driver, *args), raising ReadTimeout if it misses the deadline."""
+        if self.timeout is None:
+            return func(self._driver, *args)
+
+        if self._worker is None:
+            self._worker = _Worker(self.name, self._driver, self.factory, self.release)
+        if self._worker.blocked:
+            self._missed()
+            raise ReadTimeout(f"{self.name} is still blocked in a previous call")
+
+        pending = self._worker.submit(func, args)
+        if not pending.done.wait(self.timeout):
+            self._missed()
+            raise ReadTimeout(f"{self.name} did not answer within {self.timeout:g}s")
+        self.misses = 0
+        if pending.error is not None:
+            raise pending.error
+        return pending.result
+
+    def close(self) -> None:
+        """Stops the worker thread; a blocked one exits when its call returns."""
+        if self._worker:
+            self._worker.retire()
+            self._worker = None
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            'timeouts': self.timeouts,
+            'recycles': self.recycles,
+            'stuck': self._stuck(),
+        }
+
+    def _missed(self) -> None:
+        self.misses += 1
+        self.timeouts += 1
+        TIMEOUTS.labels(self.name).inc()
+        if self.factory is None or self.misses < self.max_misses:
+            return
+        stuck = self._stuck()
+        if stuck >= self.max_stuck:
+            if self.misses == self.max_misses:
+                logger.error(f"{self.name} keeps missing deadlines but {stuck} replaced instance(s) are still blocked, not recycling.")
+            return
+        logger.warning(f"Recycling {self.name} after {self.misses} consecutive missed deadlines.")
+        self._worker.retire()
+        self._abandoned.append(self._worker)
+        # The next call creates the replacement on a new thread, under the deadline like any read
+        self._driver = None
+        self._worker = None
+        self.misses = 0
+        self.recycles += 1
+        RECYCLED.labels(self.name).inc()
+        self._stuck()
+
+    def _stuck(self) -> int:
+        self._abandoned = [worker for worker in self._abandoned if worker.blocked]
+        STUCK.labels(self.name).set(len(self._abandoned))
+        return len(self._abandoned)
@@ -0,0 +1,324 @@
+"""
+Micro-benchmarks for the sensor and actuator drivers, on the real hardware or on the simulated
+backends in app.sensors.simulated:
+
+    python -m app.sensors.bench ultrasonic --seconds 10
+    python -m app.sensors.bench ph --simulated --output ph.json
+    python -m app.sensors.bench compare pi4-*.json pi3-*.json
+
+Each run calls one driver operation back to back (or every --interval seconds) and reports the
+sustainable sample rate, the per-call latency distribution, the error rate and the CPU time
+spent, as JSON, tagged with the board and the code revision so runs can be compared.
+"""
+import argparse
+import contextlib
+import json
+import os
+import platform
+import socket
+import subprocess
+import sys
+import time
+from datetime import datetime
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Tuple
+
+
+class Op(NamedTuple):
+    call: Callable[[], Any]
+    # Sensors return a reading, None means the read failed; actuators return nothing
+    returns_value: bool = True
+
+
+################################################################################
+# Drivers
+################################################################################
+
+def _ultrasonic(args) -> Tuple[Dict[str, Op], Callable[[], None]]:
+    from .ultrasonic import UltrasonicSensor
+    sensor = UltrasonicSensor(trig_pin=args.trig, echo_pin=args.echo)
+    return {'ping': Op(sensor.get_distance), 'median': Op(sensor.get_median_distance)}, sensor.cleanup
+
+
+def _ph(args):
+    from .ph_sensor import SensorReader
+    reader = SensorReader(bus=args.bus, device=args.device)
+    return {
+        'ph': Op(reader.read_ph),
+        'temperature': Op(reader.read_temperature),
+        'channel': Op(lambda: reader.read_channel(args.channel)),
+    }, reader.cleanup
+
+
+def _dht22(args):
+    from .dht22 import DHT22Sensor
+    sensor = DHT22Sensor()
+    return {'temperature': Op(sensor.read_temperature), 'humidity': Op(sensor.read_humidity)}, sensor.cleanup
+
+
+def _bh1750(args):
+    from .light_sensor import LightSensor
+    sensor = LightSensor(bus_number=args.bus, address=args.address)
+    sensor.power_on()
+    return {'light': Op(sensor.read_light)}, sensor.power_down
+
+
+def _ds18b20(args):
+    from .tank_temperature import TemperatureMonitor
+    sensors = TemperatureMonitor().sensors
+    if args.sensor:
+        sensors = [sensor for sensor in sensors if sensor.sensor_id == args.sensor]
+    if not sensors:
+        raise SystemExit("No DS18B20 found" + (f" with ID {args.sensor}" if args.sensor else ''))
+    return {'read': Op(sensors[0].read_temp)}, lambda: None
+
+
+def _relay(args):
+    import RPi.GPIO as GPIO
+    from .relay import RelayController
+    from app.engine.snapshot import RelayConfig
+    controller = RelayController(relays={1: RelayConfig(1, 'bench', args.gpio, 'manual')})
+    controller.setup_gpio()
+    state = {'on': False}
+
+    def toggle():
+        state['on'] = not state['on']
+        controller.control_relay(1, state['on'])
+
+    return {'toggle': Op(toggle, returns_value=False)}, lambda: GPIO.cleanup(args.gpio)
+
+
+def _pump(args):
+    import RPi.GPIO as GPIO
+    from .pump import PumpActivator
+    pump = PumpActivator(args.gpio)
+    return {'run': Op(lambda: pump.run_pump(duration=args.duration), returns_value=False)}, lambda: GPIO.cleanup(args.gpio)
+
+
+def _camera(args):
+    from .camera import CameraCapture
+    camera = CameraCapture()
+    return {'jpeg': Op(camera.capture_jpeg), 'frame': Op(camera.capture_frame)}, camera.cleanup
+
+
+# Subcommand -> (setup, default operation, help)
+DRIVERS = {
+    'ultrasonic': (_ultrasonic, 'ping', "HC-SR04 distance (GPIO trigger/echo)"),
+    'ph': (_ph, 'ph', "pH probe and LM35 through the MCP3008 ADC (SPI)"),
+    'dht22': (_dht22, 'temperature', "DHT22 air temperature/humidity"),
+    'bh1750': (_bh1750, 'light', "BH1750 light sensor (I2C)"),
+    'ds18b20': (_ds18b20, 'read', "DS18B20 tank temperature (1-Wire)"),
+    'relay': (_relay, 'toggle', "relay GPIO switching"),
+    'pump': (_pump, 'run', "pump activation"),
+    'camera': (_camera, 'jpeg', "USB camera capture and JPEG encoding"),
+}
+
+# The DHT22 library hands back its cached reading for two seconds after each read
+DEFAULT_INTERVALS = {'dht22': 2.0}
+
+
+################################################################################
+# Measurement
+################################################################################
+
+def _percentile(ordered: List[float], fraction: float) -> float:
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def measure(op: Op, seconds: float, count: Optional[int] = None, interval: float = 0.0,
+            warmup: int = 3) -> Dict[str, Any]:
+    """
+    Calls the operation for `seconds` (or `count` calls), every `interval` seconds or back to back.
+    """
+    for _ in range(warmup):
+        try:
+            op.call()
+        except Exception:
+            pass
+
+    latencies = []
+    errors = 0
+    missing = 0
+    last_error = None
+    cpu = 0.0
+    start = time.perf_counter()
+    deadline = start + seconds
+    next_call = start
+    while time.perf_counter() < deadline and (count is None or len(latencies) < count):
+        if interval:
+            delay = next_call - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            next_call += interval
+        cpu_start = time.process_time()
+        call_start = time.perf_counter()
+        try:
+            value = op.call()
+            if op.returns_value and value is None:
+                missing += 1
+        except Exception as e:
+            errors += 1
+            last_error = f"{type(e).__name__}: {e}"
+        latencies.append(time.perf_counter() - call_start)
+        cpu += time.process_time() - cpu_start
+    wall = time.perf_counter() - start
+
+    calls = len(latencies)
+    good = calls - errors - missing
+    ordered = sorted(latencies)
+    busy = sum(latencies)
+    return {
+        'calls': calls,
+        'seconds': round(wall, 3),
+        'samples_per_second': round(good / wall, 3) if wall else 0.0,
+        # Back to back, this is the highest rate the driver sustains
+        'calls_per_second': round(calls / wall, 3) if wall else 0.0,
+        'latency_ms': {
+            'min': round(ordered[0] * 1000, 4) if ordered else 0.0,
+            'p50': round(_percentile(ordered, 0.50) * 1000, 4),
+            'p90': round(_percentile(ordered, 0.90) * 1000, 4),
+            'p99': round(_percentile(ordered, 0.99) * 1000, 4),
+            'max': round(ordered[-1] * 1000, 4) if ordered else 0.0,
+            'mean': round(busy / calls * 1000, 4) if calls else 0.0,
+        },
+        'errors': errors,
+        'missing': missing,
+        'error_rate': round((errors + missing) / calls, 5) if calls else 0.0,
+        'last_error': last_error,
+        'cpu_seconds': round(cpu, 4),
+        'cpu_ms_per_call': round(cpu / calls * 1000, 4) if calls else 0.0,
+        # CPU time over the time spent inside the driver: ~1 for busy-waiting, ~0 for blocking I/O
+        'cpu_per_busy_second': round(cpu / busy, 3) if busy else 0.0,
+    }
+
+
+def _board() -> str:
+    try:
+        with open('/proc/device-tree/model') as file:
+            return file.read().strip('\x00\n ')
+    except OSError:
+        return platform.machine()
+
+
+def _revision() -> Optional[str]:
+    root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    try:
+        return subprocess.run(['git', 'describe', '--always', '--dirty'], cwd=root, capture_output=True,
+                              text=True, timeout=5).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def run(args) -> Dict[str, Any]:
+    sim = None
+    if args.simulated:
+        from . import simulated
+        sim = simulated.install(error_rate=args.error_rate, seed=args.seed)
+
+    setup, default_op, _ = DRIVERS[args.driver]
+    op_name = args.op or default_op
+    interval = args.interval if args.interval is not None else DEFAULT_INTERVALS.get(args.driver, 0.0)
+    # Drivers print and log their read errors, keep them off the JSON on stdout
+    with contextlib.redirect_stdout(sys.stderr):
+        ops, cleanup = setup(args)
+        if op_name not in ops:
+            raise SystemExit(f"Unknown operation '{op_name}' for {args.driver}, expected one of {sorted(ops)}")
+        try:
+            result = measure(ops[op_name], args.seconds, args.count, interval, args.warmup)
+        finally:
+            cleanup()
+            if sim:
+                sim.close()
+
+    return {
+        'driver': args.driver,
+        'op': op_name,
+        'backend': 'simulated' if args.simulated else 'hardware',
+        'board': _board(),
+        'host': socket.gethostname(),
+        'python': platform.python_version(),
+        'revision': _revision(),
+        'time': datetime.now().isoformat(timespec='seconds'),
+        'interval': interval,
+        **result,
+    }
+
+
+################################################################################
+# Comparison
+################################################################################
+
+def compare(paths: List[str]) -> str:
+    """Lines up saved results, one row per run."""
+    rows = []
+    for path in paths:
+        with open(path) as file:
+            data = json.load(file)
+        rows.extend(data if isinstance(data, list) else [data])
+    header = (f"{'driver':<11}{'op':<12}{'backend':<10}{'board':<28}{'revision':<14}"
+              f"{'samples/s':>11}{'p50 ms':>10}{'p99 ms':>10}{'errors':>9}{'cpu ms':>9}")
+    lines = [header]
+    for row in sorted(rows, key=lambda row: (row['driver'], row['op'], row['board'], row.get('revision') or '')):
+        lines.append(
+            f"{row['driver']:<11}{row['op']:<12}{row['backend']:<10}{row['board'][:27]:<28}{(row.get('revision') or '-')[:13]:<14}"
+            f"{row['samples_per_second']:>11.1f}{row['latency_ms']['p50']:>10.3f}{row['latency_ms']['p99']:>10.3f}"
+            f"{row['error_rate']:>9.2%}{row['cpu_ms_per_call']:>9.3f}"
+        )
+    return '\n'.join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark sensor and actuator drivers.")
+    commands = parser.add_subparsers(dest='driver', required=True)
+
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument('--simulated', action='store_true', help="use the simulated hardware backends")
+    common.add_argument('--op', help="driver operation to call (default depends on the driver)")
+    common.add_argument('--seconds', type=float, default=5.0, help="how long to run")
+    common.add_argument('--count', type=int, help="stop after this many calls")
+    common.add_argument('--interval', type=float,
+                        help="seconds between call starts (default: back to back, 2 for dht22)")
+    common.add_argument('--warmup', type=int, default=3, help="calls made before measuring")
+    common.add_argument('--error-rate', type=float, help="simulated failure probability (default: per device)")
+    common.add_argument('--seed', type=int, help="seed for the simulated noise and failures")
+    common.add_argument('--output', help="write the JSON result here instead of stdout")
+
+    for name, (_, default_op, help_text) in DRIVERS.items():
+        sub = commands.add_parser(name, parents=[common], help=help_text)
+        if name == 'ultrasonic':
+            sub.add_argument('--trig', type=int, default=18)
+            sub.add_argument('--echo', type=int, default=15)
+        elif name == 'ph':
+            sub.add_argument('--bus', type=int, default=0)
+            sub.add_argument('--device', type=int, default=0)
+            sub.add_argument('--channel', type=int, default=0, help="ADC channel for --op channel")
+        elif name == 'bh1750':
+            sub.add_argument('--bus', type=int, default=1)
+            sub.add_argument('--address', type=lambda text: int(text, 0), default=0x23)
+        elif name == 'ds18b20':
+            sub.add_argument('--sensor', help="1-Wire ID, default: the first one found")
+        elif name == 'relay':
+            sub.add_argument('--gpio', type=int, default=26)
+        elif name == 'pump':
+            sub.add_argument('--gpio', type=int, default=16)
+            sub.add_argument('--duration', type=float, default=0.0, help="seconds the pump stays on per call")
+
+    compare_parser = commands.add_parser('compare', help="tabulate saved JSON results")
+    compare_parser.add_argument('paths', nargs='+')
+
+    args = parser.parse_args()
+    if args.driver == 'compare':
+        print(compare(args.paths))
+        return
+
+    result = json.dumps(run(args), indent=2)
+    if args.output:
+        with open(args.output, 'w') as file:
+            file.write(result + '\n')
+    else:
+        print(result)
+
+
+if __name__ == "__main__":
+    main()
@@ -4,18 +4,40 @@ import requests
 import time
 import io
 
+API_URL = "https://lettuce.ebasura.online/api/detect"
+
+
+def upload_image(jpeg: bytes, api_url: str = API_URL) -> bool:
+    """
+    Sends an encoded JPEG to the detection API.
+    :return: True if the API processed it.
+    """
+    timestamp = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    try:
+        response = requests.post(api_url, files={'file': ('image.jpg', jpeg)})
+    except requests.exceptions.RequestException as e:
+        print(f"[{timestamp}] Error sending image to API: {e}")
+        return False
+
+    if response.status_code == 200:
+        print(f"[{timestamp}] Image processed successfully. Annotated image received.")
+        return True
+    print(f"[{timestamp}] API Error: {response.status_code} - {response.text}")
+    return False
+
+
 class CameraCapture:
-    def __init__(self):
+    def __init__(self, camera_index=0, jpeg_quality=None):
         """
         Initializes the CameraCapture instance.
 
-        :param api_url: The URL of the API to send images to.
-        :param capture_interval: Time interval (in seconds) between captures.
         :param camera_index: Index of the camera to use.
+        :param jpeg_quality: JPEG quality from 0 to 100, OpenCV's default (95) if None.
         """
-        self.api_url = "https://lettuce.ebasura.online/api/detect"
+        self.api_url = API_URL
         self.capture_interval = 14400
-        self.camera_index = 0
+        self.camera_index = camera_index
+        self.encode_params = [cv2.IMWRITE_JPEG_QUALITY, int(jpeg_quality)] if jpeg_quality is not None else []
         self.camera = cv2.VideoCapture(self.camera_index)
 
         if not self.camera.isOpened():
@@ -38,19 +60,18 @@ class CameraCapture:
         :param image: The image to send.
         """
         _, buffer = cv2.imencode('.jpg', image)
-        image_bytes = io.BytesIO(buffer)
-        timestamp = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        upload_image(io.BytesIO(buffer).getvalue(), self.api_url)
 
-        try:
-            response = requests.post(self.api_url, files={'file': ('image.jpg', image_bytes.getvalue())})
-        except requests.exceptions.RequestException as e:
-            print(f"[{timestamp}] Error sending image to API: {e}")
-            return
-
-        if response.status_code == 200:
-            print(f"[{timestamp}] Image processed successfully. Annotated image received.")
-        else:
-            print(f"[{timestamp}] API Error: {response.status_code} - {response.text}")
+    def capture_jpeg(self):
+        """
+        Captures a frame and encodes it as JPEG.
+        :return: JPEG bytes or None if capture fails.
+        """
+        frame = self.capture_frame()
+        if frame is None:
+            return None
+        ok, buffer = cv2.imencode('.jpg', frame, self.encode_params)
+        return buffer.tobytes() if ok else None
 
     def start(self):
         """
@@ -76,3 +97,34 @@ class CameraCapture:
         print("Camera released.")
 
 
+class StreamSnapshot:
+    def __init__(self, url, timeout=8.0):
+        """
+        Camera driver for when the preview stream owns the camera: takes the stream's latest
+        frame instead of opening the device itself.
+
+        :param url: The stream's /snapshot.jpg URL.
+        :param timeout: Seconds to wait for the frame.
+        """
+        self.url = url
+        self.timeout = timeout
+
+    def capture_jpeg(self):
+        """
+        Fetches the stream's current frame.
+        :return: JPEG bytes or None if the stream has no frame.
+        """
+        try:
+            response = requests.get(self.url, timeout=self.timeout)
+        except requests.exceptions.RequestException as e:
+            print(f"Error fetching frame from the camera stream: {e}")
+            return None
+        if response.status_code != 200:
+            print(f"Camera stream error: {response.status_code} - {response.text}")
+            return None
+        return response.content
+
+    def cleanup(self):
+        """
+        Nothing to release, the stream owns the camera.
+        """
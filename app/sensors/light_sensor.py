@@ -18,9 +18,11 @@ class LightSensor:
     def __init__(self, bus_number=1, address=DEVICE):
         self.device_address = address
         self.bus = smbus.SMBus(bus_number)  # Initialize the bus (usually bus 1 for Raspberry Pi)
+        self.last_raw = None  # 16-bit count behind the last converted reading
 
     def convert_to_number(self, data):
-        result = (data[1] + (256 * data[0])) / 1.2  # Convert the raw data into light level
+        self.last_raw = data[1] + (256 * data[0])
+        result = self.last_raw / 1.2  # Convert the raw data into light level
         return result
 
     def read_light(self, mode=ONE_TIME_HIGH_RES_MODE_1):
@@ -6,6 +6,7 @@ class SensorReader:
         self.spi = spidev.SpiDev()
         self.spi.open(bus, device) 
         self.spi.max_speed_hz = max_speed_hz
+        self.last_raw = None  # ADC count behind the last converted reading
     
     def read_channel(self, channel):
         """Read from the given channel (0-7)"""
@@ -19,6 +20,7 @@ class SensorReader:
     def read_ph(self):
         """Read from the pH sensor (connected to channel 0)"""
         pH_value = self.read_channel(0)
+        self.last_raw = pH_value
         
         voltage = (pH_value / 1023.0) * 3.3
         # print(f"pH ADC Value: {pH_value}")
@@ -32,6 +34,7 @@ class SensorReader:
     def read_temperature(self):
         """Read from the temperature sensor (LM35, connected to channel 1)"""
         temp_value = self.read_channel(1)
+        self.last_raw = temp_value
         
         voltage = (temp_value / 1023.0) * 3.3
         temperature = voltage * 100
@@ -2,6 +2,13 @@ import RPi.GPIO as GPIO
 import time
 import logging
 from app.engine import db
+from app.engine.arbiter import ResourceBusy
+from app.engine.metrics import registry
+
+logger = logging.getLogger(__name__)
+
+POLL_SECONDS = registry.histogram('relay_poll_seconds', 'Time spent fetching and applying relay states')
+POLL_ERRORS = registry.counter('relay_poll_errors_total', 'Relay polls that failed')
 
 # Constants for GPIO Modes and Relay States
 GPIO_MODE = GPIO.BCM
@@ -11,11 +18,41 @@ RELAY_STATUS_ON = 1
 RELAY_STATUS_OFF = 0
 
 class RelayController:
-    def __init__(self):
+    def __init__(self, owns=None, relays=None, arbiter=None):
+        """
+        :param owns: Called with a relay ID, returns whether this node drives it (default: all relays).
+        :param relays: Relay ID -> RelayConfig from a configuration snapshot; loaded from the
+                       database when not given.
+        :param arbiter: HardwareArbiter to claim each relay's pin from, so a relay never drives
+                        a pin a sensor process already drives (e.g. a pump on the same GPIO).
+        """
         self.RELAY_PINS = {}
         self.RELAY_NAMES = {}
         self.RELAY_CONTROL_MODES = {}
-        self.load_relay_config()
+        self.owns = owns or (lambda relay_id: True)
+        self.ready_pins = set()
+        self.arbiter = arbiter
+        # Pin -> relay ID holding its claim, and pins refused to a relay (logged once)
+        self.claimed_pins = {}
+        self.refused_pins = set()
+        if relays is None:
+            self.load_relay_config()
+        else:
+            self.apply_config(relays)
+
+    def apply_config(self, relays):
+        """Takes relay names, pins and modes from a configuration snapshot."""
+        self.RELAY_PINS = {relay_id: relay.gpio for relay_id, relay in relays.items()}
+        self.RELAY_NAMES = {relay_id: relay.name for relay_id, relay in relays.items()}
+        self.RELAY_CONTROL_MODES = {relay_id: relay.control_mode for relay_id, relay in relays.items()}
+        # A pin no longer used by the relay that claimed it is given up
+        for pin, relay_id in list(self.claimed_pins.items()):
+            if self.RELAY_PINS.get(relay_id) != pin:
+                self.arbiter.release(f"gpio:{pin}")
+                del self.claimed_pins[pin]
+                self.ready_pins.discard(pin)
+        # A relay moved to another pin is set up again on first use
+        self.ready_pins &= set(self.RELAY_PINS.values())
 
     def load_relay_config(self):
         """Load relay configuration from the database."""
@@ -33,28 +70,66 @@ class RelayController:
                     self.RELAY_NAMES[relay_id] = relay[1]
                     self.RELAY_PINS[relay_id] = relay[2]
                     self.RELAY_CONTROL_MODES[relay_id] = relay[4]
-                logging.info("Relay configuration loaded from database")
+                logger.info("Relay configuration loaded from database")
             else:
-                logging.warning("No relay configuration found in the database")
+                logger.warning("No relay configuration found in the database")
         except Exception as e:
-            logging.error(f"Error loading relay configuration: {e}")
+            logger.error(f"Error loading relay configuration: {e}")
 
     def setup_gpio(self):
         """Initialize GPIO pins for relays."""
         GPIO.setmode(GPIO_MODE)
+        for relay_id in self.RELAY_PINS:
+            if self.owns(relay_id):
+                self.setup_pin(relay_id)
+
+    def setup_pin(self, relay_id):
+        """
+        Initialize one relay's pin, relays taken over from another node are set up on first use.
+        Returns False if the pin is claimed by someone else, it is tried again on the next use.
+        """
+        pin = self.RELAY_PINS[relay_id]
+        if self.arbiter:
+            try:
+                self.arbiter.claim(f"gpio:{pin}", f"relay:{relay_id}")
+            except ResourceBusy as e:
+                if pin not in self.refused_pins:
+                    logger.error(f"Not driving {self.RELAY_NAMES[relay_id]} (relay {relay_id}): {e}")
+                    self.refused_pins.add(pin)
+                return False
+            self.claimed_pins[pin] = relay_id
+            self.refused_pins.discard(pin)
+        GPIO.setup(pin, GPIO.OUT)
+        GPIO.output(pin, GPIO_OFF)
+        self.ready_pins.add(pin)
+        logger.info(f"Initialized {self.RELAY_NAMES[relay_id]} on GPIO{pin}")
+        return True
+
+    def release_unowned(self):
+        """
+        Switches off and gives up the pins of relays this node no longer owns, e.g. after its
+        lease ran out, so a relay is never left ON by a node that stopped driving it.
+        """
         for relay_id, pin in self.RELAY_PINS.items():
-            GPIO.setup(pin, GPIO.OUT)
+            if pin not in self.ready_pins or self.owns(relay_id):
+                continue
             GPIO.output(pin, GPIO_OFF)
-            logging.info(f"Initialized {self.RELAY_NAMES[relay_id]} on GPIO{pin}")
+            self.ready_pins.discard(pin)
+            if self.claimed_pins.get(pin) == relay_id:
+                self.arbiter.release(f"gpio:{pin}")
+                del self.claimed_pins[pin]
+            logger.info(f"Relay {relay_id} ({self.RELAY_NAMES[relay_id]}) switched OFF, this node no longer drives it")
 
     def control_relay(self, relay_id, status):
         """Control a single relay."""
         pin = self.RELAY_PINS.get(relay_id)
         if pin is not None:
+            if pin not in self.ready_pins and not self.setup_pin(relay_id):
+                return
             GPIO.output(pin, GPIO_ON if status else GPIO_OFF)
-            logging.info(f"Relay {relay_id} ({self.RELAY_NAMES[relay_id]}) set to {'ON' if status else 'OFF'}")
+            logger.info(f"Relay {relay_id} ({self.RELAY_NAMES[relay_id]}) set to {'ON' if status else 'OFF'}")
         else:
-            logging.error(f"GPIO pin for relay {relay_id} not found")
+            logger.error(f"GPIO pin for relay {relay_id} not found")
 
     def fetch_and_update_relays(self):
         """Fetch relay statuses from the database and update GPIO pins."""
@@ -66,42 +141,52 @@ class RelayController:
 
         """
         
+        start = time.perf_counter()
         try:
             relays = db.fetch_all(query)
             if not relays:
-                logging.warning("No relays found in database")
+                logger.warning("No relays found in database")
                 return
 
-            logging.info("\nCurrent Relay States:")
-            logging.info("-" * 50)
-            logging.info("ID | Name   | Status | Mode     | GPIO")
-            logging.info("-" * 50)
+            logger.debug("\nCurrent Relay States:")
+            logger.debug("-" * 50)
+            logger.debug("ID | Name   | Status | Mode     | GPIO")
+            logger.debug("-" * 50)
 
             for relay in relays:
                 relay_id, relay_name, gpio, status, control_mode = relay
 
-                logging.info(f"{relay_id:2d} | {relay_name:6s} | {('ON' if status else 'OFF'):6s} | {control_mode:8s} | GPIO{gpio}")
+                logger.debug(f"{relay_id:2d} | {relay_name:6s} | {('ON' if status else 'OFF'):6s} | {control_mode:8s} | GPIO{gpio}")
 
-                # Update relay status only for manual control mode
-                if control_mode.lower() == 'manual':
+                # Update relay status only for manual control mode, and only relays this node owns
+                if control_mode.lower() == 'manual' and self.owns(relay_id):
                     self.control_relay(relay_id, bool(status))
 
-            logging.info("-" * 50)
+            logger.debug("-" * 50)
 
         except Exception as e:
-            logging.error(f"Database error: {e}")
+            POLL_ERRORS.inc()
+            logger.error(f"Database error: {e}")
+        finally:
+            POLL_SECONDS.observe(time.perf_counter() - start)
 
-    def run(self):
-        """Main loop to control relays."""
+    def run(self, on_poll=None):
+        """
+        Main loop to control relays.
+        :param on_poll: Called before every poll, e.g. to re-evaluate node ownership.
+        """
         self.setup_gpio() 
         
         try:
             while True:
+                if on_poll:
+                    on_poll()
+                self.release_unowned()
                 self.fetch_and_update_relays()
                 time.sleep(1)
         except KeyboardInterrupt:
             GPIO.cleanup()
-            logging.info("\nProgram terminated by user")
+            logger.info("\nProgram terminated by user")
         except Exception as e:
             GPIO.cleanup()
-            logging.error(f"Unexpected error: {e}")
+            logger.error(f"Unexpected error: {e}")
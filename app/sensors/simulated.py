@@ -0,0 +1,385 @@
+"""
+Stand-ins for the hardware libraries the drivers import (RPi.GPIO, spidev, smbus, adafruit_dht,
+board, cv2) and for the 1-Wire sysfs tree, so the drivers in app.sensors run unchanged on a
+machine without the hardware.
+
+Bus and pin timings follow the parts on the board: an MCP3008 on SPI, a BH1750 on I2C at
+100 kHz, the HC-SR04 echo pulse, the DHT22's 2 s minimum read interval and the DS18B20's
+750 ms conversion. Each device fails at a configurable rate the way the real one does
+(DHT22 checksum errors, I2C NACKs, lost echoes, CRC failures).
+
+Call install() before the driver modules are imported.
+"""
+import os
+import random
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import types
+from typing import Dict, Optional
+
+SPEED_OF_SOUND = 34300  # cm/s
+DEFAULT_ERROR_RATES = {
+    'gpio': 0.0,
+    'ultrasonic': 0.0,
+    'spi': 0.0,
+    'i2c': 0.0,
+    'dht22': 0.05,
+    'w1': 0.02,
+    'camera': 0.0,
+}
+
+
+class Simulation:
+    def __init__(self, error_rate: Optional[float] = None, seed: Optional[int] = None):
+        """
+        Shared state of the simulated devices.
+        :param error_rate: Failure probability for every device, default: per-device rates.
+        """
+        self.random = random.Random(seed)
+        self.error_rates = {device: rate if error_rate is None else error_rate
+                            for device, rate in DEFAULT_ERROR_RATES.items()}
+        self.w1_dir: Optional[str] = None
+        self._w1_thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+
+    def fails(self, device: str) -> bool:
+        return self.random.random() < self.error_rates[device]
+
+    def noise(self, value: float, spread: float) -> float:
+        return value + self.random.gauss(0, spread)
+
+    def close(self) -> None:
+        self._stop.set()
+        if self._w1_thread:
+            self._w1_thread.join()
+        if self.w1_dir:
+            shutil.rmtree(self.w1_dir, ignore_errors=True)
+
+
+################################################################################
+# RPi.GPIO
+################################################################################
+
+def _gpio_module(sim: Simulation) -> types.ModuleType:
+    gpio = types.ModuleType('RPi.GPIO')
+    gpio.BCM, gpio.BOARD = 11, 10
+    gpio.OUT, gpio.IN = 0, 1
+    gpio.LOW, gpio.HIGH = 0, 1
+    gpio.PUD_UP, gpio.PUD_DOWN, gpio.PUD_OFF = 22, 21, 20
+    state = {'mode': None, 'pins': {}, 'echo': (0.0, 0.0), 'trig': None}
+    gpio._state = state
+
+    def setmode(mode):
+        state['mode'] = mode
+
+    def setwarnings(flag):
+        pass
+
+    def setup(pin, direction, pull_up_down=None, initial=None):
+        if state['mode'] is None:
+            raise RuntimeError("Please set pin numbering mode using GPIO.setmode(GPIO.BOARD) or GPIO.setmode(GPIO.BCM)")
+        state['pins'][pin] = {'direction': direction, 'level': initial or 0}
+
+    def output(pin, value):
+        pin_state = state['pins'].get(pin)
+        if pin_state is None or pin_state['direction'] != gpio.OUT:
+            raise RuntimeError("The GPIO channel has not been set up as an OUTPUT")
+        level = 1 if value else 0
+        # A falling edge on a trigger pin starts an HC-SR04 ping: the echo pin goes high
+        # ~400 us later for the round trip time of the (simulated) distance
+        if pin_state['level'] and not level and state['trig'] in (None, pin):
+            state['trig'] = pin
+            now = time.time()
+            if sim.fails('ultrasonic'):
+                state['echo'] = (float('inf'), float('inf'))
+            else:
+                distance = max(2.0, sim.noise(25.0, 0.3))
+                start = now + 0.0004
+                state['echo'] = (start, start + 2 * distance / SPEED_OF_SOUND)
+        pin_state['level'] = level
+
+    def input(pin):
+        pin_state = state['pins'].get(pin)
+        if pin_state is None:
+            raise RuntimeError("You must setup() the GPIO channel first")
+        if pin_state['direction'] == gpio.OUT:
+            return pin_state['level']
+        start, end = state['echo']
+        return 1 if start <= time.time() < end else 0
+
+    def cleanup(pins=None):
+        if pins is None:
+            state['pins'].clear()
+            state['mode'] = None
+        else:
+            for pin in (pins if isinstance(pins, (list, tuple)) else [pins]):
+                state['pins'].pop(pin, None)
+
+    class PWM:
+        def __init__(self, pin, frequency):
+            self.pin = pin
+            self.frequency = frequency
+
+        def start(self, duty_cycle):
+            self.duty_cycle = duty_cycle
+
+        def ChangeDutyCycle(self, duty_cycle):
+            self.duty_cycle = duty_cycle
+
+        def stop(self):
+            pass
+
+    for function in (setmode, setwarnings, setup, output, input, cleanup):
+        setattr(gpio, function.__name__, function)
+    gpio.PWM = PWM
+    return gpio
+
+
+################################################################################
+# spidev (MCP3008)
+################################################################################
+
+def _spidev_module(sim: Simulation) -> types.ModuleType:
+    spidev = types.ModuleType('spidev')
+    # Channel -> (ADC counts, noise): pH probe output and an LM35 at ~25 C
+    levels = {0: (560.0, 1.5), 1: (78.0, 0.7)}
+
+    class SpiDev:
+        def __init__(self):
+            self.max_speed_hz = 500000
+            self.mode = 0
+            self.opened = False
+
+        def open(self, bus, device):
+            self.opened = True
+
+        def xfer2(self, data):
+            if not self.opened:
+                raise OSError(9, "Bad file descriptor")
+            # Bits on the wire plus the ioctl round trip
+            time.sleep(len(data) * 8 / self.max_speed_hz + 0.00002)
+            if sim.fails('spi'):
+                return [0xff] * len(data)
+            channel = (data[1] >> 4) & 7
+            counts = levels.get(channel, (0.0, 0.5))
+            value = min(1023, max(0, int(round(sim.noise(*counts)))))
+            return [0, (value >> 8) & 3, value & 0xff]
+
+        def close(self):
+            self.opened = False
+
+    spidev.SpiDev = SpiDev
+    return spidev
+
+
+################################################################################
+# smbus (BH1750)
+################################################################################
+
+def _smbus_module(sim: Simulation) -> types.ModuleType:
+    smbus = types.ModuleType('smbus')
+
+    def transfer(byte_count: int) -> None:
+        # Address, command and data bytes at 100 kHz, 9 clocks each
+        time.sleep((byte_count + 2) * 9 / 100000)
+        if sim.fails('i2c'):
+            raise OSError(121, "Remote I/O error")
+
+    class SMBus:
+        def __init__(self, bus=None):
+            self.bus = bus
+
+        def read_i2c_block_data(self, address, command, length=32):
+            transfer(2)
+            raw = min(65535, max(0, int(sim.noise(12000, 40))))
+            return [raw >> 8, raw & 0xff] + [0] * (length - 2)
+
+        def write_byte(self, address, value):
+            transfer(1)
+
+        def close(self):
+            pass
+
+    smbus.SMBus = SMBus
+    return smbus
+
+
+################################################################################
+# adafruit_dht / board (DHT22)
+################################################################################
+
+def _dht_modules(sim: Simulation) -> Dict[str, types.ModuleType]:
+    board = types.ModuleType('board')
+    for pin in range(28):
+        setattr(board, f"D{pin}", pin)
+
+    adafruit_dht = types.ModuleType('adafruit_dht')
+
+    class DHT22:
+        def __init__(self, pin, use_pulseio=True):
+            self.pin = pin
+            self._last = 0.0
+            self._temperature = None
+            self._humidity = None
+
+        def measure(self):
+            # Like the library: at most one transfer every 2 s, cached values in between
+            if time.monotonic() - self._last < 2.0:
+                return
+            self._last = time.monotonic()
+            time.sleep(0.0052)  # 40 bits plus the start handshake
+            if sim.fails('dht22'):
+                raise RuntimeError("Checksum did not validate. Try again.")
+            self._temperature = round(sim.noise(24.5, 0.1), 1)
+            self._humidity = round(sim.noise(65.0, 0.5), 1)
+
+        @property
+        def temperature(self):
+            self.measure()
+            return self._temperature
+
+        @property
+        def humidity(self):
+            self.measure()
+            return self._humidity
+
+        def exit(self):
+            pass
+
+    adafruit_dht.DHT22 = DHT22
+    adafruit_dht.DHT11 = DHT22
+    return {'board': board, 'adafruit_dht': adafruit_dht}
+
+
+################################################################################
+# cv2 (USB camera)
+################################################################################
+
+def _camera_module(sim: Simulation) -> types.ModuleType:
+    """
+    The real cv2 with a simulated VideoCapture when OpenCV is installed, so JPEG encoding
+    is measured for real; otherwise a minimal stand-in.
+    """
+    try:
+        import cv2
+    except ImportError:
+        cv2 = types.ModuleType('cv2')
+
+        def imencode(ext, frame, params=None):
+            import numpy as np
+            # Not a JPEG, roughly the size of one at default quality
+            return True, np.ascontiguousarray(frame[::4, ::4, 0]).reshape(-1)
+
+        cv2.imencode = imencode
+        cv2.CAP_PROP_FRAME_WIDTH, cv2.CAP_PROP_FRAME_HEIGHT, cv2.CAP_PROP_FPS = 3, 4, 5
+        cv2.IMWRITE_JPEG_QUALITY = 1
+
+    class VideoCapture:
+        def __init__(self, index, *args):
+            import numpy as np
+            self.index = index
+            self.opened = True
+            self.fps = 30.0
+            self.next_frame = time.monotonic()
+            # Smooth gradients compress like a real scene rather than noise
+            y, x = np.mgrid[0:480, 0:640]
+            self.base = np.stack([(x // 3) % 256, (y // 2) % 256, ((x + y) // 5) % 256], axis=2).astype(np.uint8)
+            self.count = 0
+
+        def isOpened(self):
+            return self.opened
+
+        def read(self):
+            # Frames arrive at the camera's rate, a read waits for the next one
+            now = time.monotonic()
+            if now < self.next_frame:
+                time.sleep(self.next_frame - now)
+            self.next_frame = max(now, self.next_frame) + 1 / self.fps
+            if not self.opened or sim.fails('camera'):
+                return False, None
+            self.count += 1
+            import numpy as np
+            return True, np.roll(self.base, self.count % 640, axis=1)
+
+        def set(self, prop, value):
+            if prop == getattr(cv2, 'CAP_PROP_FPS', 5):
+                self.fps = float(value)
+            return True
+
+        def get(self, prop):
+            return {3: 640.0, 4: 480.0, 5: self.fps}.get(prop, 0.0)
+
+        def release(self):
+            self.opened = False
+
+    cv2.VideoCapture = VideoCapture
+    return cv2
+
+
+################################################################################
+# 1-Wire sysfs (DS18B20)
+################################################################################
+
+def _w1_slave(temperature: float, valid: bool) -> str:
+    raw = int(round(temperature * 16)) & 0xffff
+    data = f"{raw & 0xff:02x} {raw >> 8:02x} 4b 46 7f ff 0c 10 1c"
+    return f"{data} : crc=1c {'YES' if valid else 'NO'}\n{data} t={int(round(temperature * 16)) * 1000 // 16}\n"
+
+
+def _start_w1(sim: Simulation, device_ids) -> str:
+    """
+    Creates a devices directory like /sys/bus/w1/devices and rewrites each w1_slave once per
+    750 ms conversion. Unlike the kernel file, reading it does not block for the conversion.
+    """
+    root = tempfile.mkdtemp(prefix='w1-')
+    temperatures = {device_id: 22.0 + index for index, device_id in enumerate(device_ids)}
+
+    def write_all():
+        for device_id, temperature in temperatures.items():
+            folder = os.path.join(root, device_id)
+            os.makedirs(folder, exist_ok=True)
+            path = os.path.join(folder, 'w1_slave')
+            with open(f"{path}.tmp", 'w') as file:
+                file.write(_w1_slave(sim.noise(temperature, 0.05), not sim.fails('w1')))
+            os.replace(f"{path}.tmp", path)
+
+    def convert():
+        while not sim._stop.wait(0.75):
+            write_all()
+
+    write_all()
+    sim._w1_thread = threading.Thread(target=convert, name="SimulatedW1", daemon=True)
+    sim._w1_thread.start()
+    return root
+
+
+################################################################################
+# Installation
+################################################################################
+
+def install(error_rate: Optional[float] = None, seed: Optional[int] = None,
+            w1_devices=('28-000000856211', '28-00000085aff4')) -> Simulation:
+    """
+    Registers the simulated libraries in sys.modules and points the DS18B20 driver at a
+    simulated devices directory. Must run before the driver modules are imported.
+    """
+    sim = Simulation(error_rate, seed)
+    gpio = _gpio_module(sim)
+    rpi = types.ModuleType('RPi')
+    rpi.GPIO = gpio
+    sys.modules.update({
+        'RPi': rpi,
+        'RPi.GPIO': gpio,
+        'spidev': _spidev_module(sim),
+        'smbus': _smbus_module(sim),
+        'cv2': _camera_module(sim),
+    })
+    sys.modules.update(_dht_modules(sim))
+
+    sim.w1_dir = _start_w1(sim, w1_devices)
+    from . import tank_temperature
+    tank_temperature.W1_DEVICES_DIR = sim.w1_dir
+    return sim
@@ -3,17 +3,22 @@ import glob
 import time
 import logging
 import threading
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Tuple
 
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger("SensorLogger")
 
+# Where the w1-therm kernel driver lists DS18B20 devices
+W1_DEVICES_DIR = '/sys/bus/w1/devices'
+# Re-reads of a conversion that failed its CRC check before the read is given up
+CRC_RETRIES = 3
+
 
 class TemperatureSensor:
     def __init__(self, sensor_id: str, tank_name: str):
         self.sensor_id = sensor_id
         self.tank_name = tank_name
-        self.device_folder = f"/sys/bus/w1/devices/{sensor_id}"
+        self.device_folder = os.path.join(W1_DEVICES_DIR, sensor_id)
+        self.last_raw: Optional[int] = None  # t= value (millidegrees) behind the last reading
 
     def read_temp_raw(self) -> Optional[List[str]]:
         """Read the raw data from the sensor."""
@@ -31,31 +36,43 @@ class TemperatureSensor:
 
     def read_temp(self) -> Optional[float]:
         """Parse the raw data and return the temperature in Celsius."""
+        temp_c, self.last_raw = self.read_temp_and_raw()
+        return temp_c
+
+    def read_temp_and_raw(self) -> Tuple[Optional[float], Optional[int]]:
+        """Returns (temperature in Celsius, t= millidegrees), (None, None) without a valid reading."""
         lines = self.read_temp_raw()
         if not lines:
-            return None
+            return None, None
 
-        # Wait for a valid reading
+        # Wait for a valid reading, a sensor that never passes the CRC check counts as missing
+        attempts = 0
         while lines[0].strip()[-3:] != 'YES':
+            attempts += 1
+            if attempts > CRC_RETRIES:
+                logger.warning(f"Sensor {self.sensor_id} failed the CRC check {attempts} times in a row.")
+                return None, None
             time.sleep(0.2)
             lines = self.read_temp_raw()
             if not lines:
-                return None
+                return None, None
 
         # Extract temperature value
         equals_pos = lines[1].find('t=')
         if equals_pos != -1:
             temp_string = lines[1][equals_pos + 2:]
             try:
-                temp_c = float(temp_string) / 1000.0
+                raw = int(temp_string)
+                temp_c = raw / 1000.0
                 if -50 <= temp_c <= 150:  # Validate temperature range
-                    return temp_c
+                    return temp_c, raw
                 else:
                     logger.warning(f"Invalid temperature reading from sensor {self.sensor_id}: {temp_c} °C")
-                    return None
+                    return None, raw
             except ValueError:
                 logger.error(f"Invalid temperature value from sensor {self.sensor_id}: {temp_string}")
-                return None
+                return None, None
+        return None, None
 
     def get_tank_label(self) -> str:
         """Return the tank name associated with this sensor."""
@@ -67,6 +84,7 @@ class TemperatureMonitor:
         self.sensors = self.initialize_sensors()
         self.tank_1_temp: Optional[float] = None
         self.tank_2_temp: Optional[float] = None
+        self.tank_raw: Dict[str, Optional[int]] = {}  # Tank label -> raw value behind its temperature
         self._lock = threading.Lock()  # Thread-safe access to temperature variables
         self._stop_event = threading.Event()
 
@@ -79,8 +97,7 @@ class TemperatureMonitor:
         }
 
         sensors = []
-        base_dir = '/sys/bus/w1/devices/'
-        device_folders = glob.glob(os.path.join(base_dir, '28*'))
+        device_folders = glob.glob(os.path.join(W1_DEVICES_DIR, '28*'))
 
         for device_folder in device_folders:
             sensor_id = os.path.basename(device_folder)
@@ -93,20 +110,47 @@ class TemperatureMonitor:
             logger.warning("No temperature sensors found.")
         return sensors
 
+    def update_temperatures(self, tank_label: Optional[str] = None) -> None:
+        """Read each sensor once (only those of `tank_label` if given) and store the temperatures."""
+        for sensor in self.sensors:
+            if tank_label and sensor.get_tank_label() != tank_label:
+                continue
+            temp, raw = sensor.read_temp_and_raw()
+            if temp is not None:
+                with self._lock:
+                    self.tank_raw[sensor.get_tank_label()] = raw
+                    if sensor.get_tank_label() == "Tank 1":
+                        self.tank_1_temp = temp
+                    elif sensor.get_tank_label() == "Tank 2":
+                        self.tank_2_temp = temp
+                    else:
+                        logger.info(f"Temperature from {sensor.get_tank_label()}: {temp} °C")
+
+    def read_tank(self, tank_label: str) -> Optional[float]:
+        """Take a fresh reading of one tank, None if its sensor gave no valid reading."""
+        return self.read_tank_and_raw(tank_label)[0]
+
+    def read_tank_and_raw(self, tank_label: str) -> Tuple[Optional[float], Optional[int]]:
+        """
+        Like read_tank, also returning the raw value behind the temperature. Both are taken in
+        one step, so a concurrent monitor_temperatures update cannot pair them with another read.
+        """
+        with self._lock:
+            if tank_label == "Tank 1":
+                self.tank_1_temp = None
+            elif tank_label == "Tank 2":
+                self.tank_2_temp = None
+            self.tank_raw.pop(tank_label, None)
+        self.update_temperatures(tank_label)
+        with self._lock:
+            temp = self.tank_1_temp if tank_label == "Tank 1" else self.tank_2_temp
+            return temp, self.tank_raw.get(tank_label) if temp is not None else None
+
     def monitor_temperatures(self):
         """Continuously monitor and store temperatures for each sensor."""
         logger.info("Starting temperature monitoring.")
         while not self._stop_event.is_set():
-            for sensor in self.sensors:
-                temp = sensor.read_temp()
-                if temp is not None:
-                    with self._lock:
-                        if sensor.get_tank_label() == "Tank 1":
-                            self.tank_1_temp = temp
-                        elif sensor.get_tank_label() == "Tank 2":
-                            self.tank_2_temp = temp
-                        else:
-                            logger.info(f"Temperature from {sensor.get_tank_label()}: {temp} °C")
+            self.update_temperatures()
             time.sleep(1)  # Adjust the sleep interval as needed
 
     def get_tank_1_temp(self) -> Optional[float]:
@@ -3,6 +3,8 @@ import time
 import logging
 import traceback
 
+logger = logging.getLogger(__name__)
+
 class UltrasonicSensor:
     def __init__(self, trig_pin: int, echo_pin: int):
         self.trig_pin = trig_pin
@@ -16,9 +18,9 @@ class UltrasonicSensor:
             GPIO.setup(self.echo_pin, GPIO.IN)
             GPIO.output(self.trig_pin, False)
             time.sleep(2)  # Allow sensor to settle
-            logging.info(f"UltrasonicSensor GPIO setup successful (Trig: {self.trig_pin}, Echo: {self.echo_pin}).")
+            logger.info(f"UltrasonicSensor GPIO setup successful (Trig: {self.trig_pin}, Echo: {self.echo_pin}).")
         except Exception as e:
-            logging.error(f"GPIO setup failed: {e}\n{traceback.format_exc()}")
+            logger.error(f"GPIO setup failed: {e}\n{traceback.format_exc()}")
             raise
 
     def get_distance(self) -> float:
@@ -32,9 +34,10 @@ class UltrasonicSensor:
 
             # Wait for echo start
             timeout = 1  # 1 second timeout
+            triggered = time.time()
             while GPIO.input(self.echo_pin) == 0:
                 start_time = time.time()
-                if start_time - start_time > timeout:
+                if start_time - triggered > timeout:
                     raise TimeoutError("Echo start timeout")
 
             # Wait for echo end
@@ -47,10 +50,10 @@ class UltrasonicSensor:
             distance = (elapsed_time * 34300) / 2  # Speed of sound 343 m/s
             return distance
         except TimeoutError as te:
-            logging.warning(f"Timeout while reading distance: {te}")
+            logger.warning(f"Timeout while reading distance: {te}")
             return None
         except Exception as e:
-            logging.error(f"Error reading distance: {e}\n{traceback.format_exc()}")
+            logger.error(f"Error reading distance: {e}\n{traceback.format_exc()}")
             return None
 
     def get_median_distance(self, samples: int = 5) -> float:
@@ -59,20 +62,21 @@ class UltrasonicSensor:
             dist = self.get_distance()
             if dist is not None:
                 distances.append(dist)
-                logging.debug(f"Sample {i+1}: Distance = {dist} cm")
+                logger.debug(f"Sample {i+1}: Distance = {dist} cm")
             else:
-                logging.debug(f"Sample {i+1}: Distance reading failed.")
+                logger.debug(f"Sample {i+1}: Distance reading failed.")
             time.sleep(0.05)  # Small delay between samples
         if distances:
             median_distance = sorted(distances)[len(distances) // 2]
-            logging.debug(f"Median Distance: {median_distance} cm")
+            logger.debug(f"Median Distance: {median_distance} cm")
             return median_distance
-        logging.debug("No valid distance readings.")
+        logger.debug("No valid distance readings.")
         return None
 
     def cleanup(self):
         try:
-            GPIO.cleanup()
-            logging.info("UltrasonicSensor GPIO cleanup successful.")
+            # Only this sensor's pins, GPIO.cleanup() would reset every pin of the process
+            GPIO.cleanup([self.trig_pin, self.echo_pin])
+            logger.info("UltrasonicSensor GPIO cleanup successful.")
         except Exception as e:
-            logging.error(f"GPIO cleanup failed: {e}\n{traceback.format_exc()}")
+            logger.error(f"GPIO cleanup failed: {e}\n{traceback.format_exc()}")
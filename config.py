@@ -1,3 +1,6 @@
+import os
+import socket
+
 TRIG_PIN = 18
 ECHO_PIN = 15
 
@@ -6,4 +9,219 @@ RELAY_PIN_2 = 16
 RELAY_PIN_3 = 20
 RELAY_PIN_4 = 21
 
+################################################################################
+# Database
+################################################################################
+
+# Consecutive connection failures before MySQL calls fail fast instead of waiting on the server
+DB_BREAKER_FAILURES = 3
+# First retry after this many seconds, doubling (with jitter) while the server stays down
+DB_BREAKER_BASE_DELAY = 2.0
+DB_BREAKER_MAX_DELAY = 120.0
+
+################################################################################
+# Configuration
+################################################################################
+
+# Sensors, cycles and relays are reloaded this often (seconds) in a fixed number of queries
+CONFIG_REFRESH_INTERVAL = 300
+# Last configuration loaded, used when the database is unreachable at startup
+CONFIG_CACHE_FILE = 'config_snapshot.json'
+
+################################################################################
+# Logging
+################################################################################
+
+LOG_FILE = 'sensor_logs.log'
+LOG_MAX_BYTES = 5 * 1024 * 1024
+LOG_BACKUP_COUNT = 5
+LOG_QUEUE_SIZE = 10000
+
+# Per-logger levels, the root logger defaults to INFO. 'SensorLogger' at DEBUG also logs every
+# inserted, queued and synced reading, which `app.py --replay` can read back from the log
+LOG_LEVELS = {
+    'SensorLogger': 'INFO',
+    'app.sensors.relay': 'INFO',
+}
+
+# Identical messages from one logging call allowed per period before further repeats are dropped
+# (DEBUG is not limited)
+LOG_RATE_LIMIT_BURST = 5
+LOG_RATE_LIMIT_PERIOD = 60
+
+################################################################################
+# Metrics
+################################################################################
+
+METRICS_ENABLED = True
+METRICS_HOST = '127.0.0.1'
+METRICS_PORT = 9108
+# Each process writes its snapshot here every METRICS_FLUSH_INTERVAL seconds and the endpoint
+# merges them. On tmpfs, so the writes never touch the SD card; snapshots of processes that
+# exited are folded into one file when the endpoint is read.
+METRICS_DIR = '/dev/shm/hydroponics-metrics'
+METRICS_FLUSH_INTERVAL = 10
+
+################################################################################
+# Tick Tracing
+################################################################################
+
+# Records scheduled/start/end time of every cycle tick; off by default
+TRACE_ENABLED = False
+TRACE_CAPACITY = 65536
+TRACE_DIR = 'traces'
+
+################################################################################
+# Cycle Checkpoints
+################################################################################
+
+# Cycle progress is saved here so a restart resumes instead of starting over
+CHECKPOINT_DIR = 'state'
+CHECKPOINT_WRITE_INTERVAL = 30
+# A checkpoint whose next tick or pause end passed more than this long ago is ignored and the
+# cycle starts fresh; a long pause or a long tick period does not make it stale by itself
+CHECKPOINT_MAX_AGE = 3600
+
+################################################################################
+# Shared Memory
+################################################################################
+
+# Latest value per sensor, readable by any local process (`python -m app.engine.shm`)
+SHM_NAME = 'hydroponics_latest'
+# Sensor IDs must be below this to get a slot
+SHM_CAPACITY = 256
+
+################################################################################
+# Local Read API
+################################################################################
+
+# Latest values, recent history and rollups over HTTP, served from main's memory
+API_ENABLED = True
+API_HOST = '127.0.0.1'
+API_PORT = 8088
+API_POLL_INTERVAL = 0.5
+
+################################################################################
+# Camera Stream
+################################################################################
+
+# MJPEG preview of the grow bed at http://STREAM_HOST:STREAM_PORT/, served by main. While it is
+# enabled main owns the camera and camera sensor ticks upload the stream's frame; the camera is
+# only open while someone is watching. Set STREAM_HOST to '0.0.0.0' to watch from other machines.
+STREAM_ENABLED = True
+STREAM_HOST = '127.0.0.1'
+STREAM_PORT = 8089
+STREAM_CAMERA_INDEX = 0
+STREAM_FPS = 10
+STREAM_JPEG_QUALITY = 80
+# The camera is released after this long without viewers or snapshots
+STREAM_IDLE_SECONDS = 30
+# Frames discarded after opening the camera while exposure settles
+STREAM_WARMUP_FRAMES = 5
+# Seconds between frames sent to the detection API, however often the camera cycle ticks;
+# a failed upload is retried on the next tick
+CAMERA_UPLOAD_INTERVAL = 14400
+
+################################################################################
+# Segment Store
+################################################################################
+
+# Every reading is appended to per-sensor float64 column files under SEGMENTS_DIR
+SEGMENTS_ENABLED = True
+SEGMENTS_DIR = 'history'
+# New segments cover one day each
+SEGMENTS_SPAN = 86400
+# Segments older than a week are merged into 28-day segments
+SEGMENTS_COMPACT_AFTER = 7 * 86400
+SEGMENTS_COMPACT_SPAN = 28 * 86400
+# Segments are deleted after a year
+SEGMENTS_RETENTION = 365 * 86400
+SEGMENTS_MAINTENANCE_INTERVAL = 3600
+
+################################################################################
+# Retention
+################################################################################
+
+# Old sensor_data rows are rolled into sensor_data_hourly/daily and then removed.
+# Needs `python -m app.engine.migrate up`; set to False when `python -m app.engine.retention`
+# runs from another machine instead.
+RETENTION_ENABLED = True
+RETENTION_INTERVAL = 6 * 3600
+RETENTION_RAW_DAYS = 30
+RETENTION_HOURLY_DAYS = 365
+RETENTION_CHUNK_HOURS = 6
+RETENTION_DELETE_BATCH = 5000
+RETENTION_MAX_SECONDS = 300
+RETENTION_DROP_PARTITIONS = True
+
+################################################################################
+# Nodes
+################################################################################
+
+# Several nodes can share one database, each runs only the sensors and relays it owns.
+# A sensor whose config has {"node": "<NODE_ID>"} runs only on that node.
+NODE_ID = os.environ.get('HYDROPONICS_NODE_ID', socket.gethostname())
+# Relay ID -> node that drives it
+NODE_RELAYS = {}
+# Without leases a node runs everything not pinned to another node; with leases the rest is
+# shared out among live nodes and taken over when a node stops renewing (migration 0006)
+NODE_LEASES_ENABLED = False
+NODE_LEASE_SECONDS = 30
+NODE_RENEW_INTERVAL = 10
+# Connect and statement timeout of lease renewals, well below NODE_LEASE_SECONDS
+NODE_DB_TIMEOUT = 5
+
+################################################################################
+# Reading Bus
+################################################################################
+
+# Readings the database could not take, synced after the next successful insert
+OFFLINE_QUEUE_FILE = 'sensor_data_queue.json'
+# Readings waiting for the database before the oldest are spilled to the JSON queue
+BUS_QUEUE_SIZE = 1000
+# Readings are inserted in batches of up to this many, waiting at most this long to fill one
+BUS_DB_BATCH_SIZE = 20
+BUS_DB_BATCH_SECONDS = 2.0
+# Store the raw driver count of each reading in sensor_data.raw_value (migration 0007),
+# so `python -m app.engine.recalibrate` can reconvert history with new calibration
+RAW_VALUES_ENABLED = False
+
+################################################################################
+# Read Deadlines
+################################################################################
+
+# Seconds a driver call may take before the tick is recorded as a timeout, by sensor type.
+# The call runs on a worker thread, so a hung read never blocks the cycle for longer.
+# Types without an entry (the pumps) are called directly; a sensor's config can set
+# {"read_timeout": <seconds>}. The ultrasonic median takes 5 pings of up to 2s each.
+READ_TIMEOUTS = {
+    'ultrasonic': 12.0,
+    'ph': 2.0,
+    'tank1': 5.0,
+    'tank2': 5.0,
+    'light': 2.0,
+    'env_temp': 5.0,
+    'humidity': 5.0,
+    'camera': 10.0,
+}
+# Consecutive timeouts after which the driver instance is replaced by a new one
+READ_TIMEOUT_RECYCLE = 3
+# Replaced instances that may still be blocked in the hardware before recycling stops
+READ_TIMEOUT_MAX_STUCK = 2
+# A sensor or cycle process that died is restarted, at most once per this many seconds
+PROCESS_RESTART_DELAY = 30
+
+################################################################################
+# Hardware Arbitration
+################################################################################
 
+# Sensor processes and the relay controller claim the GPIO pins they drive and take turns on
+# shared buses (SPI, I2C, 1-Wire, the DHT22 pin) through lock files in this directory; a pin
+# claimed twice is refused and logged. `python -m app.engine.arbiter status` lists holders and waiters.
+HARDWARE_ARBITER_ENABLED = True
+# On tmpfs, so the lock files never touch the SD card
+HARDWARE_LOCK_DIR = '/dev/shm/hydroponics-hardware'
+# Seconds a bus read waits for its turn before the tick is recorded as a timeout. The wait
+# does not count against READ_TIMEOUTS, which starts once the turn is taken. Pump runs on
+# the same pin wait for the run ahead of them to finish.
+HARDWARE_WAIT_TIMEOUT = 5.0
@@ -0,0 +1,20 @@
+-- Tables as the application has always used them. Existing installs keep their tables
+-- untouched, fresh databases (and the benchmark) get the original layout.
+
+CREATE TABLE IF NOT EXISTS sensor_data (
+    id INT NOT NULL AUTO_INCREMENT,
+    sensor_id INT NOT NULL,
+    value DOUBLE NOT NULL,
+    reading_time DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (id)
+) ENGINE=InnoDB;
+
+CREATE TABLE IF NOT EXISTS cycles (
+    cycle_id INT NOT NULL AUTO_INCREMENT,
+    sensor_id INT NOT NULL,
+    interval_seconds INT NOT NULL,
+    duration_minutes INT NOT NULL,
+    pause INT NOT NULL DEFAULT 0,
+    is_active VARCHAR(10) NOT NULL DEFAULT '1',
+    PRIMARY KEY (cycle_id)
+) ENGINE=InnoDB;
@@ -0,0 +1,15 @@
+-- Sensor IDs fit in 16 bits, so a SMALLINT saves two bytes per reading. value stays a DOUBLE:
+-- a FLOAT keeps only ~7 significant digits and would round existing readings (lux, raw counts
+-- converted with new calibrations) when the column is altered. is_active becomes a real
+-- boolean instead of a string.
+
+ALTER TABLE sensor_data
+    MODIFY sensor_id SMALLINT UNSIGNED NOT NULL,
+    MODIFY value DOUBLE NOT NULL,
+    MODIFY reading_time DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP;
+
+UPDATE cycles SET is_active = 0 WHERE is_active NOT IN (0, 1);
+
+ALTER TABLE cycles
+    MODIFY sensor_id SMALLINT UNSIGNED NOT NULL,
+    MODIFY is_active TINYINT(1) NOT NULL DEFAULT 1;
@@ -0,0 +1,5 @@
+-- Readings are always looked up per sensor over a time range, cycles per sensor and state.
+
+ALTER TABLE sensor_data ADD INDEX idx_sensor_time (sensor_id, reading_time);
+
+ALTER TABLE cycles ADD INDEX idx_sensor_active (sensor_id, is_active);
@@ -0,0 +1,19 @@
+-- Monthly range partitions on reading_time, so range queries prune to the months they touch
+-- and old months can be dropped instead of deleted row by row.
+--
+-- The partitioning column must be part of every unique key, hence the (id, reading_time)
+-- primary key. Partitioned tables cannot have foreign keys. This rebuilds the table, expect
+-- it to take a while on a large sensor_data.
+--
+-- Readings start in December 2024, anything older lands in p_old. Monthly partitions are added
+-- by `python -m app.engine.migrate partitions`, which `up` runs after this migration.
+
+ALTER TABLE sensor_data
+    DROP PRIMARY KEY,
+    ADD PRIMARY KEY (id, reading_time);
+
+ALTER TABLE sensor_data
+    PARTITION BY RANGE (TO_DAYS(reading_time)) (
+        PARTITION p_old VALUES LESS THAN (TO_DAYS('2024-12-01')),
+        PARTITION p_future VALUES LESS THAN MAXVALUE
+    );
@@ -0,0 +1,31 @@
+-- Hourly and daily aggregates that raw sensor_data rows are rolled into before they expire,
+-- and the watermarks that let the retention job resume where it stopped. min_value and max_value
+-- are DOUBLE like sensor_data.value, so a rolled-up reading keeps every digit.
+
+CREATE TABLE IF NOT EXISTS sensor_data_hourly (
+    sensor_id SMALLINT UNSIGNED NOT NULL,
+    bucket DATETIME NOT NULL,
+    min_value DOUBLE NOT NULL,
+    max_value DOUBLE NOT NULL,
+    avg_value DOUBLE NOT NULL,
+    sample_count INT UNSIGNED NOT NULL,
+    PRIMARY KEY (sensor_id, bucket),
+    INDEX idx_bucket (bucket)
+) ENGINE=InnoDB;
+
+CREATE TABLE IF NOT EXISTS sensor_data_daily (
+    sensor_id SMALLINT UNSIGNED NOT NULL,
+    bucket DATE NOT NULL,
+    min_value DOUBLE NOT NULL,
+    max_value DOUBLE NOT NULL,
+    avg_value DOUBLE NOT NULL,
+    sample_count INT UNSIGNED NOT NULL,
+    PRIMARY KEY (sensor_id, bucket),
+    INDEX idx_bucket (bucket)
+) ENGINE=InnoDB;
+
+CREATE TABLE IF NOT EXISTS retention_watermarks (
+    name VARCHAR(32) NOT NULL PRIMARY KEY,
+    position DATETIME NOT NULL,
+    updated_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+) ENGINE=InnoDB;
@@ -0,0 +1,15 @@
+-- Lets several nodes share one database. Each node heartbeats into node_heartbeats and holds
+-- a time-limited lease per sensor or relay it runs; an expired lease can be taken over.
+
+CREATE TABLE IF NOT EXISTS node_heartbeats (
+    node_id VARCHAR(64) NOT NULL PRIMARY KEY,
+    last_seen DATETIME(3) NOT NULL,
+    started_at DATETIME(3) NOT NULL
+) ENGINE=InnoDB;
+
+CREATE TABLE IF NOT EXISTS node_leases (
+    resource VARCHAR(64) NOT NULL PRIMARY KEY,
+    node_id VARCHAR(64) NOT NULL,
+    expires_at DATETIME(3) NOT NULL,
+    INDEX idx_node (node_id)
+) ENGINE=InnoDB;
@@ -0,0 +1,7 @@
+-- The driver count each reading was converted from (ADC count, BH1750 word, DS18B20
+-- millidegrees), so history can be reconverted with new calibration parameters by
+-- `python -m app.engine.recalibrate`. NULL for sensors without one and for older rows.
+-- Adding a trailing nullable column is an instant change on MariaDB 10.3+.
+
+ALTER TABLE sensor_data
+    ADD COLUMN raw_value INT NULL;
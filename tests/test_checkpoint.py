@@ -0,0 +1,55 @@
+"""
+Cycle checkpoints written to a temporary directory. Run with `python -m unittest discover tests`.
+"""
+import json
+import tempfile
+import time
+import unittest
+
+from app.engine.checkpoint import CycleCheckpoint
+
+CYCLE = {'cycle_id': 7, 'interval_seconds': 60, 'duration_minutes': 30, 'pause': 7200}
+
+
+class CycleCheckpointTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        self.checkpoint = CycleCheckpoint(self.directory.name, 3, CYCLE, max_age=3600)
+
+    def backdate(self, seconds: float) -> None:
+        with open(self.checkpoint.path) as file:
+            state = json.load(file)
+        state['saved_at'] -= seconds
+        with open(self.checkpoint.path, 'w') as file:
+            json.dump(state, file)
+
+    def test_resumes_a_pause_longer_than_max_age(self):
+        # Saved when a two-hour pause started, ninety minutes ago: half an hour is left
+        self.checkpoint.save(1800, time.time() + 1800, phase='pausing', force=True)
+        self.backdate(5400)
+        state = self.checkpoint.load()
+        self.assertEqual(state['phase'], 'pausing')
+        self.assertEqual(state['elapsed'], 1800)
+
+    def test_ignores_a_deadline_missed_by_more_than_max_age(self):
+        self.checkpoint.save(600, time.time() - 3700, force=True)
+        self.assertIsNone(self.checkpoint.load())
+
+    def test_resumes_a_recent_running_cycle(self):
+        self.checkpoint.save(600, time.time() + 30, force=True)
+        self.assertEqual(self.checkpoint.load()['elapsed'], 600)
+
+    def test_changed_cycle_starts_fresh(self):
+        self.checkpoint.save(600, time.time() + 30, force=True)
+        changed = CycleCheckpoint(self.directory.name, 3, {**CYCLE, 'pause': 60})
+        self.assertIsNone(changed.load())
+
+    def test_cleared_checkpoint(self):
+        self.checkpoint.save(600, time.time() + 30, force=True)
+        self.checkpoint.clear()
+        self.assertIsNone(self.checkpoint.load())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,212 @@
+"""
+Lease ownership of several simulated nodes against an in-memory stand-in for the node_leases
+and node_heartbeats tables. Run with `python -m unittest discover tests`.
+"""
+import re
+import unittest
+from unittest import mock
+
+from app.engine import nodes
+from app.engine.nodes import NodeOwnership
+
+
+class LeaseDatabase:
+    """
+    Executes the statements NodeOwnership sends, on dicts, with a clock the test moves.
+    Shared by every simulated node, like the one MySQL server of a deployment.
+    """
+
+    def __init__(self):
+        self.now = 1000.0
+        self.heartbeats = {}    # node_id -> last_seen
+        self.leases = {}        # resource -> [node_id, expires_at]
+        self.down = False
+
+    def connect(self):
+        if self.down:
+            raise ConnectionError("database unreachable")
+        return _Connection(self)
+
+
+class _Connection:
+    def __init__(self, database: LeaseDatabase):
+        self.database = database
+
+    def cursor(self):
+        return _Cursor(self.database)
+
+
+class _Cursor:
+    def __init__(self, database: LeaseDatabase):
+        self.database = database
+        self.rows = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, sql, params=()):
+        database = self.database
+        if database.down:
+            raise ConnectionError("database unreachable")
+        sql = ' '.join(sql.split())
+        now = database.now
+        if sql.startswith('INSERT INTO node_heartbeats'):
+            database.heartbeats[params[0]] = now
+        elif sql.startswith('SELECT node_id FROM node_heartbeats'):
+            self.rows = [(node,) for node, seen in database.heartbeats.items() if seen > now - params[0]]
+        elif sql.startswith('INSERT INTO node_leases'):
+            for resource, node, seconds in zip(params[0::3], params[1::3], params[2::3]):
+                lease = database.leases.get(resource)
+                if lease is None or lease[0] == node or lease[1] < now:
+                    database.leases[resource] = [node, now + seconds]
+        elif sql.startswith('SELECT resource FROM node_leases'):
+            self.rows = [(resource,) for resource, (node, expires) in database.leases.items()
+                         if node == params[0] and expires > now]
+        elif sql.startswith('DELETE FROM node_leases WHERE node_id = %s AND resource IN'):
+            for resource in params[1:]:
+                if database.leases.get(resource, [None])[0] == params[0]:
+                    del database.leases[resource]
+        elif sql.startswith('DELETE FROM node_leases'):
+            database.leases = {resource: lease for resource, lease in database.leases.items() if lease[0] != params[0]}
+        elif sql.startswith('DELETE FROM node_heartbeats'):
+            database.heartbeats.pop(params[0], None)
+        else:
+            raise AssertionError(f"unexpected statement: {sql}")
+
+    def fetchall(self):
+        return self.rows
+
+
+RESOURCES = {**{f"sensor:{n}": None for n in range(1, 12)}, **{f"relay:{n}": None for n in range(1, 5)}}
+LEASE = 30.0
+
+
+class NodeLeaseTest(unittest.TestCase):
+    def setUp(self):
+        self.database = LeaseDatabase()
+        self.monotonic = 0.0
+        patcher = mock.patch.object(nodes.time, 'monotonic', lambda: self.monotonic)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.nodes = {name: NodeOwnership(name, self.database.connect, LEASE) for name in ('node-0', 'node-1', 'node-2')}
+
+    def advance(self, seconds: float) -> None:
+        self.database.now += seconds
+        self.monotonic += seconds
+
+    def round(self, names=None, resources=RESOURCES):
+        # Two passes: the first heartbeats, the second sees every live node and claims
+        for _ in range(2):
+            for name in names or self.nodes:
+                self.nodes[name].update(resources)
+
+    def assertOwnedOnce(self, names):
+        owners = {}
+        for name in names:
+            for resource in self.nodes[name].owned:
+                owners.setdefault(resource, []).append(name)
+        self.assertEqual({resource: holders for resource, holders in owners.items() if len(holders) > 1}, {})
+        self.assertEqual(set(owners), set(RESOURCES))
+
+    def test_claim_spreads_every_resource_over_the_nodes(self):
+        self.round()
+        self.assertOwnedOnce(self.nodes)
+        self.assertTrue(all(ownership.owned for ownership in self.nodes.values()))
+
+    def test_renewal_keeps_owners_and_extends_leases(self):
+        self.round()
+        before = {name: set(ownership.owned) for name, ownership in self.nodes.items()}
+        for _ in range(5):
+            self.advance(LEASE / 3)
+            self.round()
+        self.assertEqual({name: ownership.owned for name, ownership in self.nodes.items()}, before)
+        self.assertTrue(all(expires > self.database.now + LEASE / 2 for _, expires in self.database.leases.values()))
+
+    def test_expired_lease_is_taken_over(self):
+        self.round()
+        lost = set(self.nodes['node-1'].owned)
+        # node-1 stops renewing: its heartbeat and then its leases expire
+        self.advance(LEASE + 1)
+        self.round(['node-0', 'node-2'])
+        self.assertOwnedOnce(['node-0', 'node-2'])
+        self.assertTrue(lost <= self.nodes['node-0'].owned | self.nodes['node-2'].owned)
+        self.assertTrue(all(self.database.leases[resource][0] != 'node-1' for resource in lost))
+
+    def test_live_lease_is_not_taken_over(self):
+        self.round()
+        held = set(self.nodes['node-1'].owned)
+        # A node joining with a stale view must not steal leases that are still valid
+        newcomer = NodeOwnership('node-3', self.database.connect, LEASE)
+        newcomer.update(RESOURCES)
+        self.assertFalse(held & newcomer.owned)
+
+    def test_returning_node_gets_its_share_back(self):
+        self.round()
+        share = set(self.nodes['node-1'].owned)
+        self.advance(LEASE + 1)
+        self.round(['node-0', 'node-2'])
+        self.advance(1)
+        # Back: the others hand its resources back, it claims them on its next renewal
+        self.round()
+        self.round()
+        self.assertOwnedOnce(self.nodes)
+        self.assertEqual(self.nodes['node-1'].owned, share)
+
+    def test_leases_kept_until_they_run_out_when_renewals_fail(self):
+        self.round()
+        held = set(self.nodes['node-0'].owned)
+        self.database.down = True
+        self.advance(LEASE / 2)
+        self.assertEqual(self.nodes['node-0'].update(RESOURCES), held)
+        self.advance(LEASE / 2 + 1)
+        self.assertEqual(self.nodes['node-0'].update(RESOURCES), set())
+
+    def test_holds_ends_with_the_lease_without_another_renewal(self):
+        resources = {**RESOURCES, 'sensor:0': 'node-0'}
+        self.round(resources=resources)
+        leased = self.nodes['node-0'].owned - {'sensor:0'}
+        self.advance(LEASE / 2)
+        self.assertTrue(all(self.nodes['node-0'].holds(resource) for resource in leased))
+        # A renewal hanging on an unreachable database must not keep the relays driven
+        self.advance(LEASE / 2 + 1)
+        self.assertFalse(any(self.nodes['node-0'].holds(resource) for resource in leased))
+        self.assertTrue(self.nodes['node-0'].holds('sensor:0'))
+
+    def test_statically_assigned_resources_are_not_leased(self):
+        resources = {**RESOURCES, 'sensor:0': 'node-2'}
+        self.round(resources=resources)
+        self.assertIn('sensor:0', self.nodes['node-2'].owned)
+        self.assertNotIn('sensor:0', self.nodes['node-0'].owned | self.nodes['node-1'].owned)
+        self.assertNotIn('sensor:0', self.database.leases)
+
+
+class RelayLeaseLossTest(unittest.TestCase):
+    def setUp(self):
+        from app.sensors import simulated
+        self.simulation = simulated.install(seed=0)
+        self.addCleanup(self.simulation.close)
+        from app.sensors import relay
+        from app.engine.snapshot import RelayConfig
+        self.gpio = relay.GPIO
+        self.owned = {'relay:1', 'relay:2'}
+        self.controller = relay.RelayController(
+            owns=lambda relay_id: f"relay:{relay_id}" in self.owned,
+            relays={1: RelayConfig(1, 'Pump', 26, 'manual'), 2: RelayConfig(2, 'Light', 21, 'manual')},
+        )
+
+    def test_relay_switched_off_when_ownership_is_lost(self):
+        self.controller.setup_gpio()
+        self.controller.control_relay(1, True)
+        self.controller.control_relay(2, True)
+        self.owned.discard('relay:1')
+        self.controller.release_unowned()
+        self.assertEqual(self.gpio.input(26), 0)
+        self.assertEqual(self.gpio.input(21), 1)
+        self.assertNotIn(26, self.controller.ready_pins)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,232 @@
+"""
+The retention job's rollup, verification, partition drops and deletes against an in-memory
+stand-in for sensor_data and the rollup tables. Run with `python -m unittest discover tests`.
+"""
+import re
+import unittest
+from datetime import date, datetime, timedelta
+
+from app.engine.retention import RetentionJob
+
+NOW = datetime(2026, 6, 15, 12, 0)
+
+
+def _to_days(day: date) -> int:
+    return day.toordinal() + 365
+
+
+class RetentionDatabase:
+    """
+    Executes the statements RetentionJob sends, on lists and dicts. sensor_data is partitioned
+    by month like migration 0004 leaves it: (name, TO_DAYS of the upper bound) plus MAXVALUE.
+    """
+
+    def __init__(self):
+        self.tables = {'schema_migrations', 'retention_watermarks', 'sensor_data_hourly', 'sensor_data_daily'}
+        self.raw = []           # [sensor_id, reading_time, value]
+        self.hourly = {}        # (sensor_id, bucket) -> [min, max, avg, count]
+        self.daily = {}
+        self.watermarks = {}
+        self.partitions = [(f"p{month:%Y%m}", _to_days(upper)) for month, upper in (
+            (date(2026, 3, 1), date(2026, 4, 1)),
+            (date(2026, 4, 1), date(2026, 5, 1)),
+            (date(2026, 5, 1), date(2026, 6, 1)),
+            (date(2026, 6, 1), date(2026, 7, 1)),
+            (date(2026, 7, 1), date(2026, 8, 1)),
+            (date(2026, 8, 1), date(2026, 9, 1)),
+            (date(2026, 9, 1), date(2026, 10, 1)),
+        )] + [('pmax', 'MAXVALUE')]
+        self.lock_free = True
+        self.statements = []
+        # Called after each hourly rollup with its range, e.g. to land a late reading in it
+        self.after_rollup = None
+
+    def connection(self):
+        return _Connection(self)
+
+    def readings(self, start: datetime, end: datetime, step: timedelta, sensors=(1, 2)) -> None:
+        moment = start
+        while moment < end:
+            for sensor_id in sensors:
+                self.raw.append([sensor_id, moment, sensor_id * 10 + moment.hour / 100])
+            moment += step
+
+
+class _Connection:
+    def __init__(self, database: RetentionDatabase):
+        self.database = database
+
+    def cursor(self):
+        return _Cursor(self.database)
+
+
+class _Cursor:
+    def __init__(self, database: RetentionDatabase):
+        self.database = database
+        self.rows = []
+        self.rowcount = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, sql, params=()):
+        database = self.database
+        sql = ' '.join(sql.split())
+        database.statements.append(sql)
+        self.rows = []
+        if sql.startswith('SHOW TABLES LIKE'):
+            self.rows = [(params[0],)] if params[0] in database.tables else []
+        elif sql.startswith('SELECT @@log_bin'):
+            self.rows = [(1, 'MIXED')]
+        elif sql.startswith('SET SESSION'):
+            pass
+        elif sql.startswith('SELECT GET_LOCK'):
+            self.rows = [(1 if database.lock_free else 0,)]
+        elif sql.startswith('SELECT RELEASE_LOCK'):
+            self.rows = [(1,)]
+        elif sql.startswith('SELECT position FROM retention_watermarks'):
+            position = database.watermarks.get(params[0])
+            self.rows = [(position,)] if position else []
+        elif sql.startswith('INSERT INTO retention_watermarks'):
+            database.watermarks[params[0]] = params[1]
+        elif sql == 'SELECT MIN(reading_time) FROM sensor_data':
+            self.rows = [(min((row[1] for row in database.raw), default=None),)]
+        elif sql == 'SELECT MIN(bucket) FROM sensor_data_hourly':
+            self.rows = [(min((bucket for _, bucket in database.hourly), default=None),)]
+        elif sql.startswith('INSERT INTO sensor_data_hourly'):
+            self._rollup_hourly(*params)
+            if database.after_rollup:
+                database.after_rollup(*params)
+        elif sql.startswith('INSERT INTO sensor_data_daily'):
+            self._rollup_daily(*params)
+        elif sql.startswith('SELECT COUNT(*) FROM sensor_data'):
+            self.rows = [(sum(1 for row in database.raw if params[0] <= row[1] < params[1]),)]
+        elif sql.startswith('SELECT COALESCE(SUM(sample_count), 0) FROM sensor_data_hourly'):
+            self.rows = [(sum(v[3] for (_, bucket), v in database.hourly.items() if params[0] <= bucket < params[1]),)]
+        elif sql.startswith('SELECT DISTINCT sensor_id FROM sensor_data_hourly'):
+            self.rows = [(sensor_id,) for sensor_id in sorted({s for s, bucket in database.hourly if params[0] <= bucket < params[1]})]
+        elif sql.startswith('DELETE FROM sensor_data WHERE'):
+            sensor_id, start, end, limit = params
+            matching = [row for row in database.raw if row[0] == sensor_id and start <= row[1] < end][:limit]
+            database.raw = [row for row in database.raw if not any(row is match for match in matching)]
+            self.rowcount = len(matching)
+        elif sql.startswith('DELETE FROM sensor_data_hourly'):
+            start, end, limit = params
+            matching = [key for key in database.hourly if start <= key[1] < end][:limit]
+            for key in matching:
+                del database.hourly[key]
+            self.rowcount = len(matching)
+        elif 'information_schema.PARTITIONS' in sql:
+            self.rows = [(name, str(description)) for name, description in database.partitions]
+        elif sql.startswith('ALTER TABLE sensor_data DROP PARTITION'):
+            self._drop_partition(sql.rsplit(' ', 1)[1])
+        elif sql.startswith('ALTER TABLE sensor_data REORGANIZE PARTITION pmax'):
+            # ensure_partitions adding months ahead of the real date
+            added = [(name, int(days)) for name, days in re.findall(r'PARTITION (p\d{6}) VALUES LESS THAN \((\d+)\)', sql)]
+            database.partitions[-1:] = added + [('pmax', 'MAXVALUE')]
+        else:
+            raise AssertionError(f"unexpected statement: {sql}")
+
+    def fetchall(self):
+        return self.rows
+
+    def fetchone(self):
+        return self.rows[0] if self.rows else None
+
+    def _rollup_hourly(self, start, end):
+        groups = {}
+        for sensor_id, moment, value in self.database.raw:
+            if start <= moment < end:
+                groups.setdefault((sensor_id, moment.replace(minute=0, second=0, microsecond=0)), []).append(value)
+        for key, values in groups.items():
+            self.database.hourly[key] = [min(values), max(values), sum(values) / len(values), len(values)]
+
+    def _rollup_daily(self, start, end):
+        groups = {}
+        for (sensor_id, bucket), aggregate in self.database.hourly.items():
+            if start <= bucket < end:
+                groups.setdefault((sensor_id, bucket.date()), []).append(aggregate)
+        for key, aggregates in groups.items():
+            count = sum(a[3] for a in aggregates)
+            self.database.daily[key] = [min(a[0] for a in aggregates), max(a[1] for a in aggregates),
+                                        sum(a[2] * a[3] for a in aggregates) / count, count]
+
+    def _drop_partition(self, name):
+        partitions = self.database.partitions
+        index = [partition[0] for partition in partitions].index(name)
+        lower = date.fromordinal(partitions[index - 1][1] - 365) if index else date.min
+        upper = date.fromordinal(partitions[index][1] - 365)
+        self.database.raw = [row for row in self.database.raw if not lower <= row[1].date() < upper]
+        del partitions[index]
+
+
+class RetentionJobTest(unittest.TestCase):
+    def setUp(self):
+        self.database = RetentionDatabase()
+        self.database.readings(datetime(2026, 3, 1), datetime(2026, 6, 15), timedelta(hours=5))
+        self.total = len(self.database.raw)
+        self.job = RetentionJob(self.database.connection(), raw_days=30, hourly_days=365, max_seconds=60)
+
+    def test_rolls_up_verifies_then_drops_and_deletes(self):
+        cutoff = datetime(2026, 5, 16, 12)
+        before = [row for row in self.database.raw if row[1] < cutoff]
+        stats = self.job.run(NOW)
+
+        self.assertEqual(stats['partitions_dropped'], 2)
+        self.assertEqual([name for name, _ in self.database.partitions][:2], ['p202605', 'p202606'])
+        self.assertEqual(stats['raw_deleted'], sum(1 for row in before if row[1] >= datetime(2026, 5, 1)))
+        self.assertTrue(all(row[1] >= cutoff for row in self.database.raw))
+        self.assertEqual(len(self.database.raw), self.total - len(before))
+        # Every removed raw row is accounted for in the rollups
+        self.assertEqual(sum(v[3] for v in self.database.hourly.values()), len(before))
+        self.assertEqual(sum(v[3] for v in self.database.daily.values()),
+                         sum(1 for row in before if row[1] < datetime(2026, 5, 16)))
+        self.assertEqual(self.database.watermarks['hourly'], cutoff)
+        self.assertEqual(self.database.watermarks['raw_deleted'], cutoff)
+
+    def test_mismatch_stops_before_anything_is_dropped(self):
+        def late_reading(start, end):
+            # Lands in the chunk between the rollup and its verification
+            if not any(row[0] == 3 for row in self.database.raw):
+                self.database.raw.append([3, start, 1.0])
+        self.database.after_rollup = late_reading
+        partitions = [name for name, _ in self.database.partitions]
+
+        stats = self.job.run(NOW)
+
+        self.assertEqual(stats['hours_rolled'], 0)
+        self.assertEqual(stats['partitions_dropped'], 0)
+        self.assertEqual(stats['raw_deleted'], 0)
+        self.assertTrue(set(partitions) <= {name for name, _ in self.database.partitions})
+        self.assertEqual(len(self.database.raw), self.total + 1)
+        self.assertFalse(any('DROP PARTITION' in sql or sql.startswith('DELETE') for sql in self.database.statements))
+        self.assertEqual(self.database.watermarks['hourly'], datetime(2026, 3, 1))
+
+    def test_next_run_retries_the_mismatched_chunk(self):
+        def late_reading(start, end):
+            if len(self.database.raw) == self.total:
+                self.database.raw.append([3, start, 1.0])
+        self.database.after_rollup = late_reading
+        self.job.run(NOW)
+        self.database.after_rollup = None
+        stats = self.job.run(NOW)
+        self.assertEqual(stats['partitions_dropped'], 2)
+        self.assertEqual(sum(v[3] for v in self.database.hourly.values()),
+                         self.total + 1 - len(self.database.raw))
+
+    def test_does_nothing_without_migrations(self):
+        self.database.tables.discard('schema_migrations')
+        self.assertEqual(self.job.run(NOW), {})
+        self.assertTrue(all(sql.startswith('SHOW TABLES') for sql in self.database.statements))
+
+    def test_skips_while_another_run_holds_the_lock(self):
+        self.database.lock_free = False
+        self.assertEqual(self.job.run(NOW), {})
+        self.assertEqual(len(self.database.raw), self.total)
+
+
+if __name__ == "__main__":
+    unittest.main()
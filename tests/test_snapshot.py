@@ -0,0 +1,107 @@
+"""
+Configuration snapshots loaded from an in-memory stand-in for the sensors, cycles and relays
+tables. Run with `python -m unittest discover tests`.
+"""
+import json
+import os
+import tempfile
+import unittest
+
+from app.engine import snapshot
+from app.engine.snapshot import ConfigSnapshot, load_cache, load_snapshot, save_cache
+
+
+class ConfigDatabase:
+    """Answers the queries load_snapshot makes, like MySQLWrapper, and records every statement."""
+
+    def __init__(self):
+        self.sensors = {1: {'map': 'ph'}, 2: {'map': 'pump_2'}, 3: {'map': 'light'}}
+        self.inactive_sensors = {3}
+        # cycle_id -> [sensor_id, interval_seconds, duration_minutes, pause, is_active]
+        self.cycles = {10: [1, 60, 30, 0, 1], 11: [2, 5, 10, 5, 1], 12: [2, 7, 10, 0, 1], 13: [3, 60, 30, 0, 1]}
+        self.relays = [(1, 'Pump', 16, 'manual'), (2, 'Light', 21, 'auto')]
+        self.statements = []
+
+    def execute_query(self, query, params=None):
+        self.statements.append(query)
+        if query == snapshot.ACTIVATE_CYCLES:
+            for cycle in self.cycles.values():
+                if cycle[0] not in self.inactive_sensors:
+                    cycle[4] = 1
+
+    def fetch_all(self, query, params=None, dictionary=False):
+        self.statements.append(query)
+        active = [sensor_id for sensor_id in self.sensors if sensor_id not in self.inactive_sensors]
+        if query == snapshot.SELECT_SENSORS:
+            return [{'id': sensor_id, 'config': json.dumps(self.sensors[sensor_id])} for sensor_id in active]
+        if query == snapshot.SELECT_CYCLES:
+            return [
+                {'sensor_id': sensor_id, 'cycle_id': cycle_id, 'interval_seconds': interval,
+                 'duration_minutes': duration, 'pause': pause, 'is_active': is_active}
+                for cycle_id, (sensor_id, interval, duration, pause, is_active) in sorted(self.cycles.items())
+                if sensor_id in active and is_active
+            ]
+        if query == snapshot.SELECT_RELAYS:
+            return list(self.relays)
+        raise AssertionError(f"unexpected query: {query}")
+
+
+class LoadSnapshotTest(unittest.TestCase):
+    def setUp(self):
+        self.database = ConfigDatabase()
+
+    def test_loads_active_sensors_cycles_and_relays_in_fixed_queries(self):
+        loaded = load_snapshot(self.database)
+        self.assertEqual(set(loaded.sensors), {1, 2})
+        self.assertEqual([cycle['cycle_id'] for cycle in loaded.cycles_for(2)], [11, 12])
+        self.assertEqual(loaded.cycles_for(3), ())
+        self.assertEqual(loaded.relays[1].gpio, 16)
+        self.assertEqual(len(self.database.statements), 3)
+
+    def test_refresh_keeps_a_deactivated_cycle_off(self):
+        load_snapshot(self.database, activate_cycles=True)
+        # An operator switches a cycle off: later refreshes must not switch it back on
+        self.database.cycles[12][4] = 0
+        refreshed = load_snapshot(self.database)
+        self.assertEqual([cycle['cycle_id'] for cycle in refreshed.cycles_for(2)], [11])
+        self.assertNotIn(snapshot.ACTIVATE_CYCLES, self.database.statements[1:])
+
+    def test_startup_load_activates_cycles_of_active_sensors(self):
+        self.database.cycles[12][4] = 0
+        self.database.cycles[13][4] = 0
+        loaded = load_snapshot(self.database, activate_cycles=True)
+        self.assertEqual(self.database.statements[0], snapshot.ACTIVATE_CYCLES)
+        self.assertEqual([cycle['cycle_id'] for cycle in loaded.cycles_for(2)], [11, 12])
+        self.assertEqual(self.database.cycles[13][4], 0)
+
+    def test_version_changes_only_with_the_content(self):
+        first = load_snapshot(self.database)
+        self.assertEqual(load_snapshot(self.database).version, first.version)
+        self.database.cycles[10][1] = 120
+        self.assertNotEqual(load_snapshot(self.database).version, first.version)
+
+    def test_snapshot_is_read_only(self):
+        loaded = load_snapshot(self.database)
+        with self.assertRaises(TypeError):
+            loaded.sensors[1]['map'] = 'light'
+
+    def test_cache_round_trip(self):
+        loaded = load_snapshot(self.database)
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'config_snapshot.json')
+            save_cache(loaded, path)
+            cached = load_cache(path)
+        self.assertEqual(cached.version, loaded.version)
+        self.assertEqual(cached.cycles, loaded.cycles)
+        self.assertEqual(cached.relays, loaded.relays)
+
+    def test_missing_cache(self):
+        self.assertIsNone(load_cache(os.path.join(tempfile.gettempdir(), 'no-such-snapshot.json')))
+
+    def test_empty_snapshot(self):
+        empty = ConfigSnapshot.from_json({'sensors': {}, 'cycles': {}, 'relays': {}})
+        self.assertEqual(empty.cycles_for(1), ())
+
+
+if __name__ == "__main__":
+    unittest.main()